@@ -0,0 +1,68 @@
+"""
+Сравнение скорости кодека строк с прежним преобразованием по веткам.
+Запуск: python -m benchmarks.bench_codec [количество_строк]
+"""
+
+import sys
+import time
+
+from src.primitive_db.codec import get_codec
+
+SCHEMA = {"ID": "int", "name": "str", "age": "int", "is_active": "bool"}
+
+
+def legacy_convert(table_structure, values):
+    """
+    Преобразование значений так, как это делал insert до кодеков.
+    """
+    data_columns = [col for col in table_structure.keys() if col != 'ID']
+    record = {}
+    for i, column in enumerate(data_columns):
+        value = values[i]
+        col_type = table_structure[column]
+        if col_type == 'int':
+            record[column] = int(value)
+        elif col_type == 'bool':
+            if value.lower() in ['true', '1', 'yes', 'да']:
+                record[column] = True
+            elif value.lower() in ['false', '0', 'no', 'нет']:
+                record[column] = False
+            else:
+                raise ValueError(f"Некорректное булево значение: {value}")
+        else:
+            if (value.startswith('"') and value.endswith('"')) or \
+               (value.startswith("'") and value.endswith("'")):
+                value = value[1:-1]
+            record[column] = value
+    return record
+
+
+def measure(label, func, rows):
+    """
+    Выполняет функцию для всех строк и печатает пропускную способность.
+    """
+    start = time.perf_counter()
+    for row in rows:
+        func(row)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed:.3f} с  ({len(rows) / elapsed:,.0f} строк/с)")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    raw_rows = [[f'"user{i}"', str(i % 90), 'да' if i % 2 else 'false']
+                for i in range(count)]
+    codec = get_codec(SCHEMA)
+
+    measure("insert: ветки", lambda row: legacy_convert(SCHEMA, row), raw_rows)
+    measure("insert: кодек", codec.encode, raw_rows)
+
+    records = [dict(ID=i, **codec.encode(row)) for i, row in enumerate(raw_rows)]
+    columns = list(SCHEMA)
+    measure("чтение: dict.get",
+            lambda record: [record.get(col, '') for col in columns], records)
+    measure("чтение: кодек", codec.decode, records)
+
+
+if __name__ == '__main__':
+    main()
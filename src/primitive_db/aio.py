@@ -0,0 +1,173 @@
+"""
+Асинхронный ввод-вывод файлов таблиц.
+
+Блокирующие чтение, разбор и запись файлов выполняются в общем пуле
+потоков, поэтому цикл событий (например, встроенного сервера) не
+останавливается на время работы с большой таблицей, а запросы к разным
+таблицам читают свои файлы одновременно. Чтение идет кусками с двойной
+буферизацией: пока разбирается очередной кусок, следующий уже читается.
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .constants import AIO_WORKERS, DATA_DIR, JSON_CHUNK_SIZE
+from .utils import JsonArrayDecoder, ensure_data_dir, save_json_atomic
+
+_executor = None
+
+
+def get_executor():
+    """
+    Возвращает пул потоков для блокирующих операций (создается при
+    первом обращении).
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=AIO_WORKERS,
+                                       thread_name_prefix='primitive-db-io')
+    return _executor
+
+
+def shutdown_executor():
+    """
+    Останавливает пул потоков, дождавшись завершения операций.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Выполняет блокирующую функцию в пуле потоков.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
+
+def _read_chunk(file, size):
+    """
+    Читает очередной кусок файла.
+    """
+    return file.read(size)
+
+
+async def read_chunks(filepath, chunk_size=JSON_CHUNK_SIZE, mode='r'):
+    """
+    Асинхронно выдает куски файла. Следующий кусок читается, пока
+    вызывающий код обрабатывает текущий. Отсутствующий файл считается пустым.
+    """
+    encoding = None if 'b' in mode else 'utf-8'
+    try:
+        file = await run_blocking(open, filepath, mode, encoding=encoding)
+    except FileNotFoundError:
+        return
+    loop = asyncio.get_running_loop()
+    pending = None
+    try:
+        pending = loop.run_in_executor(get_executor(), _read_chunk, file, chunk_size)
+        while True:
+            chunk = await pending
+            pending = None
+            if not chunk:
+                return
+            pending = loop.run_in_executor(get_executor(), _read_chunk, file,
+                                           chunk_size)
+            yield chunk
+    finally:
+        if pending is not None:
+            await asyncio.wait([pending])
+        file.close()
+
+
+_DONE = object()
+
+
+async def prefetch(iterator):
+    """
+    Асинхронно выдает элементы блокирующего итератора, вычисляя следующий
+    элемент в пуле потоков, пока обрабатывается текущий.
+    """
+    loop = asyncio.get_running_loop()
+    pending = None
+    try:
+        pending = loop.run_in_executor(get_executor(), next, iterator, _DONE)
+        while True:
+            item = await pending
+            pending = None
+            if item is _DONE:
+                return
+            pending = loop.run_in_executor(get_executor(), next, iterator, _DONE)
+            yield item
+    finally:
+        if pending is not None:
+            await asyncio.wait([pending])
+
+
+async def iter_json_array_async(filepath, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Асинхронно и потоково читает JSON файл с массивом объектов.
+    Каждый кусок разбирается в пуле потоков одновременно с чтением следующего.
+    """
+    decoder = JsonArrayDecoder(filepath)
+    async for chunk in read_chunks(filepath, chunk_size):
+        for item in await run_blocking(decoder.feed, chunk):
+            yield item
+        if decoder.done:
+            return
+    decoder.finish()
+
+
+async def load_json_async(filepath, default):
+    """
+    Асинхронно загружает JSON файл, возвращая default если файла нет
+    или он поврежден.
+    """
+    if not await run_blocking(os.path.exists, filepath):
+        return default
+    chunks = [chunk async for chunk in read_chunks(filepath)]
+    try:
+        return await run_blocking(json.loads, ''.join(chunks))
+    except json.JSONDecodeError as e:
+        print(f"Ошибка чтения файла {filepath}: {e}")
+        return default
+
+
+async def save_json_async(filepath, data):
+    """
+    Асинхронно и атомарно сохраняет данные в JSON файл: кодирование
+    и запись выполняются в пуле потоков.
+    """
+    await run_blocking(save_json_atomic, filepath, data)
+
+
+async def load_table_data_async(table_name):
+    """
+    Асинхронно загружает данные таблицы из JSON файла
+    (асинхронный вариант utils.load_table_data).
+    """
+    ensure_data_dir()
+    filepath = f"{DATA_DIR}/{table_name}.json"
+    try:
+        return [record async for record in iter_json_array_async(filepath)]
+    except ValueError as e:
+        print(f"Ошибка чтения данных таблицы {table_name}: {e}")
+        return []
+
+
+async def save_table_data_async(table_name, data):
+    """
+    Асинхронно сохраняет данные таблицы в JSON файл
+    (асинхронный вариант utils.save_table_data).
+    """
+    ensure_data_dir()
+    filepath = f"{DATA_DIR}/{table_name}.json"
+    try:
+        await save_json_async(filepath, data)
+    except Exception as e:
+        print(f"Ошибка сохранения данных таблицы {table_name}: {e}")
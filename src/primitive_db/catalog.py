@@ -0,0 +1,336 @@
+"""
+Каталог базы данных.
+
+Каталог загружается один раз и хранится в памяти: это словарь
+{таблица: схема}, который передается в функции бизнес-логики вместо
+метаданных, плюс параметры хранения, статистика и версии таблиц.
+Каждая таблица хранится в отдельном файле data/_catalog/<таблица>.json,
+поэтому создание и удаление таблицы переписывает один небольшой файл,
+а не весь каталог. Файлы записываются атомарно.
+"""
+
+import copy
+import os
+
+from .constants import CATALOG_DIR, CATALOG_VERSION_FILE, META_FILE, OPTIONS_DIR
+from .events import subscribe
+from .utils import load_json_file, load_metadata, save_json_atomic
+
+
+def _view_source(entry):
+    """
+    Возвращает исходную таблицу представления (или None).
+    """
+    return (entry or {}).get('options', {}).get('view', {}).get('source')
+
+
+def _entry_path(table_name):
+    """
+    Возвращает путь к файлу записи каталога о таблице.
+    """
+    return f"{CATALOG_DIR}/{table_name}.json"
+
+
+class Catalog(dict):
+    """
+    Каталог таблиц: словарь {таблица: схема} с параметрами, статистикой
+    и номером версии, который растет при каждом изменении схемы.
+    Для каждой таблицы хранятся построенные по ней представления, чтобы
+    не просматривать все записи каталога при каждом изменении таблицы.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+        self._entries = {}
+        self._views = {}
+        self._stamp = None
+
+    def _version_stamp(self):
+        """
+        Возвращает отметку файла версии для проверки внешних изменений.
+        """
+        try:
+            stat = os.stat(CATALOG_VERSION_FILE)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """
+        Загружает каталог с диска (при первом запуске переносит
+        таблицы из db_meta.json).
+        """
+        self.clear()
+        self._entries = {}
+        self._views = {}
+        self.version = 0
+
+        if not os.path.isdir(CATALOG_DIR):
+            self._migrate()
+        else:
+            version = load_json_file(CATALOG_VERSION_FILE, {})
+            self.version = version.get('version', 0)
+            for filename in sorted(os.listdir(CATALOG_DIR)):
+                if not filename.endswith('.json'):
+                    continue
+                entry = load_json_file(f"{CATALOG_DIR}/{filename}", None)
+                if entry:
+                    self._register(filename[:-len('.json')], entry)
+        self._stamp = self._version_stamp()
+
+    def _register(self, table_name, entry):
+        """
+        Добавляет запись о таблице в память.
+        """
+        self._unlink_view(table_name)
+        self._entries[table_name] = entry
+        self._link_view(table_name)
+        if entry.get('schema') is not None:
+            dict.__setitem__(self, table_name, entry['schema'])
+
+    def _link_view(self, table_name):
+        """
+        Добавляет представление в список представлений исходной таблицы.
+        """
+        source = _view_source(self._entries.get(table_name))
+        if source is not None:
+            self._views.setdefault(source, {})[table_name] = None
+
+    def _unlink_view(self, table_name):
+        """
+        Убирает представление из списка представлений исходной таблицы.
+        """
+        source = _view_source(self._entries.get(table_name))
+        views = self._views.get(source)
+        if views is not None:
+            views.pop(table_name, None)
+            if not views:
+                del self._views[source]
+
+    def _migrate(self):
+        """
+        Переносит в каталог таблицы из db_meta.json и их параметры.
+        """
+        metadata = load_metadata(META_FILE)
+        if not metadata:
+            return
+        for table_name, schema in metadata.items():
+            options = load_json_file(f"{OPTIONS_DIR}/{table_name}.json", {})
+            self._register(table_name, {
+                'schema': schema, 'options': options, 'stats': {}, 'version': 0,
+            })
+            self._write_entry(table_name)
+        self._write_version()
+
+    def refresh(self):
+        """
+        Перечитывает каталог, если его изменил другой процесс
+        (проверяется только отметка файла версии).
+        """
+        stamp = self._version_stamp()
+        if stamp != self._stamp:
+            self.load()
+        return self
+
+    def _write_entry(self, table_name):
+        """
+        Атомарно записывает запись о таблице.
+        """
+        os.makedirs(CATALOG_DIR, exist_ok=True)
+        save_json_atomic(_entry_path(table_name), self._entries[table_name])
+
+    def _write_version(self):
+        """
+        Атомарно записывает номер версии каталога.
+        """
+        os.makedirs(CATALOG_DIR, exist_ok=True)
+        save_json_atomic(CATALOG_VERSION_FILE, {'version': self.version})
+        self._stamp = self._version_stamp()
+
+    def _bump(self):
+        """
+        Увеличивает версию каталога.
+        """
+        self.version += 1
+        return self.version
+
+    def add_table(self, table_name, schema, options=None):
+        """
+        Регистрирует новую таблицу.
+        """
+        self._register(table_name, {
+            'schema': dict(schema),
+            'options': copy.deepcopy(options or {}),
+            'stats': {'rows': 0},
+            'version': self._bump(),
+        })
+        self._write_entry(table_name)
+        self._write_version()
+
+    def remove_table(self, table_name):
+        """
+        Удаляет таблицу из каталога.
+        """
+        self._unlink_view(table_name)
+        self._entries.pop(table_name, None)
+        self.pop(table_name, None)
+        filepath = _entry_path(table_name)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        self._bump()
+        self._write_version()
+
+    def set_schema(self, table_name, schema):
+        """
+        Заменяет схему таблицы и увеличивает ее версию.
+        """
+        entry = self._entries[table_name]
+        entry['schema'] = dict(schema)
+        entry['version'] = self._bump()
+        dict.__setitem__(self, table_name, entry['schema'])
+        self._write_entry(table_name)
+        self._write_version()
+
+    def alter_schema(self, table_name, schema, change):
+        """
+        Меняет схему таблицы и записывает изменение в историю схемы.
+        Данные при этом не переписываются.
+        """
+        entry = self._entries[table_name]
+        entry['schema'] = dict(schema)
+        entry['version'] = self._bump()
+        entry.setdefault('history', []).append({**change, 'version': self.version})
+        dict.__setitem__(self, table_name, entry['schema'])
+        self._write_entry(table_name)
+        self._write_version()
+
+    def pending_changes(self, table_name, filepath):
+        """
+        Возвращает изменения схемы, сделанные после записи файла.
+        """
+        entry = self._entries.get(table_name)
+        if not entry or not entry.get('history'):
+            return []
+        file_version = entry.get('files', {}).get(filepath, 0)
+        return [change for change in entry['history']
+                if change['version'] > file_version]
+
+    def mark_file_version(self, table_name, filepath):
+        """
+        Запоминает, что файл записан с текущей версией схемы таблицы.
+        """
+        entry = self._entries.get(table_name)
+        if not entry or not entry.get('history'):
+            return
+        files = entry.setdefault('files', {})
+        if files.get(filepath, 0) != entry['version']:
+            files[filepath] = entry['version']
+            self._write_entry(table_name)
+
+    def table_version(self, table_name):
+        """
+        Возвращает версию схемы таблицы (или None для неизвестной таблицы).
+        """
+        entry = self._entries.get(table_name)
+        return entry.get('version', 0) if entry else None
+
+    def views_of(self, table_name):
+        """
+        Возвращает имена материализованных представлений по таблице.
+        """
+        return list(self._views.get(table_name, ()))
+
+    def entry(self, table_name):
+        """
+        Возвращает копию записи о таблице (или пустой словарь).
+        """
+        return copy.deepcopy(self._entries.get(table_name, {}))
+
+    def options(self, table_name):
+        """
+        Возвращает копию параметров хранения таблицы.
+        """
+        entry = self._entries.get(table_name)
+        return copy.deepcopy(entry['options']) if entry else {}
+
+    def set_options(self, table_name, options):
+        """
+        Сохраняет параметры хранения таблицы.
+        """
+        is_new = table_name not in self._entries
+        self._unlink_view(table_name)
+        entry = self._entries.setdefault(
+            table_name, {'schema': None, 'options': {}, 'stats': {}, 'version': 0})
+        entry['options'] = copy.deepcopy(options)
+        self._link_view(table_name)
+        self._write_entry(table_name)
+        if is_new:
+            self._write_version()
+
+    def stats(self, table_name):
+        """
+        Возвращает копию статистики таблицы.
+        """
+        entry = self._entries.get(table_name)
+        return dict(entry.get('stats', {})) if entry else {}
+
+    def update_stats(self, table_name, **values):
+        """
+        Обновляет статистику таблицы.
+        """
+        entry = self._entries.get(table_name)
+        if entry is None:
+            return
+        entry.setdefault('stats', {}).update(values)
+        self._write_entry(table_name)
+
+
+_catalog = Catalog()
+_loaded = False
+
+
+def get_catalog():
+    """
+    Возвращает каталог процесса, загружая его при первом обращении.
+    """
+    global _loaded
+    if not _loaded:
+        _catalog.load()
+        _loaded = True
+        return _catalog
+    return _catalog.refresh()
+
+
+def load_table_options(table_name):
+    """
+    Возвращает параметры хранения таблицы (партиционирование, сжатие, индексы).
+    """
+    return get_catalog().options(table_name)
+
+
+def save_table_options(table_name, options):
+    """
+    Сохраняет параметры хранения таблицы.
+    """
+    get_catalog().set_options(table_name, options)
+
+
+@subscribe
+def _track_row_count(table_name, changes):
+    """
+    Поддерживает количество записей таблицы в статистике каталога
+    и счетчик изменений после сбора статистики.
+    """
+    catalog = get_catalog()
+    stats = catalog.stats(table_name)
+    values = {}
+    delta = sum(1 for change in changes if change.op == 'insert') - \
+        sum(1 for change in changes if change.op == 'delete')
+    if delta and stats.get('rows') is not None:
+        values['rows'] = stats['rows'] + delta
+    if 'analyzed_rows' in stats:
+        # Количество изменений после analyze (для пересбора статистики)
+        values['modified'] = stats.get('modified', 0) + len(changes)
+    if values:
+        catalog.update_stats(table_name, **values)
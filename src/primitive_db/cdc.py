@@ -0,0 +1,121 @@
+"""
+Поток изменений данных (change data capture).
+
+Каждое изменение строк, записанное в журнал изменений, доступно
+подписчикам как событие с номером seq, таблицей, ID записи и ее
+значениями до и после изменения. Подписчик читает события итератором
+или асинхронным потоком и подтверждает обработанную позицию; после
+перезапуска чтение продолжается с подтвержденной позиции, поэтому
+кэши и поисковые индексы обновляются по изменениям, а не повторным
+чтением всей таблицы.
+"""
+
+import asyncio
+from collections import namedtuple
+
+from .changelog import first_seq, load_offsets, read_entries, save_offset
+from .constants import CDC_POLL_INTERVAL
+
+# Событие изменения записи таблицы (op — 'insert', 'update' или 'delete')
+ChangeEvent = namedtuple('ChangeEvent',
+                         ['seq', 'ts', 'table', 'op', 'id', 'before', 'after'])
+
+_ROW_OPS = ('insert', 'update', 'delete')
+
+
+def _check_retained(from_seq):
+    """
+    Проверяет, что записи журнала начиная с from_seq еще хранятся.
+    """
+    oldest = first_seq()
+    if oldest is not None and from_seq < oldest:
+        raise ValueError(f"Записи журнала до seq {oldest} уже удалены")
+
+
+def _to_event(entry):
+    """
+    Преобразует запись журнала в событие изменения.
+    """
+    record = entry['after'] if entry['after'] is not None else entry['before']
+    return ChangeEvent(entry['seq'], entry['ts'], entry['table'], entry['op'],
+                       record['ID'], entry['before'], entry['after'])
+
+
+def changes(from_seq=1, tables=None):
+    """
+    Выдает события изменений начиная с from_seq (только уже записанные).
+    tables ограничивает события указанными таблицами.
+    """
+    _check_retained(from_seq)
+    for entry in read_entries(from_seq):
+        if entry['op'] in _ROW_OPS and (tables is None or entry['table'] in tables):
+            yield _to_event(entry)
+
+
+class Subscription:
+    """
+    Подписка на изменения с возобновляемой позицией.
+    Новый подписчик начинает с самого старого хранимого изменения,
+    известный — со следующего после подтвержденного.
+    """
+
+    def __init__(self, consumer, tables=None, from_seq=None):
+        self.consumer = consumer
+        self.tables = set(tables) if tables else None
+        if from_seq is None:
+            committed = load_offsets().get(consumer)
+            from_seq = committed + 1 if committed is not None else first_seq() or 1
+        _check_retained(from_seq)
+        self.position = from_seq
+
+    def _read(self, limit=None):
+        """
+        Выдает новые события и сдвигает позицию чтения.
+        """
+        count = 0
+        for entry in read_entries(self.position):
+            self.position = entry['seq'] + 1
+            if entry['op'] not in _ROW_OPS:
+                continue
+            if self.tables is not None and entry['table'] not in self.tables:
+                continue
+            yield _to_event(entry)
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+    def __iter__(self):
+        """
+        Выдает все уже записанные события после текущей позиции.
+        """
+        return self._read()
+
+    def poll(self, max_events=None):
+        """
+        Возвращает список новых событий (не больше max_events).
+        """
+        return list(self._read(max_events))
+
+    def commit(self, seq=None):
+        """
+        Подтверждает обработку событий до seq включительно
+        (по умолчанию — всех прочитанных).
+        """
+        save_offset(self.consumer, self.position - 1 if seq is None else seq)
+
+    def close(self):
+        """
+        Удаляет подписчика: журнал больше не хранится ради него.
+        """
+        save_offset(self.consumer, None)
+
+    async def stream(self, interval=CDC_POLL_INTERVAL):
+        """
+        Асинхронно выдает события, ожидая новые изменения.
+        """
+        while True:
+            events = self.poll()
+            for event in events:
+                yield event
+            if not events:
+                await asyncio.sleep(interval)
@@ -0,0 +1,246 @@
+"""
+Журнал изменений базы данных.
+Каждое изменение строк (insert/update/delete) и схемы (create/drop/alter
+и т.п.) получает порядковый номер seq и дописывается в журнал
+data/_changelog/<первый seq>.jsonl. Журнал разбит на сегменты; старые
+сегменты удаляются (кроме тех, что еще не прочитали подписчики потока
+изменений), поэтому читатель, отставший больше чем на хранимую часть
+журнала, должен начать со снимка базы.
+Изменения материализованных представлений в журнал не пишутся: читатель
+вычисляет их сам по изменениям исходных таблиц.
+"""
+
+import glob
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from .catalog import load_table_options
+from .constants import (
+    CDC_OFFSETS_FILE,
+    CHANGELOG_DIR,
+    CHANGELOG_FSYNC,
+    CHANGELOG_RETAIN_SEGMENTS,
+    CHANGELOG_SEGMENT_ENTRIES,
+)
+from .events import subscribe
+from .utils import load_json_file, save_json_atomic
+
+
+def _log_dir(root=None):
+    """
+    Возвращает каталог журнала базы (root — каталог другой базы).
+    """
+    return CHANGELOG_DIR if root is None else os.path.join(root, CHANGELOG_DIR)
+
+
+def _segment_start(filepath):
+    """
+    Возвращает первый seq сегмента по имени файла.
+    """
+    return int(os.path.basename(filepath).split('.')[0])
+
+
+def list_segments(root=None):
+    """
+    Возвращает пути к сегментам журнала в порядке номеров.
+    """
+    return sorted(glob.glob(os.path.join(_log_dir(root), '*.jsonl')),
+                  key=_segment_start)
+
+
+def _read_segment(filepath):
+    """
+    Читает записи сегмента, пропуская недописанную последнюю строку.
+    """
+    try:
+        file = open(filepath, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with file:
+        for line in file:
+            if not line.endswith('\n'):
+                return
+            yield json.loads(line)
+
+
+def first_seq(root=None):
+    """
+    Возвращает seq самой старой хранимой записи или None для пустого журнала.
+    """
+    segments = list_segments(root)
+    return _segment_start(segments[0]) if segments else None
+
+
+def last_seq(root=None):
+    """
+    Возвращает seq последней записи журнала (0 для пустого журнала).
+    """
+    for filepath in reversed(list_segments(root)):
+        last = None
+        for entry in _read_segment(filepath):
+            last = entry['seq']
+        if last is not None:
+            return last
+    return 0
+
+
+def read_entries(from_seq=1, root=None):
+    """
+    Потоково выдает записи журнала начиная с from_seq.
+    """
+    segments = list_segments(root)
+    for i, filepath in enumerate(segments):
+        if i + 1 < len(segments) and _segment_start(segments[i + 1]) <= from_seq:
+            continue
+        for entry in _read_segment(filepath):
+            if entry['seq'] >= from_seq:
+                yield entry
+
+
+def load_offsets():
+    """
+    Возвращает подтвержденные позиции подписчиков {подписчик: seq}.
+    """
+    return load_json_file(CDC_OFFSETS_FILE, {})
+
+
+def save_offset(consumer, seq):
+    """
+    Атомарно сохраняет подтвержденную позицию подписчика
+    (None удаляет подписчика).
+    """
+    offsets = load_offsets()
+    if seq is None:
+        offsets.pop(consumer, None)
+    else:
+        offsets[consumer] = seq
+    os.makedirs(CHANGELOG_DIR, exist_ok=True)
+    save_json_atomic(CDC_OFFSETS_FILE, offsets)
+
+
+class ChangeLog:
+    """
+    Писатель журнала изменений: назначает seq и дописывает записи.
+    """
+
+    def __init__(self):
+        self._path = None
+        self._file = None
+        self._seq = 0
+        self._count = 0
+        self._paused = 0
+
+    def _open(self):
+        """
+        Открывает последний сегмент журнала текущей базы.
+        Журнал переоткрывается, если база сменилась или файл был удален.
+        """
+        log_dir = os.path.abspath(CHANGELOG_DIR)
+        if self._file is not None and os.path.dirname(self._path) == log_dir \
+                and os.path.exists(self._path):
+            return
+        self.close()
+        os.makedirs(log_dir, exist_ok=True)
+        segments = list_segments()
+        self._seq = last_seq()
+        if segments:
+            self._path = os.path.abspath(segments[-1])
+            self._count = sum(1 for _ in _read_segment(self._path))
+        else:
+            self._path = os.path.join(log_dir, f"{self._seq + 1:012d}.jsonl")
+            self._count = 0
+        self._file = open(self._path, 'a', encoding='utf-8')
+
+    def _rotate(self):
+        """
+        Начинает новый сегмент и удаляет сегменты сверх хранимого количества,
+        если их уже прочитали все подписчики.
+        """
+        self._file.close()
+        self._path = os.path.join(os.path.dirname(self._path),
+                                  f"{self._seq + 1:012d}.jsonl")
+        self._file = open(self._path, 'a', encoding='utf-8')
+        self._count = 0
+        committed = min(load_offsets().values(), default=None)
+        segments = list_segments()
+        for i, filepath in enumerate(segments[:-CHANGELOG_RETAIN_SEGMENTS]):
+            unread = committed is not None \
+                and _segment_start(segments[i + 1]) > committed + 1
+            if unread:
+                break
+            os.remove(filepath)
+
+    def append(self, entries):
+        """
+        Назначает записям seq и дописывает их в журнал. Возвращает записи.
+        """
+        if self._paused or not entries:
+            return []
+        self._open()
+        now = time.time()
+        written = []
+        for entry in entries:
+            if self._count >= CHANGELOG_SEGMENT_ENTRIES:
+                self._rotate()
+            self._seq += 1
+            entry = {'seq': self._seq, 'ts': now, **entry}
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._count += 1
+            written.append(entry)
+        self._file.flush()
+        if CHANGELOG_FSYNC:
+            os.fsync(self._file.fileno())
+        return written
+
+    @contextmanager
+    def paused(self):
+        """
+        Не записывает изменения в журнал на время блока (например, когда
+        реплика применяет изменения, полученные от ведущего).
+        """
+        self._paused += 1
+        try:
+            yield
+        finally:
+            self._paused -= 1
+
+    def close(self):
+        """
+        Закрывает файл журнала.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_changelog = ChangeLog()
+
+
+def get_changelog():
+    """
+    Возвращает писатель журнала изменений процесса.
+    """
+    return _changelog
+
+
+def log_schema_change(op, table_name, **fields):
+    """
+    Записывает в журнал изменение схемы (create, drop, alter и т.п.).
+    """
+    _changelog.append([{'table': table_name, 'op': op, **fields}])
+
+
+@subscribe
+def _log_changes(table_name, changes):
+    """
+    Записывает в журнал изменения строк таблицы.
+    """
+    if load_table_options(table_name).get('view'):
+        return
+    _changelog.append([
+        {'table': table_name, 'op': change.op,
+         'before': change.before, 'after': change.after}
+        for change in changes
+    ])
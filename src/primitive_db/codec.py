@@ -0,0 +1,358 @@
+"""
+Компилируемые кодеки строк таблиц.
+Кодек строится один раз по схеме таблицы и затем используется для
+преобразования, валидации и чтения записей без разбора типов на каждом значении.
+"""
+
+import operator
+import re
+from collections import namedtuple
+from datetime import date, datetime, timezone
+
+from .constants import NULL_LITERAL, NULLABLE_SUFFIX, TEXT_OPERATORS, VALID_TYPES
+
+# Допустимые написания булевых значений
+BOOL_TRUE = frozenset({'true', '1', 'yes', 'да'})
+BOOL_FALSE = frozenset({'false', '0', 'no', 'нет'})
+
+# Сравнения для условий WHERE: значение записи слева, значение условия справа
+COMPARISONS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _to_int(value):
+    """
+    Преобразует значение к int.
+    """
+    if value.__class__ is int:
+        return value
+    if isinstance(value, bool):
+        raise ValueError(f"Некорректное целое значение: {value}")
+    return int(value)
+
+
+def _to_bool(value):
+    """
+    Преобразует значение к bool.
+    """
+    if value is True or value is False:
+        return value
+    lowered = str(value).lower()
+    if lowered in BOOL_TRUE:
+        return True
+    if lowered in BOOL_FALSE:
+        return False
+    raise ValueError(f"Некорректное булево значение: {value}")
+
+
+def _to_str(value):
+    """
+    Преобразует значение к str.
+    """
+    if value.__class__ is str:
+        return value
+    return str(value)
+
+
+def _to_float(value):
+    """
+    Преобразует значение к float.
+    """
+    if value.__class__ is float:
+        return value
+    if isinstance(value, bool):
+        raise ValueError(f"Некорректное дробное значение: {value}")
+    return float(value)
+
+
+def _to_date(value):
+    """
+    Преобразует значение к дате в формате ISO (ГГГГ-ММ-ДД).
+    """
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    try:
+        return date.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        raise ValueError(f"Некорректная дата: {value}") from None
+
+
+def _to_timestamp(value):
+    """
+    Преобразует значение к отметке времени в формате ISO без часового пояса.
+    Время с часовым поясом переводится в UTC.
+    """
+    if not isinstance(value, datetime):
+        text = str(value)
+        if text.endswith('Z'):
+            text = text[:-1] + '+00:00'
+        try:
+            value = datetime.fromisoformat(text)
+        except ValueError:
+            raise ValueError(f"Некорректная отметка времени: {value}") from None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+# Значения хранятся в JSON-совместимом виде: даты и отметки времени —
+# строками ISO, которые сравниваются в том же порядке, что и сами даты
+CONVERTERS = {
+    'int': _to_int,
+    'bool': _to_bool,
+    'str': _to_str,
+    'float': _to_float,
+    'date': _to_date,
+    'timestamp': _to_timestamp,
+}
+
+
+def base_type(col_type):
+    """
+    Возвращает тип столбца без признака NULL.
+    """
+    return col_type[:-len(NULLABLE_SUFFIX)] \
+        if col_type.endswith(NULLABLE_SUFFIX) else col_type
+
+
+def is_nullable(col_type):
+    """
+    Проверяет, допускает ли тип столбца NULL.
+    """
+    return col_type.endswith(NULLABLE_SUFFIX)
+
+
+def is_valid_type(col_type):
+    """
+    Проверяет, что тип столбца поддерживается (в том числе с признаком NULL).
+    """
+    return base_type(col_type) in VALID_TYPES
+
+
+def converter_for(col_type):
+    """
+    Возвращает функцию преобразования значения к типу столбца.
+    """
+    return CONVERTERS[base_type(col_type)]
+
+
+def where_parts(where_clause):
+    """
+    Возвращает (столбец, значение, оператор) условия WHERE.
+    Условие равенства записывается парой (столбец, значение).
+    """
+    if len(where_clause) == 2:
+        return where_clause[0], where_clause[1], '='
+    return tuple(where_clause)
+
+
+def text_matcher(column, value, op):
+    """
+    Возвращает предикат условия contains (подстрока) или like (шаблон
+    с % — любые символы и _ — один символ) без учета регистра.
+    """
+    if op == 'contains':
+        needle = value.lower()
+        return lambda record: record.get(column) is not None and \
+            needle in str(record.get(column)).lower()
+
+    pattern = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char)
+                      for char in value)
+    regex = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+    return lambda record: record.get(column) is not None and \
+        regex.fullmatch(str(record.get(column))) is not None
+
+
+def strip_quotes(value):
+    """
+    Убирает парные кавычки вокруг строкового значения.
+    """
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'"):
+        return value[1:-1]
+    return value
+
+
+class TableCodec:
+    """
+    Кодек строк одной таблицы, скомпилированный по ее схеме.
+    """
+
+    __slots__ = (
+        'columns',
+        'data_columns',
+        'types',
+        'converters',
+        'row_class',
+        '_by_column',
+        '_pairs',
+        '_data_items',
+        '_nullable',
+    )
+
+    def __init__(self, table_structure):
+        self.columns = tuple(table_structure)
+        self.data_columns = tuple(col for col in self.columns if col != 'ID')
+        self.types = tuple(table_structure[col] for col in self.columns)
+        self.converters = tuple(converter_for(typ) for typ in self.types)
+        self.row_class = namedtuple('Row', self.columns, rename=True)
+        self._by_column = dict(zip(self.columns, self.converters))
+        self._pairs = tuple(zip(self.columns, self.converters))
+        self._data_items = tuple(
+            (col, self._by_column[col], base_type(table_structure[col]) == 'str',
+             is_nullable(table_structure[col]))
+            for col in self.data_columns
+        )
+        self._nullable = frozenset(col for col in self.columns
+                                   if is_nullable(table_structure[col]))
+
+    def encode(self, values):
+        """
+        Преобразует сырые значения команды insert в запись без ID.
+        """
+        if len(values) != len(self._data_items):
+            expected = len(self._data_items)
+            msg = f"Ожидалось {expected} значений, получено {len(values)}"
+            raise ValueError(msg)
+
+        record = {}
+        for (column, convert, is_str, nullable), value in zip(self._data_items,
+                                                                values):
+            if len(value) == 4 and value.lower() == NULL_LITERAL:
+                if not nullable:
+                    raise ValueError(f"{column}: столбец не допускает NULL")
+                continue
+            if is_str:
+                value = strip_quotes(value)
+            try:
+                record[column] = convert(value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"{column}: {e}") from e
+        return record
+
+    def encode_fields(self, fields, complete=True):
+        """
+        Преобразует словарь {столбец: значение} (например, строку файла)
+        в запись без ID. Значения могут быть уже типизированными, пустая
+        строка и null в столбце, допускающем NULL, означают NULL.
+        С complete=False отсутствующие столбцы пропускаются (частичная
+        запись для обновления), иначе считаются NULL.
+        """
+        unknown = sorted(set(fields) - set(self.columns))
+        if unknown:
+            raise ValueError(f'{unknown[0]}: столбец не существует')
+        record = {}
+        for column, convert, _, nullable in self._data_items:
+            if column not in fields and not complete:
+                continue
+            value = fields.get(column)
+            if nullable and isinstance(value, str) and \
+                    (not value or value.lower() == NULL_LITERAL):
+                value = None
+            if value is None:
+                if not nullable:
+                    raise ValueError(f"{column}: столбец не допускает NULL")
+                record[column] = None
+                continue
+            try:
+                record[column] = convert(value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"{column}: {e}") from e
+        return record
+
+    def convert(self, column, value):
+        """
+        Преобразует одно значение к типу столбца.
+        """
+        return self._by_column[column](value)
+
+    def convert_update(self, column, value):
+        """
+        Преобразует новое значение из команды update.
+        Для столбца, допускающего NULL, значение null возвращается как None.
+        """
+        if column in self._nullable and str(value).lower() == NULL_LITERAL:
+            return None
+        return self._by_column[column](value)
+
+    def decode(self, record):
+        """
+        Проверяет запись, загруженную из файла, и возвращает строку таблицы.
+        Отсутствующие значения возвращаются как None.
+        """
+        get = record.get
+        return self.row_class._make([
+            None if (value := get(column)) is None else convert(value)
+            for column, convert in self._pairs
+        ])
+
+    def matcher(self, column, value, op='='):
+        """
+        Возвращает предикат условия WHERE для столбца.
+        Значение приводится к типу столбца один раз, поэтому сравнение
+        учитывает тип (числа — как числа, даты — как даты). Если значение
+        не приводится к типу, равенство проверяется по строке, а сравнение
+        на больше/меньше считается ошибкой. contains и like проверяются
+        по строке значения. NULL не подходит ни под одно сравнение,
+        кроме is null.
+        """
+        if op in ('is', 'is not'):
+            want_null = op == 'is'
+            return lambda record: (record.get(column) is None) == want_null
+        if op in TEXT_OPERATORS:
+            return text_matcher(column, value, op)
+
+        compare = COMPARISONS[op]
+        convert = self._by_column.get(column)
+        typed = None
+        if convert is not None:
+            try:
+                typed = convert(value)
+            except (TypeError, ValueError) as e:
+                if op not in ('=', '!='):
+                    raise ValueError(f"{column}: {e}") from e
+        if typed is None:
+            return lambda record: record.get(column) is not None and \
+                compare(str(record.get(column)), value)
+
+        def match(record):
+            current = record.get(column)
+            return current is not None and compare(current, typed)
+        return match
+
+    def condition(self, where_clause):
+        """
+        Возвращает (столбец, оператор, типизированное значение) для отсечения
+        партиций, сегментов и поиска по индексу или None, если условие
+        нельзя использовать для отсечения.
+        """
+        column, value, op = where_parts(where_clause)
+        convert = self._by_column.get(column)
+        if convert is None or op not in COMPARISONS or op == '!=':
+            return None
+        try:
+            return column, op, convert(value)
+        except (TypeError, ValueError):
+            return None
+
+
+_codecs = {}
+
+
+def get_codec(table_structure):
+    """
+    Возвращает кодек для схемы таблицы, компилируя его только один раз.
+    """
+    key = tuple(table_structure.items())
+    codec = _codecs.get(key)
+    if codec is None:
+        codec = TableCodec(table_structure)
+        _codecs[key] = codec
+    return codec
@@ -0,0 +1,461 @@
+"""
+Сжатый посегментный формат файлов таблиц.
+
+Файл состоит из заголовка и последовательности сегментов. Каждый сегмент
+хранит до SEGMENT_ROWS записей в колоночном виде и сжимается отдельно,
+поэтому чтение по ID распаковывает только нужные сегменты.
+Числа, булевы значения, даты и отметки времени хранятся упакованными
+двоичными массивами с битовой картой заполненных значений, строковые
+столбцы с небольшим числом различных значений — словарем и массивом кодов.
+Для каждого сегмента в заголовке хранятся минимум и максимум столбцов,
+что позволяет пропускать сегменты, не подходящие под условие WHERE,
+а также размеры сегмента в колоночном виде и после сжатия — по ним
+статистика сжатия считается без распаковки. Скорость распаковки и размер
+таблицы в JSON оцениваются по нескольким распакованным сегментам.
+Файл записывается во временный и затем атомарно заменяет старый.
+"""
+
+import json
+import lzma
+import os
+import struct
+import time
+import zlib
+from datetime import date, datetime, timedelta
+
+from .constants import SEGMENT_ROWS
+
+MAGIC = b'PDBSEG2\n'
+# Файлы первой версии хранят сегменты как JSON без двоичных массивов
+MAGIC_V1 = b'PDBSEG1\n'
+_HEADER_LEN = struct.Struct('>I')
+
+# Доля различных значений, при которой строковый столбец кодируется словарем
+DICT_MAX_RATIO = 0.5
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+_EPOCH_DAY = date(1970, 1, 1).toordinal()
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Формат элемента упакованного массива для каждого вида столбца
+_PACK_FORMATS = {'int': 'q', 'float': 'd', 'date': 'i', 'timestamp': 'q'}
+
+_CODECS = {
+    'dict': (lambda data: data, lambda data: data),
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+def _pack_bits(flags):
+    """
+    Упаковывает список флагов в битовую карту.
+    """
+    data = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            data[i >> 3] |= 1 << (i & 7)
+    return bytes(data)
+
+
+def _unpack_bits(data, count):
+    """
+    Распаковывает битовую карту в список флагов.
+    """
+    return [bool(data[i >> 3] >> (i & 7) & 1) for i in range(count)]
+
+
+def _is_date(value):
+    """
+    Проверяет, что строка — дата ISO, которая восстанавливается без потерь.
+    """
+    try:
+        return len(value) == 10 and date.fromisoformat(value).isoformat() == value
+    except ValueError:
+        return False
+
+
+def _is_timestamp(value):
+    """
+    Проверяет, что строка — отметка времени ISO без часового пояса,
+    которая восстанавливается без потерь.
+    """
+    if len(value) < 19 or value[10] != 'T':
+        return False
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return parsed.tzinfo is None and parsed.isoformat() == value
+
+
+def _packed_kind(present):
+    """
+    Определяет, можно ли хранить значения столбца упакованным массивом.
+    Возвращает вид столбца или None.
+    """
+    if not present:
+        return None
+    if all(value is True or value is False for value in present):
+        return 'bool'
+    if all(value.__class__ is int for value in present):
+        if all(_INT64_MIN <= value <= _INT64_MAX for value in present):
+            return 'int'
+        return None
+    if all(value.__class__ is float for value in present):
+        return 'float'
+    if all(value.__class__ is str for value in present):
+        if all(_is_date(value) for value in present):
+            return 'date'
+        if all(_is_timestamp(value) for value in present):
+            return 'timestamp'
+    return None
+
+
+def _to_packed(kind, value):
+    """
+    Переводит значение в число для упакованного массива.
+    """
+    if kind == 'date':
+        return date.fromisoformat(value).toordinal() - _EPOCH_DAY
+    if kind == 'timestamp':
+        return (datetime.fromisoformat(value) - _EPOCH) // _MICROSECOND
+    return value
+
+
+def _from_packed(kind, number):
+    """
+    Восстанавливает значение из числа упакованного массива.
+    """
+    if kind == 'date':
+        return date.fromordinal(number + _EPOCH_DAY).isoformat()
+    if kind == 'timestamp':
+        return (_EPOCH + number * _MICROSECOND).isoformat()
+    return number
+
+
+def _value_range(present):
+    """
+    Возвращает [минимум, максимум] значений столбца или None,
+    если значения нельзя сравнить между собой.
+    """
+    if not present or any(value is True or value is False for value in present):
+        return None
+    if all(value.__class__ in (int, float) for value in present) or \
+            all(value.__class__ is str for value in present):
+        return [min(present), max(present)]
+    return None
+
+
+class _Blobs:
+    """
+    Двоичная область сегмента: накапливает массивы и возвращает их положение.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def add(self, data):
+        """
+        Добавляет массив и возвращает [смещение, длина].
+        """
+        self.parts.append(data)
+        self.size += len(data)
+        return [self.size - len(data), len(data)]
+
+
+def _encode_columns(rows):
+    """
+    Переводит записи сегмента в колоночное представление.
+    Возвращает (байты сегмента, диапазоны значений столбцов).
+    """
+    columns = []
+    seen = set()
+    for record in rows:
+        for column in record:
+            if column not in seen:
+                seen.add(column)
+                columns.append(column)
+
+    blobs = _Blobs()
+    encoded = {}
+    ranges = {}
+    for column in columns:
+        values = [record.get(column) for record in rows]
+        present = [value for value in values if value is not None]
+        value_range = _value_range(present)
+        if value_range is not None:
+            ranges[column] = value_range
+
+        kind = _packed_kind(present)
+        if kind is not None:
+            data = {'packed': kind}
+            if len(present) != len(values):
+                data['valid'] = blobs.add(_pack_bits([value is not None
+                                                      for value in values]))
+            if kind == 'bool':
+                data['data'] = blobs.add(_pack_bits(values))
+            else:
+                numbers = [0 if value is None else _to_packed(kind, value)
+                           for value in values]
+                data['data'] = blobs.add(struct.pack(
+                    f'<{len(numbers)}{_PACK_FORMATS[kind]}', *numbers))
+            encoded[column] = data
+            continue
+
+        distinct = set(values)
+        if all(isinstance(value, str) for value in values) and \
+                len(distinct) <= len(values) * DICT_MAX_RATIO:
+            dictionary = sorted(distinct)
+            positions = {value: i for i, value in enumerate(dictionary)}
+            width = 'B' if len(dictionary) <= 0x100 else \
+                'H' if len(dictionary) <= 0x10000 else 'I'
+            codes = [positions[value] for value in values]
+            encoded[column] = {
+                'dict': dictionary,
+                'width': width,
+                'codes': blobs.add(struct.pack(f'<{len(codes)}{width}', *codes)),
+            }
+        else:
+            encoded[column] = {'values': values}
+
+    meta = json.dumps(encoded, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+    raw = _HEADER_LEN.pack(len(meta)) + meta + b''.join(blobs.parts)
+    return raw, ranges
+
+
+def _decode_columns(raw, count):
+    """
+    Восстанавливает записи сегмента из колоночного представления.
+    """
+    (length,) = _HEADER_LEN.unpack_from(raw)
+    start = _HEADER_LEN.size + length
+    encoded = json.loads(raw[_HEADER_LEN.size:start].decode('utf-8'))
+
+    def blob(position):
+        offset, size = position
+        return raw[start + offset:start + offset + size]
+
+    rows = [{} for _ in range(count)]
+    for column, data in encoded.items():
+        if 'packed' in data:
+            kind = data['packed']
+            if kind == 'bool':
+                values = _unpack_bits(blob(data['data']), count)
+            else:
+                numbers = struct.unpack(f'<{count}{_PACK_FORMATS[kind]}',
+                                        blob(data['data']))
+                values = [_from_packed(kind, number) for number in numbers]
+            if 'valid' in data:
+                valid = _unpack_bits(blob(data['valid']), count)
+                values = [value if flag else None
+                          for value, flag in zip(values, valid)]
+        elif 'dict' in data:
+            dictionary = data['dict']
+            codes = struct.unpack(f'<{count}{data["width"]}', blob(data['codes']))
+            values = [dictionary[code] for code in codes]
+        else:
+            values = data['values']
+        for record, value in zip(rows, values):
+            if value is not None:
+                record[column] = value
+    return rows
+
+
+def _decode_columns_v1(encoded, count):
+    """
+    Восстанавливает записи сегмента файла первой версии (JSON).
+    """
+    rows = [{} for _ in range(count)]
+    for column, data in encoded.items():
+        if 'dict' in data:
+            dictionary = data['dict']
+            values = [dictionary[code] for code in data['codes']]
+        else:
+            values = data['values']
+        for record, value in zip(rows, values):
+            if value is not None:
+                record[column] = value
+    return rows
+
+
+def write_segments(filepath, rows, codec):
+    """
+    Записывает таблицу в сжатый посегментный формат.
+    """
+    compress = _CODECS[codec][0]
+    blobs = []
+    segments = []
+    offset = 0
+    for start in range(0, len(rows), SEGMENT_ROWS):
+        chunk = rows[start:start + SEGMENT_ROWS]
+        raw, ranges = _encode_columns(chunk)
+        blob = compress(raw)
+        ids = [record['ID'] for record in chunk if 'ID' in record]
+        segments.append({
+            'offset': offset,
+            'length': len(blob),
+            'rows': len(chunk),
+            'raw_size': len(raw),
+            'min_id': min(ids, default=None),
+            'max_id': max(ids, default=None),
+            'ranges': ranges,
+        })
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({'codec': codec, 'segments': segments}).encode('utf-8')
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(_HEADER_LEN.pack(len(header)))
+        file.write(header)
+        for blob in blobs:
+            file.write(blob)
+    os.replace(tmp_path, filepath)
+
+
+def _read_header(file):
+    """
+    Читает заголовок сжатого файла и возвращает (заголовок, начало данных).
+    """
+    magic = file.read(len(MAGIC))
+    if magic not in (MAGIC, MAGIC_V1):
+        raise ValueError("Файл не является сжатой таблицей")
+    (length,) = _HEADER_LEN.unpack(file.read(_HEADER_LEN.size))
+    header = json.loads(file.read(length).decode('utf-8'))
+    header['version'] = 1 if magic == MAGIC_V1 else 2
+    return header, len(MAGIC) + _HEADER_LEN.size + length
+
+
+def read_header(filepath):
+    """
+    Возвращает заголовок сжатого файла без распаковки сегментов.
+    """
+    with open(filepath, 'rb') as file:
+        return _read_header(file)[0]
+
+
+def _segment_matches(segment, record_ids):
+    """
+    Проверяет, может ли сегмент содержать хотя бы один из ID.
+    """
+    if segment['min_id'] is None:
+        return False
+    low, high = segment['min_id'], segment['max_id']
+    return any(low <= record_id <= high for record_id in record_ids)
+
+
+def _segment_may_match(segment, condition):
+    """
+    Проверяет по минимуму и максимуму столбца, могут ли в сегменте быть
+    записи под условие (столбец, оператор, значение).
+    """
+    column, op, value = condition
+    value_range = segment.get('ranges', {}).get(column)
+    if value_range is None:
+        return True
+    low, high = value_range
+    try:
+        if op == '=':
+            return low <= value <= high
+        if op == '<':
+            return low < value
+        if op == '<=':
+            return low <= value
+        if op == '>':
+            return high > value
+        if op == '>=':
+            return high >= value
+    except TypeError:
+        return True
+    return True
+
+
+def _decode_segment(header, raw, segment):
+    """
+    Восстанавливает записи распакованного сегмента.
+    """
+    if header['version'] == 1:
+        return _decode_columns_v1(json.loads(raw), segment['rows'])
+    return _decode_columns(raw, segment['rows'])
+
+
+def iter_segments(filepath, record_ids=None, condition=None):
+    """
+    Потоково читает сжатый файл, выдавая записи по одному сегменту.
+    Если заданы record_ids, распаковываются только сегменты, в диапазон ID
+    которых попадает хотя бы один из них; если задано условие
+    (столбец, оператор, значение) — только сегменты, диапазон значений
+    столбца в которых пересекается с условием.
+    """
+    with open(filepath, 'rb') as file:
+        header, data_start = _read_header(file)
+        decompress = _CODECS[header['codec']][1]
+        for segment in header['segments']:
+            if record_ids is not None and not _segment_matches(segment, record_ids):
+                continue
+            if condition is not None and not _segment_may_match(segment, condition):
+                continue
+            file.seek(data_start + segment['offset'])
+            raw = decompress(file.read(segment['length']))
+            yield _decode_segment(header, raw, segment)
+
+
+def read_segments(filepath, record_ids=None):
+    """
+    Читает записи из сжатого файла (см. iter_segments).
+    """
+    rows = []
+    for chunk in iter_segments(filepath, record_ids):
+        rows.extend(chunk)
+    return rows
+
+
+def segment_stats(filepath):
+    """
+    Возвращает статистику сжатого файла по его заголовку, не распаковывая
+    сегменты.
+    """
+    header = read_header(filepath)
+    segments = header['segments']
+    return {
+        'codec': header['codec'],
+        'segments': len(segments),
+        'rows': sum(segment['rows'] for segment in segments),
+        'raw_size': sum(segment.get('raw_size', 0) for segment in segments),
+        'stored_size': sum(segment['length'] for segment in segments),
+    }
+
+
+def sample_segments(filepath, count):
+    """
+    Распаковывает до count сегментов, равномерно выбранных по файлу, и
+    измеряет время распаковки. Возвращает {'segments', 'raw_size',
+    'json_size', 'seconds'} по выбранным сегментам.
+    """
+    sample = {'segments': 0, 'raw_size': 0, 'json_size': 0, 'seconds': 0.0}
+    with open(filepath, 'rb') as file:
+        header, data_start = _read_header(file)
+        segments = header['segments']
+        if not segments or count <= 0:
+            return sample
+        decompress = _CODECS[header['codec']][1]
+        chosen = min(count, len(segments))
+        positions = sorted({(len(segments) - 1) * i // max(chosen - 1, 1)
+                            for i in range(chosen)})
+        for segment in (segments[position] for position in positions):
+            file.seek(data_start + segment['offset'])
+            data = file.read(segment['length'])
+            start = time.perf_counter()
+            raw = decompress(data)
+            rows = _decode_segment(header, raw, segment)
+            sample['seconds'] += time.perf_counter() - start
+            sample['segments'] += 1
+            sample['raw_size'] += len(raw)
+            sample['json_size'] += len(json.dumps(rows, indent=2, ensure_ascii=False)
+                                       .encode('utf-8'))
+    return sample
@@ -6,9 +6,38 @@
 # Пути к файлам
 META_FILE = "db_meta.json"
 DATA_DIR = "data"
+CATALOG_DIR = f"{DATA_DIR}/_catalog"
+CATALOG_VERSION_FILE = f"{CATALOG_DIR}/VERSION"
+# Устаревшее расположение параметров таблиц (переносится в каталог)
+OPTIONS_DIR = f"{DATA_DIR}/_options"
 
-# Поддерживаемые типы данных
-VALID_TYPES = {'int', 'str', 'bool'}
+# Поддерживаемые типы данных (тип с суффиксом NULLABLE_SUFFIX допускает NULL)
+VALID_TYPES = {'int', 'str', 'bool', 'float', 'date', 'timestamp'}
+NULLABLE_SUFFIX = '?'
+NULL_LITERAL = 'null'
+
+# Операторы сравнения в условии WHERE
+WHERE_OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'contains', 'like')
+# Операторы поиска текста (без учета регистра)
+TEXT_OPERATORS = ('contains', 'like')
+
+# Способы партиционирования таблиц
+PARTITION_KINDS = {'range', 'hash'}
+
+# Сжатие файлов таблиц
+COMPRESSION_CODECS = {'none', 'dict', 'zlib', 'lzma'}
+SEGMENT_ROWS = 1000
+# info: скорость распаковки и размер в JSON оцениваются по стольким сегментам
+COMPRESSION_SAMPLE_SEGMENTS = 4
+
+# Отложенная запись (write-behind)
+WAL_PREFIX = f"{DATA_DIR}/_wal/wal"
+FLUSH_INTERVAL = 5.0
+FLUSH_DIRTY_BYTES = 1024 * 1024
+WAL_FSYNC = True
+
+# Параметры, допустимые в create_table ... with ключ=значение
+CREATE_TABLE_OPTIONS = {'compression', 'ttl'}
 
 # Сообщения для пользователя
 WELCOME_MESSAGE = "***База данных***"
@@ -19,6 +48,7 @@ SUCCESS_MESSAGE_TABLE_CREATED = 'Таблица "{}" успешно создан
 SUCCESS_MESSAGE_TABLE_DROPPED = 'Таблица "{}" успешно удалена.'
 ERROR_MESSAGE_INVALID_TYPE = 'Ошибка: Неподдерживаемый тип данных "{}".'
 ERROR_MESSAGE_INVALID_COLUMN_FORMAT = 'Ошибка: Некорректный формат столбца "{}".'
+ERROR_MESSAGE_INVALID_COMPRESSION = 'Ошибка: Неподдерживаемый кодек сжатия "{}".'
 # Сообщения для декораторов
 CONFIRM_MESSAGES = {
     "CONFIRM_ACTION": '❓ Вы уверены, что хотите выполнить "{}"? [y/n]: ',
@@ -34,3 +64,98 @@ ERROR_MESSAGES = {
 
 # Кэширование
 CACHE_ENABLED = True
+
+# Соединение таблиц: размер пакета внешних строк для index nested loop
+JOIN_BATCH_ROWS = 1000
+
+# Лимит памяти на запрос (сортировка, группировка, хэш-соединение), байт;
+# при превышении данные сбрасываются во временные файлы в SPILL_DIR
+# (None — системный каталог временных файлов) по SPILL_PARTITIONS разделам
+QUERY_MEMORY_LIMIT = 64 * 1024 * 1024
+SPILL_DIR = None
+SPILL_PARTITIONS = 16
+SPILL_MERGE_FANIN = 64
+SPILL_MAX_DEPTH = 3
+
+# Фильтры Блума: доля ложных срабатываний и минимальная емкость;
+# HyperLogLog: точность (2 ** HLL_PRECISION регистров, ошибка около 3%)
+BLOOM_ERROR_RATE = 0.01
+BLOOM_MIN_CAPACITY = 1024
+HLL_PRECISION = 10
+# Структуры перестраиваются, когда удаленных или измененных записей
+# накопилось больше этой доли записей таблицы
+SKETCH_REBUILD_FRACTION = 0.5
+# Изменения структур копятся в памяти и записываются в файл не реже,
+# чем через столько измененных записей (и при flush, snapshot и выходе)
+SKETCH_SAVE_CHANGES = 1000
+
+# Виды индексов в create_index ... using <вид>
+INDEX_KINDS = ('hash', 'bloom', 'fulltext')
+
+# Планировщик запросов: условная стоимость просмотра записи, чтения записи
+# без проверки условия (по ID), поиска по индексу и ключа индекса
+PLAN_SCAN_ROW_COST = 1.0
+PLAN_FETCH_ROW_COST = 1.0
+PLAN_INDEX_COST = 20.0
+PLAN_INDEX_KEY_COST = 0.05
+# Дополнительная стоимость проверки contains/like для записи при просмотре
+PLAN_TEXT_MATCH_COST = 0.5
+# Статистика analyze: корзины гистограммы, размер выборки, количество
+# частых значений, доля изменений, после которой статистика собирается заново
+HISTOGRAM_BUCKETS = 16
+ANALYZE_SAMPLE_ROWS = 10000
+ANALYZE_COMMON_VALUES = 8
+ANALYZE_STALE_FRACTION = 0.2
+# Кэш результатов select: сколько запросов и до скольки записей в каждом
+RESULT_CACHE_ENTRIES = 64
+RESULT_CACHE_ROWS = 1000
+
+# Потоковое чтение JSON файлов: размер читаемого куска в символах
+JSON_CHUNK_SIZE = 64 * 1024
+
+# Время жизни записей: период фоновой очистки (сек) и сколько истекших
+# записей таблицы удаляется за один проход
+TTL_SWEEP_INTERVAL = 5.0
+TTL_SWEEP_BATCH = 500
+
+# Полнотекстовый индекс: размер n-грамм по умолчанию (using fulltext ngram)
+# и параметры ранжирования BM25
+FULLTEXT_NGRAM = 3
+FULLTEXT_BM25_K1 = 1.2
+FULLTEXT_BM25_B = 0.75
+# Изменения полнотекстового индекса копятся в памяти и записываются
+# в файл не реже, чем через столько измененных записей
+FULLTEXT_SAVE_CHANGES = 1000
+
+# Асинхронный ввод-вывод: потоков для чтения, разбора и записи файлов
+AIO_WORKERS = 4
+
+# Экспорт таблиц: поддерживаемые форматы файлов
+EXPORT_FORMATS = ('csv', 'jsonl')
+# merge <таблица> from <файл>: сколько строк файла применяется одной записью
+MERGE_BATCH_ROWS = 1000
+# Вывод select: результат печатается частями по столько строк,
+# поэтому не собирается в памяти целиком
+PRINT_CHUNK_ROWS = 1000
+
+# Отображение отсутствующего значения (NULL) при выводе таблиц
+NULL_DISPLAY = 'NULL'
+
+# Журнал изменений для репликации: сегменты по CHANGELOG_SEGMENT_ENTRIES
+# записей, хранятся последние CHANGELOG_RETAIN_SEGMENTS сегментов
+CHANGELOG_DIR = f"{DATA_DIR}/_changelog"
+CHANGELOG_SEGMENT_ENTRIES = 10000
+CHANGELOG_RETAIN_SEGMENTS = 10
+CHANGELOG_FSYNC = False
+
+# Поток изменений (CDC): подтвержденные позиции подписчиков, период опроса
+# асинхронного потока и сколько событий показывает команда changes
+CDC_OFFSETS_FILE = f"{CHANGELOG_DIR}/_offsets.json"
+CDC_POLL_INTERVAL = 0.5
+CDC_DISPLAY_LIMIT = 50
+
+# Реплика: состояние, период опроса ведущего и отставание (в записях журнала),
+# при котором реплика догоняет ведущего через снимок, а не журнал
+REPLICA_STATE_FILE = f"{DATA_DIR}/_replica.json"
+REPLICA_POLL_INTERVAL = 1.0
+REPLICA_CATCHUP_ENTRIES = 100000
@@ -2,25 +2,124 @@
 Основной модуль бизнес-логики базы данных.
 """
 
+import json
+from collections import Counter
+from itertools import islice
+
+from .catalog import get_catalog, load_table_options, save_table_options
+from .cdc import changes
+from .changelog import first_seq, get_changelog, log_schema_change
+from .codec import base_type, get_codec, is_valid_type
 from .constants import (
-    CACHE_ENABLED,
+    CDC_DISPLAY_LIMIT,
+    COMPRESSION_CODECS,
     ERROR_MESSAGE_INVALID_COLUMN_FORMAT,
+    ERROR_MESSAGE_INVALID_COMPRESSION,
     ERROR_MESSAGE_INVALID_TYPE,
     ERROR_MESSAGE_TABLE_EXISTS,
     ERROR_MESSAGE_TABLE_NOT_EXISTS,
+    NULL_DISPLAY,
+    PRINT_CHUNK_ROWS,
     SUCCESS_MESSAGE_TABLE_CREATED,
     SUCCESS_MESSAGE_TABLE_DROPPED,
-    VALID_TYPES,
 )
-from .decorators import cacher, confirm_action, handle_db_errors, log_time
+from .decorators import confirm_action, handle_db_errors, log_time
+from .events import Change, publish
+from .export import export_format, export_rows
+from .fulltext import (
+    build_fulltext,
+    describe_fulltext,
+    drop_fulltext,
+    drop_fulltext_indexes,
+    flush_fulltext,
+    has_fulltext,
+    rank,
+    rename_fulltext,
+    search,
+    searchable,
+)
+from .indexes import (
+    build_index,
+    drop_index,
+    drop_indexes,
+    has_index,
+    lookup,
+    lookup_range,
+    rename_index,
+)
+from .join import execute_join
+from .merge import Excluded, batches, parse_row, read_rows, upsert_rows
 from .parser import parse_values
-from .utils import load_table_data, save_metadata, save_table_data
+from .partition import describe_partition, validate_partition
+from .planner import (
+    analyze_table,
+    candidate_plans,
+    choose_plan,
+    definitely_absent,
+    results,
+)
+from .schema import apply_change, convert_default
+from .sketches import (
+    create_bloom,
+    distinct_estimate,
+    drop_bloom,
+    flush_sketches,
+    has_bloom,
+    invalidate_sketches,
+    rebuild_sketches,
+    rename_bloom,
+)
+from .spill import (
+    external_sort,
+    get_memory_limit,
+    hash_count,
+    set_memory_limit,
+    sort_key,
+)
+from .storage import (
+    apply_changes,
+    compact_table,
+    compression_stats,
+    count_rows,
+    drop_table_files,
+    estimate_size,
+    fetch_records,
+    flush_tables,
+    insert_record,
+    load_partitions,
+    load_rows,
+    save_partitions,
+    scan,
+    set_compression,
+    snapshot_files,
+    start_write_behind,
+    stop_write_behind,
+)
+from .sweeper import sweep
+from .ttl import (
+    build_expiry_index,
+    describe_ttl,
+    drop_expiry_index,
+    expired_entries,
+    expired_predicate,
+    ttl_spec,
+    validate_ttl,
+)
+from .views import (
+    dependent_views,
+    describe_view,
+    refresh_view,
+    view_spec,
+    views_of,
+)
 
 
 @handle_db_errors
-def create_table(metadata, table_name, columns):
+def create_table(metadata, table_name, columns, options=None):
     """
     Создает новую таблицу в базе данных.
+    options — параметры хранения из parse_create_table
+    (partition, compression).
     """
     if table_name in metadata:
         print(ERROR_MESSAGE_TABLE_EXISTS.format(table_name))
@@ -31,7 +130,7 @@ def create_table(metadata, table_name, columns):
     for column in columns:
         try:
             col_name, col_type = column.split(':')
-            if col_type not in VALID_TYPES:
+            if not is_valid_type(col_type):
                 print(ERROR_MESSAGE_INVALID_TYPE.format(col_type))
                 return metadata
             columns_with_id.append((col_name, col_type))
@@ -40,12 +139,32 @@ def create_table(metadata, table_name, columns):
             return metadata
 
     table_structure = {col[0]: col[1] for col in columns_with_id}
+    options = dict(options or {})
+    partition = options.get('partition')
+    if partition:
+        validate_partition(partition, table_structure)
+        options['partitions'] = []
+    if options.get('compression', 'none') not in COMPRESSION_CODECS:
+        print(ERROR_MESSAGE_INVALID_COMPRESSION.format(options['compression']))
+        return metadata
+    if options.get('ttl'):
+        validate_ttl(options['ttl'], table_structure)
+
+    get_catalog().add_table(table_name, table_structure, options)
     metadata[table_name] = table_structure
+    if options.get('ttl'):
+        build_expiry_index(table_name, [])
+    log_schema_change('create', table_name, schema=table_structure, options=options)
 
     columns_str = ", ".join([f"{col[0]}:{col[1]}" for col in columns_with_id])
     print(SUCCESS_MESSAGE_TABLE_CREATED.format(table_name, columns_str))
+    if partition:
+        print(f'🧩 Партиционирование: {describe_partition(partition)}')
+    if options.get('compression', 'none') != 'none':
+        print(f'🗜️  Сжатие: {options["compression"]}')
+    if options.get('ttl'):
+        print(f'⏳ Время жизни записей: {describe_ttl(options["ttl"])}')
 
-    save_metadata(metadata)
     return metadata
 
 
@@ -59,10 +178,24 @@ def drop_table(metadata, table_name):
         print(ERROR_MESSAGE_TABLE_NOT_EXISTS.format(table_name))
         return metadata
 
-    del metadata[table_name]
+    views = views_of(table_name)
+    if views:
+        print(f'❌ Ошибка: От таблицы "{table_name}" зависят представления: '
+              f'{", ".join(views)}. Сначала удалите их.')
+        return metadata
+
+    # Удаляем индексы и файлы данных, затем запись в каталоге
+    drop_indexes(table_name)
+    drop_fulltext_indexes(table_name)
+    drop_expiry_index(table_name)
+    invalidate_sketches(table_name)
+    results.invalidate(table_name)
+    drop_table_files(table_name)
+    get_catalog().remove_table(table_name)
+    metadata.pop(table_name, None)
+    log_schema_change('drop', table_name)
     print(SUCCESS_MESSAGE_TABLE_DROPPED.format(table_name))
 
-    save_metadata(metadata)
     return metadata
 
 
@@ -76,7 +209,20 @@ def list_tables(metadata):
     else:
         print("📋 Список таблиц:")
         for table_name in metadata:
-            print(f"  - {table_name}")
+            suffix = " (представление)" if view_spec(table_name) else ""
+            print(f"  - {table_name}{suffix}")
+
+
+def _reject_view(table_name):
+    """
+    Сообщает об ошибке, если таблица — материализованное представление
+    (оно изменяется только вместе с исходной таблицей).
+    """
+    if view_spec(table_name):
+        print(f'❌ Ошибка: "{table_name}" — материализованное представление, '
+              f'оно доступно только для чтения.')
+        return True
+    return False
 
 
 @handle_db_errors
@@ -88,6 +234,8 @@ def insert(metadata, table_name, values_str):
     if table_name not in metadata:
         print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
         return
+    if _reject_view(table_name):
+        return
 
     # Парсим значения
     try:
@@ -96,111 +244,431 @@ def insert(metadata, table_name, values_str):
         print(f'❌ Ошибка парсинга значений: {e}')
         return
 
-    table_structure = metadata[table_name]
-    data_columns = [col for col in table_structure.keys() if col != 'ID']
+    codec = get_codec(metadata[table_name])
 
     # Проверяем количество значений
-    if len(values) != len(data_columns):
-        expected = len(data_columns)
+    if len(values) != len(codec.data_columns):
+        expected = len(codec.data_columns)
         received = len(values)
         print(f'❌ Ошибка: Ожидалось {expected} значений, получено {received}.')
         return
 
-    # Загружаем существующие данные
-    table_data = load_table_data(table_name)
+    # Валидируем и преобразуем значения
+    try:
+        fields = codec.encode(values)
+    except ValueError as e:
+        print(f'❌ Ошибка преобразования типа для столбца {e}')
+        return
 
-    # Генерируем новый ID
-    if table_data:
-        new_id = max(item['ID'] for item in table_data) + 1
-    else:
-        new_id = 1
+    # Добавляем запись и сохраняем (генерация ID внутри слоя хранения)
+    new_id = insert_record(table_name, fields)
+    publish(table_name, [Change('insert', None, {'ID': new_id, **fields})])
+    msg = f'✅ Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".'
+    print(msg)
 
-    # Создаем новую запись
-    new_record = {'ID': new_id}
 
-    # Валидируем и преобразуем значения
-    for i, column in enumerate(data_columns):
-        value = values[i]
-        col_type = table_structure[column]
+def _print_merge_counts(table_name, counts):
+    """
+    Выводит итог upsert или merge.
+    """
+    msg = (f'✅ Таблица "{table_name}": добавлено записей {counts["inserted"]}, '
+           f'обновлено {counts["updated"]}')
+    if counts['skipped']:
+        msg += f', пропущено {counts["skipped"]}'
+    print(msg + '.')
 
-        try:
-            if col_type == 'int':
-                new_record[column] = int(value)
-            elif col_type == 'bool':
-                if value.lower() in ['true', '1', 'yes', 'да']:
-                    new_record[column] = True
-                elif value.lower() in ['false', '0', 'no', 'нет']:
-                    new_record[column] = False
-                else:
-                    msg = f"Некорректное булево значение: {value}"
-                    raise ValueError(msg)
-            else:  # str
-                if (value.startswith('"') and value.endswith('"')) or \
-                   (value.startswith("'") and value.endswith("'")):
-                    value = value[1:-1]
-                new_record[column] = value
-        except ValueError as e:
-            print(f'❌ Ошибка преобразования типа для столбца {column}: {e}')
+
+@handle_db_errors
+@log_time
+def upsert(metadata, spec):
+    """
+    Вставляет запись, а если запись с тем же значением столбца конфликта
+    уже есть — обновляет ее (или ничего не делает для do nothing).
+    Поиск конфликта и запись выполняются за один проход по таблице.
+    """
+    table_name, key = spec['table'], spec['key']
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+    if _reject_view(table_name):
+        return
+
+    table_structure = metadata[table_name]
+    for column in [key] + [column for column, _ in spec['set'] or []]:
+        if column not in table_structure:
+            print(f'❌ Ошибка: Столбец "{column}" не существует.')
             return
+    if any(column == 'ID' for column, _ in spec['set'] or []):
+        print('❌ Ошибка: Столбец ID нельзя изменить.')
+        return
 
-    # Добавляем запись и сохраняем
-    table_data.append(new_record)
-    save_table_data(table_name, table_data)
-    msg = f'✅ Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".'
-    print(msg)
+    try:
+        values = parse_values(spec['values'])
+    except Exception as e:
+        print(f'❌ Ошибка парсинга значений: {e}')
+        return
+
+    codec = get_codec(table_structure)
+    # При конфликте по ID первым значением можно указать ID записи
+    record_id = values.pop(0) if key == 'ID' and \
+        len(values) == len(codec.data_columns) + 1 else None
+    if len(values) != len(codec.data_columns):
+        expected = len(codec.data_columns)
+        print(f'❌ Ошибка: Ожидалось {expected} значений, получено {len(values)}.')
+        return
+
+    try:
+        row = codec.encode(values)
+        if record_id is not None:
+            row['ID'] = codec.convert('ID', record_id)
+        assignments = None
+        if spec['set'] is not None:
+            assignments = {
+                column: Excluded(value.split('.', 1)[1])
+                if value.lower().startswith('excluded.')
+                else codec.convert_update(column, value)
+                for column, value in spec['set']
+            }
+    except ValueError as e:
+        print(f'❌ Ошибка преобразования типа для столбца {e}')
+        return
+    for value in (assignments or {}).values():
+        if isinstance(value, Excluded) and value.column not in table_structure:
+            print(f'❌ Ошибка: Столбец "{value.column}" не существует.')
+            return
+
+    counts = upsert_rows(table_name, codec, [row], key, assignments,
+                         do_nothing=spec['set'] is None)
+    _print_merge_counts(table_name, counts)
 
 
-def _perform_select(metadata, table_name, where_clause=None):
+@handle_db_errors
+@log_time
+def merge(metadata, table_name, filepath, key='ID'):
     """
-    Внутренняя функция для выполнения SELECT (отделена для кэширования).
+    Сливает с таблицей строки файла CSV или JSON Lines: строки с новым
+    значением ключа вставляются, у записей с тем же ключом обновляются
+    столбцы, заданные в строке. Файл читается потоком и применяется
+    пакетами, каждый пакет — одной записью таблицы.
     """
-    from prettytable import PrettyTable
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+    if _reject_view(table_name):
+        return
+    if key not in metadata[table_name]:
+        print(f'❌ Ошибка: Столбец "{key}" не существует.')
+        return
+
+    codec = get_codec(metadata[table_name])
+    counts = Counter()
+    number = 0
+    try:
+        for batch in batches(read_rows(filepath)):
+            rows = []
+            for fields in batch:
+                number += 1
+                rows.append(parse_row(codec, fields, key))
+            counts.update(upsert_rows(table_name, codec, rows, key))
+    except ValueError as e:
+        print(f'❌ Ошибка в файле "{filepath}" (прочитано строк: {number}): {e}.')
+        if counts:
+            _print_merge_counts(table_name, counts)
+        return
+    _print_merge_counts(table_name, counts)
+
+
+def _perform_select(metadata, table_name, where_clause=None, order_by=None):
+    """
+    Внутренняя функция для выполнения SELECT по плану планировщика.
+    С order_by записи читаются потоком и сортируются с ограничением памяти,
+    а без него результат поиска по полнотекстовому индексу упорядочивается
+    по релевантности. Результат печатается по частям, небольшие результаты
+    сохраняются в кэше результатов.
+    """
+    codec = get_codec(metadata[table_name])
+    cache_key = (table_name, tuple(where_clause) if where_clause else None,
+                 tuple(order_by) if order_by else None)
+    plan = choose_plan(table_name, codec, where_clause, cache_key)
+    scores = None
+    if plan.access == 'fulltext' or \
+            (plan.access != 'cache' and not order_by and
+             searchable(table_name, where_clause)):
+        column, value, op = where_clause
+        scores = search(table_name, column, op, value)
+    if plan.access == 'cache':
+        table_data = results.get(cache_key) or []
+    elif plan.access == 'empty':
+        table_data = []
+    elif plan.access == 'index':
+        # Поиск по индексу: читаются только записи с найденными ID
+        column, op, value = codec.condition(where_clause)
+        if op == '=':
+            record_ids = lookup(table_name, column, value)
+        else:
+            record_ids = lookup_range(table_name, column, op, value,
+                                      lambda key: codec.convert(column, key))
+        table_data = fetch_records(table_name, record_ids)
+    elif plan.access == 'fulltext':
+        # Поиск по словам запроса: читаются только найденные записи
+        table_data = fetch_records(table_name, list(scores))
+    elif order_by:
+        table_data = scan(table_name, where_clause, codec)
+    else:
+        table_data = load_rows(table_name, where_clause, codec)
+
+    spill_stats = {}
+    if plan.access != 'cache':
+        # Фильтруем данные если есть условие
+        if where_clause:
+            matches = codec.matcher(*where_clause)
+            table_data = (record for record in table_data if matches(record))
+        if order_by:
+            column, descending = order_by
+            table_data = external_sort(table_data, sort_key(column), descending,
+                                       stats=spill_stats)
+        elif scores is not None:
+            table_data = rank(table_data, scores)
 
-    from .utils import load_table_data
+    collected = []
 
-    table_data = load_table_data(table_name)
+    def display_rows():
+        nonlocal collected
+        for record in table_data:
+            if collected is not None:
+                collected.append(record)
+                if len(collected) > results.max_rows:
+                    collected = None
+            yield _display(codec.decode(record))
+
+    printed = _print_table(codec.columns, display_rows(),
+                           print_empty=bool(where_clause))
+    if collected is not None and plan.access != 'cache':
+        results.put(cache_key, collected)
 
-    if not table_data:
+    if not printed and not where_clause:
         print("📭 Таблица пуста.")
         return
+    if spill_stats.get('spilled'):
+        print(f"💾 Сортировка не поместилась в память: временных файлов "
+              f"{spill_stats['spilled']}.")
 
-    # Фильтруем данные если есть условие
-    if where_clause:
-        column, value = where_clause
-        filtered_data = []
-        for record in table_data:
-            record_value = record.get(column)
-            if str(record_value) == value:
-                filtered_data.append(record)
-        table_data = filtered_data
 
-    # Создаем красивую таблицу для вывода
+def _display(row):
+    """
+    Возвращает строку для вывода (NULL показывается как NULL_DISPLAY).
+    """
+    return [NULL_DISPLAY if value is None else value for value in row]
+
+
+def _print_table(field_names, rows, print_empty=True):
+    """
+    Печатает строки таблицей по частям из PRINT_CHUNK_ROWS строк, поэтому
+    большой результат не собирается в памяти. Заголовок печатается один раз,
+    ширина столбцов каждой части подбирается по ее строкам.
+    Возвращает количество напечатанных строк.
+    """
+    from prettytable import PrettyTable
+
+    printed = 0
+    for chunk in batches(rows, PRINT_CHUNK_ROWS):
+        table = PrettyTable(field_names)
+        table.add_rows(chunk)
+        if not printed:
+            print(table)
+        else:
+            # Нижняя граница предыдущей части отделяет ее от следующей
+            print(table.get_string(header=False).split('\n', 1)[1])
+        printed += len(chunk)
+    if not printed and print_empty:
+        print(PrettyTable(field_names))
+    return printed
+
+
+@handle_db_errors
+@log_time
+def select(metadata, table_name, where_clause=None, order_by=None):
+    """
+    Выбирает данные из таблицы.
+    """
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+    if order_by and order_by[0] not in metadata[table_name]:
+        print(f'❌ Ошибка: Столбец "{order_by[0]}" не существует.')
+        return
+
+    _perform_select(metadata, table_name, where_clause, order_by)
+
+
+@handle_db_errors
+@log_time
+def analyze(metadata, table_name):
+    """
+    Собирает статистику таблицы для планировщика запросов и выводит ее.
+    """
+    from prettytable import PrettyTable
+
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+
+    stats = analyze_table(table_name)
     table = PrettyTable()
-    table.field_names = metadata[table_name].keys()
+    table.field_names = ['Столбец', 'NULL', 'Различных', 'Мин.', 'Макс.']
+    for column, column_stats in stats.items():
+        low, high = column_stats['min'], column_stats['max']
+        table.add_row([column, column_stats['nulls'], column_stats['distinct'],
+                       NULL_DISPLAY if low is None else low,
+                       NULL_DISPLAY if high is None else high])
+    print(table)
+    rows = get_catalog().stats(table_name)['rows']
+    print(f'📊 Статистика таблицы "{table_name}" собрана: записей {rows}.')
+
+
+@handle_db_errors
+def explain(metadata, table_name, where_clause=None, order_by=None):
+    """
+    Показывает план запроса select и оценки стоимости других планов.
+    """
+    from prettytable import PrettyTable
 
-    for record in table_data:
-        row = [record.get(field, '') for field in table.field_names]
-        table.add_row(row)
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+    if order_by and order_by[0] not in metadata[table_name]:
+        print(f'❌ Ошибка: Столбец "{order_by[0]}" не существует.')
+        return
 
+    codec = get_codec(metadata[table_name])
+    cache_key = (table_name, tuple(where_clause) if where_clause else None,
+                 tuple(order_by) if order_by else None)
+    plans = candidate_plans(table_name, codec, where_clause, cache_key)
+    table = PrettyTable()
+    table.field_names = ['План', 'Записей (оценка)', 'Стоимость', 'Подробности']
+    for plan in plans:
+        table.add_row([plan.access, round(plan.rows), round(plan.cost, 1), plan.detail])
+    print(f'🧭 План запроса: {plans[0].access}')
     print(table)
+    if order_by and plans[0].access != 'cache':
+        print(f'↕️  Сортировка по {order_by[0]} с ограничением памяти.')
 
 
 @handle_db_errors
 @log_time
-def select(metadata, table_name, where_clause=None):
+def select_join(metadata, spec):
     """
-    Выбирает данные из таблицы.
+    Выбирает данные из соединения двух таблиц.
+    """
+    for table_name in (spec['left'], spec['right']):
+        if table_name not in metadata:
+            print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+            return
+    for side in ('left', 'right'):
+        column = spec[f'{side}_column']
+        if column not in metadata[spec[side]]:
+            print(f'❌ Ошибка: Столбец "{spec[side]}.{column}" не существует.')
+            return
+
+    where = spec['where']
+    if where:
+        table_name, column, *condition = where
+        if table_name is None:
+            owners = [name for name in (spec['left'], spec['right'])
+                      if column in metadata[name]]
+            if len(owners) != 1:
+                print(f'❌ Ошибка: Неоднозначный или неизвестный столбец "{column}".')
+                return
+            table_name = owners[0]
+        elif table_name not in (spec['left'], spec['right']) \
+                or column not in metadata[table_name]:
+            print(f'❌ Ошибка: Столбец "{table_name}.{column}" не существует.')
+            return
+        spec = {**spec, 'where': (table_name, column, *condition)}
+
+    spill_stats = {}
+    strategy, pairs = execute_join(metadata, spec, spill_stats)
+
+    left_codec = get_codec(metadata[spec['left']])
+    right_codec = get_codec(metadata[spec['right']])
+    field_names = [f"{spec['left']}.{col}" for col in left_codec.columns] + \
+        [f"{spec['right']}.{col}" for col in right_codec.columns]
+    _print_table(field_names, (
+        _display(left_codec.decode(left_record) + right_codec.decode(right_record))
+        for left_record, right_record in pairs))
+    print(f'🔗 Стратегия соединения: {strategy}')
+    if spill_stats.get('spilled'):
+        print(f"💾 Хэш-таблица не поместилась в память: временных файлов "
+              f"{spill_stats['spilled']}.")
+
+
+@handle_db_errors
+@log_time
+def select_count(metadata, table_name, where_clause=None, group_by=None,
+                 distinct=None):
+    """
+    Считает записи таблицы (с группировкой по столбцу — для каждого значения).
+    Группы считаются хэш-агрегацией с ограничением памяти.
+    count(distinct) без условия берется из оценки HyperLogLog без чтения данных.
     """
     if table_name not in metadata:
         print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
         return
+    for column in (group_by, distinct):
+        if column and column not in metadata[table_name]:
+            print(f'❌ Ошибка: Столбец "{column}" не существует.')
+            return
+    if group_by and distinct:
+        print('❌ Ошибка: count(distinct) с group by не поддерживается.')
+        return
+
+    if distinct and distinct != 'ID' and not where_clause:
+        estimate = distinct_estimate(table_name, distinct)
+        print(f"Различных значений {distinct}: ≈{estimate} (оценка HyperLogLog)")
+        return
 
-    # Используем кэширование для часто выполняемых запросов
-    if CACHE_ENABLED and where_clause:
-        cache_key = f"select_{table_name}_{where_clause[0]}_{where_clause[1]}"
-        cacher(cache_key, lambda: _perform_select(metadata, table_name, where_clause))
+    codec = get_codec(metadata[table_name])
+    if definitely_absent(table_name, codec.condition(where_clause)
+                         if where_clause else None):
+        rows = iter(())
     else:
-        _perform_select(metadata, table_name, where_clause)
+        rows = scan(table_name, where_clause, codec)
+    if where_clause:
+        matches = codec.matcher(*where_clause)
+        rows = (record for record in rows if matches(record))
+
+    if distinct:
+        values = ((record[distinct], 1) for record in rows
+                  if record.get(distinct) is not None)
+        count = sum(1 for _ in hash_count(values))
+        print(f"Различных значений {distinct}: {count}")
+        return
+    if not group_by:
+        print(f"Количество записей: {sum(1 for _ in rows)}")
+        return
+
+    spill_stats = {}
+    groups = hash_count(((record.get(group_by), 1) for record in rows),
+                        stats=spill_stats)
+    groups = external_sort(({group_by: value, 'count': count}
+                            for value, count in groups),
+                           sort_key(group_by), stats=spill_stats)
+    _print_table([group_by, 'count'],
+                 (_display([group[group_by], group['count']]) for group in groups))
+    if spill_stats.get('spilled'):
+        print(f"💾 Группировка не поместилась в память: временных файлов "
+              f"{spill_stats['spilled']}.")
+
+
+@handle_db_errors
+def memory_limit(limit=None):
+    """
+    Показывает или устанавливает лимит памяти на запрос
+    (сортировка, группировка, хэш-соединение).
+    """
+    if limit is not None:
+        set_memory_limit(limit)
+    print(f'🧠 Лимит памяти на запрос: {get_memory_limit()} байт.')
 
 
 @handle_db_errors
@@ -213,12 +681,14 @@ def update(metadata, table_name, set_clause, where_clause):
         print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
         return
 
-    table_data = load_table_data(table_name)
+    if _reject_view(table_name):
+        return
+
     table_structure = metadata[table_name]
     updated_count = 0
 
     set_column, new_value = set_clause
-    where_column, where_value = where_clause
+    where_column = where_clause[0]
 
     # Проверяем существование столбцов
     if set_column not in table_structure:
@@ -229,31 +699,39 @@ def update(metadata, table_name, set_clause, where_clause):
         print(f'❌ Ошибка: Столбец "{where_column}" не существует.')
         return
 
+    codec = get_codec(table_structure)
+    if definitely_absent(table_name, codec.condition(where_clause)):
+        print('❌ Записи для обновления не найдены.')
+        return
+    matches = codec.matcher(*where_clause)
+    # Истекшие записи таблицы с TTL невидимы и не изменяются
+    expired = expired_predicate(ttl_spec(table_name))
+    partitions = load_partitions(table_name, where_clause, codec)
+    changed = {}
+    changes = []
+
     # Обновляем записи
-    for record in table_data:
-        if str(record.get(where_column)) == where_value:
-            # Преобразуем новое значение к правильному типу
-            col_type = table_structure[set_column]
-            try:
-                if col_type == 'int':
-                    record[set_column] = int(new_value)
-                elif col_type == 'bool':
-                    if new_value.lower() in ['true', '1', 'yes', 'да']:
-                        record[set_column] = True
-                    elif new_value.lower() in ['false', '0', 'no', 'нет']:
-                        record[set_column] = False
+    for key, table_data in partitions.items():
+        for record in table_data:
+            if matches(record) and not expired(record):
+                # Преобразуем новое значение к правильному типу
+                try:
+                    before = dict(record)
+                    value = codec.convert_update(set_column, new_value)
+                    if value is None:
+                        record.pop(set_column, None)
                     else:
-                        msg = f"Некорректное булево значение: {new_value}"
-                        raise ValueError(msg)
-                else:  # str
-                    record[set_column] = new_value
-                updated_count += 1
-            except ValueError as e:
-                print(f'❌ Ошибка преобразования типа: {e}')
-                return
+                        record[set_column] = value
+                    changes.append(Change('update', before, record))
+                    updated_count += 1
+                except ValueError as e:
+                    print(f'❌ Ошибка преобразования типа: {e}')
+                    return
+                changed[key] = table_data
 
     if updated_count > 0:
-        save_table_data(table_name, table_data)
+        save_partitions(table_name, changed)
+        publish(table_name, changes)
         msg = f'✅ Обновлено {updated_count} записей в таблице "{table_name}".'
         print(msg)
     else:
@@ -271,28 +749,64 @@ def delete(metadata, table_name, where_clause):
         print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
         return
 
-    table_data = load_table_data(table_name)
-    where_column, where_value = where_clause
+    if _reject_view(table_name):
+        return
+
+    where_column = where_clause[0]
 
     if where_column not in metadata[table_name]:
         print(f'❌ Ошибка: Столбец "{where_column}" не существует.')
         return
 
-    # Фильтруем записи
-    original_count = len(table_data)
-    table_data = [record for record in table_data 
-                 if str(record.get(where_column)) != where_value]
-
-    deleted_count = original_count - len(table_data)
+    # Фильтруем записи только в партициях, подходящих под условие
+    codec = get_codec(metadata[table_name])
+    if definitely_absent(table_name, codec.condition(where_clause)):
+        print('❌ Записи для удаления не найдены.')
+        return
+    matches = codec.matcher(*where_clause)
+    expired = expired_predicate(ttl_spec(table_name))
+    changed = {}
+    changes = []
+    for key, table_data in load_partitions(table_name, where_clause, codec).items():
+        kept = []
+        for record in table_data:
+            if matches(record) and not expired(record):
+                changes.append(Change('delete', record, None))
+            else:
+                kept.append(record)
+        if len(kept) != len(table_data):
+            changed[key] = kept
+    deleted_count = len(changes)
 
     if deleted_count > 0:
-        save_table_data(table_name, table_data)
+        save_partitions(table_name, changed)
+        publish(table_name, changes)
         msg = f'✅ Удалено {deleted_count} записей из таблицы "{table_name}".'
         print(msg)
     else:
         print('❌ Записи для удаления не найдены.')
 
 
+@handle_db_errors
+@log_time
+def expire(metadata, table_name):
+    """
+    Сразу удаляет все истекшие записи таблицы с TTL
+    (пакетами, как фоновая очистка).
+    """
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+    if not ttl_spec(table_name):
+        print(f'❌ Ошибка: Для таблицы "{table_name}" не задано время жизни записей.')
+        return
+
+    total = 0
+    while expired_entries(table_name, 1):
+        total += sweep(table_name)
+    print(f'🧹 Удалено истекших записей из таблицы "{table_name}": {total}.')
+
+
 @handle_db_errors
 def info(metadata, table_name):
     """
@@ -303,9 +817,464 @@ def info(metadata, table_name):
         return
 
     table_structure = metadata[table_name]
-    table_data = load_table_data(table_name)
+    catalog = get_catalog()
+    entry = catalog.entry(table_name)
+    options = entry.get('options', {})
+
+    # Количество записей поддерживается в каталоге; если его там нет, считаем
+    rows = entry.get('stats', {}).get('rows')
+    if rows is None:
+        rows = count_rows(table_name)
+        catalog.update_stats(table_name, rows=rows)
 
     print(f'📊 Таблица: {table_name}')
     columns_str = ", ".join([f"{col}:{typ}" for col, typ in table_structure.items()])
     print(f'📝 Столбцы: {columns_str}')
-    print(f'📈 Количество записей: {len(table_data)}')
+    print(f'📈 Количество записей: {rows}')
+    storage_format = options.get('compression', 'none')
+    storage_format = 'json' if storage_format == 'none' else storage_format
+    print(f'💽 Формат: {storage_format}, размер файлов: '
+          f'{estimate_size(table_name)} байт, версия схемы: {entry.get("version", 0)}')
+    if options.get('view'):
+        print(f'🪞 Материализованное представление: {describe_view(options["view"])}')
+    if options.get('indexes'):
+        print(f'🔎 Индексы: {", ".join(options["indexes"])}')
+    if options.get('bloom'):
+        print(f'🌸 Фильтры Блума: {", ".join(options["bloom"])}')
+    if options.get('fulltext'):
+        print(f'📚 Полнотекстовые индексы: {describe_fulltext(options["fulltext"])}')
+    if options.get('ttl'):
+        print(f'⏳ Время жизни записей: {describe_ttl(options["ttl"])}')
+    if options.get('partition'):
+        partitions_count = len(options.get('partitions', []))
+        print(f'🧩 Партиционирование: {describe_partition(options["partition"])}'
+              f', партиций: {partitions_count}')
+
+    stats = compression_stats(table_name)
+    if stats and stats['stored_size'] and stats['decode_speed']:
+        ratio = stats['json_size'] / stats['stored_size']
+        speed = stats['decode_speed'] / 2**20
+        print(f'🗜️  Сжатие: {stats["codec"]}, сегментов: {stats["segments"]}, '
+              f'≈{stats["json_size"]} → {stats["stored_size"]} байт '
+              f'(x{ratio:.1f}), распаковка {speed:.1f} МБ/с')
+
+
+@handle_db_errors
+def alter_compression(metadata, table_name, codec):
+    """
+    Меняет кодек сжатия таблицы и переписывает ее файлы.
+    """
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+
+    if codec not in COMPRESSION_CODECS:
+        print(ERROR_MESSAGE_INVALID_COMPRESSION.format(codec))
+        return
+
+    set_compression(table_name, codec)
+    log_schema_change('compression', table_name, codec=codec)
+    print(f'✅ Сжатие таблицы "{table_name}" изменено на {codec}.')
+
+
+@handle_db_errors
+def set_write_behind(enabled):
+    """
+    Включает или выключает отложенную запись таблиц.
+    """
+    if enabled:
+        start_write_behind()
+        print('✅ Отложенная запись включена: изменения пишутся в журнал, '
+              'таблицы сбрасываются на диск в фоне.')
+    else:
+        stop_write_behind()
+        print('✅ Отложенная запись выключена, все изменения записаны на диск.')
+
+
+@handle_db_errors
+def flush():
+    """
+    Немедленно записывает на диск отложенные изменения таблиц.
+    """
+    count = flush_tables()
+    flush_sketches()
+    flush_fulltext()
+    print(f'💾 Записано файлов таблиц: {count}.')
+
+
+@handle_db_errors
+def create_index(metadata, table_name, column, kind='hash', ngram=0):
+    """
+    Создает индекс по столбцу таблицы (kind='bloom' — фильтр Блума,
+    kind='fulltext' — полнотекстовый индекс, с ngram > 0 — с n-граммами).
+    """
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+
+    if column not in metadata[table_name]:
+        print(f'❌ Ошибка: Столбец "{column}" не существует.')
+        return
+
+    if kind == 'bloom':
+        bloom = create_bloom(table_name, column)
+        log_schema_change('index', table_name, column=column, kind=kind)
+        print(f'✅ Фильтр Блума по столбцу "{column}" таблицы "{table_name}" '
+              f'создан ({bloom.size} бит, до {bloom.capacity} значений).')
+        return
+
+    if kind == 'fulltext':
+        if base_type(metadata[table_name][column]) != 'str':
+            print('❌ Ошибка: Полнотекстовый индекс строится только по столбцу '
+                  'типа str.')
+            return
+        words = build_fulltext(table_name, column, scan(table_name), ngram)
+        log_schema_change('index', table_name, column=column, kind=kind, ngram=ngram)
+        grams = f', {ngram}-граммы' if ngram else ''
+        print(f'✅ Полнотекстовый индекс по столбцу "{column}" таблицы '
+              f'"{table_name}" создан (различных слов: {words}{grams}).')
+        return
+
+    distinct = build_index(table_name, column, scan(table_name))
+    log_schema_change('index', table_name, column=column)
+    print(f'✅ Индекс по столбцу "{column}" таблицы "{table_name}" создан '
+          f'(различных значений: {distinct}).')
+
+
+@handle_db_errors
+def remove_index(metadata, table_name, column, kind='hash'):
+    """
+    Удаляет индекс по столбцу таблицы (kind='bloom' — фильтр Блума,
+    kind='fulltext' — полнотекстовый индекс).
+    """
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+
+    exists = {'bloom': has_bloom, 'fulltext': has_fulltext}.get(kind, has_index)
+    if not exists(table_name, column):
+        print(f'❌ Ошибка: Индекс по столбцу "{column}" не существует.')
+        return
+
+    if kind == 'bloom':
+        drop_bloom(table_name, column)
+    elif kind == 'fulltext':
+        drop_fulltext(table_name, column)
+    else:
+        drop_index(table_name, column)
+    log_schema_change('drop_index', table_name, column=column, kind=kind)
+    print(f'✅ Индекс по столбцу "{column}" таблицы "{table_name}" удален.')
+
+
+def _alter_schema(metadata, table_name, change, propagated=False):
+    """
+    Применяет изменение схемы: меняется только каталог, данные
+    приводятся к новой схеме при чтении и переписываются при следующей записи.
+    Изменение переносится на представления, построенные по таблице.
+    """
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return False
+    if not propagated and _reject_view(table_name):
+        return False
+
+    catalog = get_catalog()
+    if table_name not in catalog:
+        print(f'❌ Ошибка: Таблица "{table_name}" не зарегистрирована в каталоге.')
+        return False
+
+    logged_change = dict(change)
+    change = dict(change)
+    schema = apply_change(metadata[table_name], change)
+    options = load_table_options(table_name)
+    spec = options.get('partition')
+    if spec and spec['column'] == change['column'] and change['op'] == 'drop':
+        print(f'❌ Ошибка: Столбец "{change["column"]}" является ключом '
+              f'партиционирования.')
+        return False
+    ttl = options.get('ttl')
+    if ttl and ttl['column'] == change['column'] and change['op'] == 'drop':
+        print(f'❌ Ошибка: По столбцу "{change["column"]}" задано время жизни записей.')
+        return False
+    views = views_of(table_name)
+    if change['op'] == 'drop':
+        for view_name in dependent_views(table_name):
+            where = view_spec(view_name).get('where')
+            if where and where[0] == change['column']:
+                print(f'❌ Ошибка: Столбец "{change["column"]}" используется '
+                      f'в условии представления "{view_name}".')
+                return False
+    if change['op'] == 'add':
+        change['default'] = convert_default(change['type'], change.get('default'))
+
+    catalog.alter_schema(table_name, schema, change)
+    metadata[table_name] = schema
+
+    if change['op'] == 'drop' and has_index(table_name, change['column']):
+        drop_index(table_name, change['column'])
+    if change['op'] == 'drop' and has_bloom(table_name, change['column']):
+        drop_bloom(table_name, change['column'])
+    if change['op'] == 'drop' and has_fulltext(table_name, change['column']):
+        drop_fulltext(table_name, change['column'])
+    invalidate_sketches(table_name)
+    if change['op'] == 'rename':
+        rename_index(table_name, change['column'], change['new_name'])
+        rename_bloom(table_name, change['column'], change['new_name'])
+        rename_fulltext(table_name, change['column'], change['new_name'])
+        options = load_table_options(table_name)
+        if spec and spec['column'] == change['column']:
+            options['partition']['column'] = change['new_name']
+        if ttl and ttl['column'] == change['column']:
+            options['ttl']['column'] = change['new_name']
+        where = (options.get('view') or {}).get('where')
+        if where and where[0] == change['column']:
+            where[0] = change['new_name']
+        save_table_options(table_name, options)
+
+    for view_name in views:
+        _alter_schema(metadata, view_name, change, propagated=True)
+    if not propagated:
+        log_schema_change('alter', table_name, change=logged_change)
+    return True
+
+
+@handle_db_errors
+def add_column(metadata, table_name, column, col_type, default=None):
+    """
+    Добавляет столбец в таблицу без перезаписи данных.
+    """
+    change = {'op': 'add', 'column': column, 'type': col_type, 'default': default}
+    if _alter_schema(metadata, table_name, change):
+        print(f'✅ Столбец "{column}:{col_type}" добавлен в таблицу "{table_name}".')
+
+
+@handle_db_errors
+@confirm_action("удаление столбца")
+def drop_column(metadata, table_name, column):
+    """
+    Удаляет столбец из таблицы без перезаписи данных.
+    """
+    if _alter_schema(metadata, table_name, {'op': 'drop', 'column': column}):
+        print(f'✅ Столбец "{column}" удален из таблицы "{table_name}".')
+
+
+@handle_db_errors
+def rename_column(metadata, table_name, column, new_name):
+    """
+    Переименовывает столбец таблицы без перезаписи данных.
+    """
+    change = {'op': 'rename', 'column': column, 'new_name': new_name}
+    if _alter_schema(metadata, table_name, change):
+        print(f'✅ Столбец "{column}" таблицы "{table_name}" '
+              f'переименован в "{new_name}".')
+
+
+@handle_db_errors
+@log_time
+def compact(metadata, table_name):
+    """
+    Переписывает файлы таблицы, приводя все записи к текущей схеме.
+    """
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+
+    count = compact_table(table_name)
+    rebuild_sketches(table_name)
+    print(f'✅ Таблица "{table_name}" уплотнена, переписано файлов: {count}.')
+
+
+@handle_db_errors
+@log_time
+def export_table(metadata, table_name, filepath):
+    """
+    Потоково выгружает таблицу в файл CSV или JSON Lines.
+    """
+    if table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+
+    export_format(filepath)
+    columns = list(metadata[table_name])
+    count = export_rows(scan(table_name), columns, filepath)
+    print(f'✅ Таблица "{table_name}" выгружена в "{filepath}", записей: {count}.')
+
+
+@handle_db_errors
+@log_time
+def snapshot(metadata, target_dir):
+    """
+    Создает согласованную копию каталога и всех таблиц на текущий момент.
+    """
+    flush_sketches()
+    flush_fulltext()
+    counts = snapshot_files(target_dir)
+    print(f'✅ Снимок базы создан в "{target_dir}": '
+          f'ссылок {counts["linked"]}, копий {counts["copied"]}, '
+          f'записано из буфера {counts["written"]}.')
+
+
+@handle_db_errors
+def show_changes(metadata, table_name=None, from_seq=None):
+    """
+    Выводит события потока изменений начиная с from_seq
+    (не больше CDC_DISPLAY_LIMIT).
+    """
+    from prettytable import PrettyTable
+
+    if table_name is not None and table_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{table_name}" не существует.')
+        return
+
+    tables = {table_name} if table_name else None
+    events = list(islice(changes(from_seq or first_seq() or 1, tables),
+                         CDC_DISPLAY_LIMIT))
+    if not events:
+        print("📭 Изменений нет.")
+        return
+
+    table = PrettyTable()
+    table.field_names = ['seq', 'таблица', 'операция', 'ID', 'до', 'после']
+    for event in events:
+        table.add_row([event.seq, event.table, event.op, event.id,
+                       *(json.dumps(record, ensure_ascii=False) if record else ''
+                         for record in (event.before, event.after))])
+    print(table)
+    if len(events) == CDC_DISPLAY_LIMIT:
+        print(f"💡 Показаны первые {CDC_DISPLAY_LIMIT}; продолжение: "
+              f"changes from {events[-1].seq + 1}")
+
+
+@handle_db_errors
+@log_time
+def create_view(metadata, view_name, source, where_clause=None):
+    """
+    Создает материализованное представление по таблице.
+    """
+    if view_name in metadata:
+        print(ERROR_MESSAGE_TABLE_EXISTS.format(view_name))
+        return
+    if source not in metadata:
+        print(f'❌ Ошибка: Таблица "{source}" не существует.')
+        return
+    if where_clause:
+        if where_clause[0] not in metadata[source]:
+            print(f'❌ Ошибка: Столбец "{where_clause[0]}" не существует.')
+            return
+        # Проверяем, что значение условия приводится к типу столбца
+        get_codec(metadata[source]).matcher(*where_clause)
+
+    spec = {'source': source, 'where': list(where_clause) if where_clause else None}
+    schema = dict(metadata[source])
+    get_catalog().add_table(view_name, schema, {'view': spec})
+    metadata[view_name] = schema
+    log_schema_change('create', view_name, schema=schema, options={'view': spec})
+    count = refresh_view(view_name)
+    print(f'✅ Материализованное представление "{view_name}" создано '
+          f'({describe_view(spec)}), записей: {count}.')
+
+
+@handle_db_errors
+@log_time
+def refresh(metadata, view_name):
+    """
+    Полностью перестраивает материализованное представление.
+    """
+    if view_name not in metadata:
+        print(f'❌ Ошибка: Таблица "{view_name}" не существует.')
+        return
+    if not view_spec(view_name):
+        print(f'❌ Ошибка: "{view_name}" не является материализованным представлением.')
+        return
+
+    count = refresh_view(view_name)
+    print(f'✅ Представление "{view_name}" перестроено, записей: {count}.')
+
+
+def _apply_schema_entry(metadata, entry):
+    """
+    Применяет изменение схемы из журнала ведущей базы.
+    Уже примененные изменения (при повторе журнала после снимка) пропускаются.
+    """
+    table_name, op = entry['table'], entry['op']
+    catalog = get_catalog()
+    if op == 'create':
+        if table_name not in catalog:
+            catalog.add_table(table_name, entry['schema'], entry['options'])
+            metadata[table_name] = dict(entry['schema'])
+            if entry['options'].get('view'):
+                refresh_view(table_name)
+            if entry['options'].get('ttl'):
+                build_expiry_index(table_name, [])
+    elif op == 'drop':
+        if table_name in catalog:
+            drop_indexes(table_name)
+            drop_fulltext_indexes(table_name)
+            drop_expiry_index(table_name)
+            invalidate_sketches(table_name)
+            results.invalidate(table_name)
+            drop_table_files(table_name)
+            catalog.remove_table(table_name)
+            metadata.pop(table_name, None)
+    elif table_name not in catalog:
+        return
+    elif op == 'alter':
+        try:
+            _alter_schema(metadata, table_name, entry['change'], propagated=True)
+        except ValueError:
+            pass
+    elif op == 'compression':
+        if load_table_options(table_name).get('compression', 'none') != entry['codec']:
+            set_compression(table_name, entry['codec'])
+    elif op == 'index' and entry.get('kind') == 'bloom':
+        if not has_bloom(table_name, entry['column']):
+            create_bloom(table_name, entry['column'])
+    elif op == 'index' and entry.get('kind') == 'fulltext':
+        if not has_fulltext(table_name, entry['column']):
+            build_fulltext(table_name, entry['column'], scan(table_name),
+                           entry.get('ngram', 0))
+    elif op == 'index':
+        if not has_index(table_name, entry['column']):
+            build_index(table_name, entry['column'], scan(table_name))
+    elif op == 'drop_index' and entry.get('kind') == 'bloom':
+        drop_bloom(table_name, entry['column'])
+    elif op == 'drop_index' and entry.get('kind') == 'fulltext':
+        drop_fulltext(table_name, entry['column'])
+    elif op == 'drop_index':
+        if has_index(table_name, entry['column']):
+            drop_index(table_name, entry['column'])
+
+
+def apply_log_entries(metadata, entries):
+    """
+    Применяет записи журнала ведущей базы (реплика).
+    Изменения строк одной таблицы применяются пакетом и публикуются,
+    поэтому индексы, статистика и представления обновляются как обычно;
+    в собственный журнал реплики они не попадают.
+    Возвращает seq последней примененной записи или None.
+    """
+    batch = []
+    last = None
+
+    def apply_batch():
+        if not batch:
+            return
+        table_name = batch[0]['table']
+        changes = [Change(item['op'], item['before'], item['after']) for item in batch]
+        batch.clear()
+        if table_name in get_catalog():
+            apply_changes(table_name, changes)
+            publish(table_name, changes)
+
+    with get_changelog().paused():
+        for entry in entries:
+            if entry['op'] in ('insert', 'update', 'delete'):
+                if batch and batch[0]['table'] != entry['table']:
+                    apply_batch()
+                batch.append(entry)
+            else:
+                apply_batch()
+                _apply_schema_entry(metadata, entry)
+            last = entry['seq']
+        apply_batch()
+    return last
@@ -61,27 +61,3 @@ def log_time(func):
         return result
     return wrapper
 
-
-def create_cacher():
-    """
-    Фабрика для создания кэшера с замыканием.
-    """
-    cache = {}
-    
-    def cache_result(key, value_func):
-        if key in cache:
-            msg = f"♻️  Используем кэшированный результат для ключа: {key}"
-            print(msg)
-            return cache[key]
-        else:
-            value = value_func()
-            cache[key] = value
-            msg = f"💾 Сохраняем в кэш для ключа: {key}"
-            print(msg)
-            return value
-    
-    return cache_result
-
-
-# Создаем глобальный экземпляр кэшера
-cacher = create_cacher()
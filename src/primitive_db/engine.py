@@ -4,19 +4,67 @@
 
 import shlex
 
+from . import sweeper
+from .catalog import get_catalog
+from .constants import INDEX_KINDS
 from .core import (
+    add_column,
+    alter_compression,
+    analyze,
+    compact,
+    create_index,
     create_table,
+    create_view,
     delete,
+    drop_column,
     drop_table,
+    expire,
+    explain,
+    export_table,
+    flush,
     info,
     insert,
     list_tables,
+    memory_limit,
+    merge,
+    refresh,
+    remove_index,
+    rename_column,
     select,
+    select_count,
+    select_join,
+    set_write_behind,
+    show_changes,
+    snapshot,
     update,
+    upsert,
 )
 from .decorators import handle_db_errors
-from .parser import parse_set, parse_where
-from .utils import load_metadata
+from .fulltext import flush_fulltext
+from .parser import (
+    parse_alter,
+    parse_count,
+    parse_create_table,
+    parse_create_view,
+    parse_index,
+    parse_join,
+    parse_merge,
+    parse_order_by,
+    parse_set,
+    parse_size,
+    parse_upsert,
+    parse_where,
+)
+from .replication import is_replica, load_state
+from .sketches import flush_sketches
+from .storage import recover_tables, stop_write_behind
+
+# Команды, изменяющие данные или схему (недоступны на реплике)
+MUTATING_COMMANDS = {
+    'create_table', 'drop_table', 'alter', 'create', 'refresh', 'compact',
+    'insert', 'update', 'delete', 'create_index', 'drop_index', 'write_behind',
+    'expire', 'upsert', 'merge',
+}
 
 
 @handle_db_errors
@@ -28,9 +76,18 @@ def run():
     print("📖 Используйте 'help' для списка команд или 'exit' для выхода")
     print_crud_help()
 
+    recovered = recover_tables()
+    if recovered:
+        print(f"♻️  Восстановлено из журнала файлов таблиц: {recovered}")
+    if not is_replica():
+        # На реплике истекшие записи удаляются вслед за ведущей базой
+        sweeper.start()
+
     while True:
         try:
-            user_input = input("\n>>> Введите команду: ").strip()
+            # Фоновая очистка истекших записей работает, пока ждем ввода
+            with sweeper.idle():
+                user_input = input("\n>>> Введите команду: ").strip()
             if not user_input:
                 continue
 
@@ -38,22 +95,49 @@ def run():
             command = parts[0].lower()
 
             if command == 'exit':
+                sweeper.stop()
+                stop_write_behind()
+                flush_sketches()
+                flush_fulltext()
                 print("👋 Выход из программы. До свидания!")
                 break
             elif command == 'help':
                 print_crud_help()
+            elif command == 'flush':
+                flush()
+            elif command == 'memory_limit':
+                if len(parts) == 1:
+                    memory_limit()
+                elif len(parts) == 2:
+                    try:
+                        memory_limit(parse_size(parts[1]))
+                    except ValueError as e:
+                        print(f"❌ Ошибка: {e}.")
+                        print("📝 Формат: memory_limit [<байт>|<N>k|<N>m|<N>g]")
+                else:
+                    print("📝 Формат: memory_limit [<байт>|<N>k|<N>m|<N>g]")
+            elif command in MUTATING_COMMANDS and is_replica():
+                print("❌ Ошибка: База является репликой и доступна только для чтения.")
+            elif command == 'replica_status':
+                print_replica_status()
+            elif command == 'write_behind':
+                if len(parts) == 2 and parts[1].lower() in ('on', 'off'):
+                    set_write_behind(parts[1].lower() == 'on')
+                else:
+                    print("❌ Ошибка: Неверный формат команды write_behind.")
+                    print("📝 Формат: write_behind on|off")
             else:
-                metadata = load_metadata()
+                metadata = get_catalog()
 
                 # Команды управления таблицами
                 if command == 'create_table':
-                    if len(parts) < 3:
-                        print("❌ Ошибка: Недостаточно аргументов.")
+                    try:
+                        table_name, columns, options = parse_create_table(parts[1:])
+                    except ValueError as e:
+                        print(f"❌ Ошибка: {e}.")
                         print("📝 Формат: create_table <имя> <столбец1:тип> ...")
                     else:
-                        table_name = parts[1]
-                        columns = parts[2:]
-                        create_table(metadata, table_name, columns)
+                        create_table(metadata, table_name, columns, options)
 
                 elif command == 'drop_table':
                     if len(parts) < 2:
@@ -65,6 +149,80 @@ def run():
                 elif command == 'list_tables':
                     list_tables(metadata)
 
+                elif command == 'alter':
+                    try:
+                        table_name, change = parse_alter(parts[1:])
+                    except ValueError as e:
+                        print(f"❌ Ошибка: {e}.")
+                        print("📝 Формат: alter table <таблица> add column <с:тип> "
+                              "[default <знач>] | drop column <с> | "
+                              "rename column <с> to <имя> | set compression <кодек>")
+                    else:
+                        if change['op'] == 'compression':
+                            alter_compression(metadata, table_name, change['codec'])
+                        elif change['op'] == 'add':
+                            add_column(metadata, table_name, change['column'],
+                                       change['type'], change['default'])
+                        elif change['op'] == 'drop':
+                            drop_column(metadata, table_name, change['column'])
+                        else:
+                            rename_column(metadata, table_name, change['column'],
+                                          change['new_name'])
+
+                elif command == 'export':
+                    if len(parts) == 4 and parts[2].lower() == 'to':
+                        export_table(metadata, parts[1], parts[3])
+                    else:
+                        print("❌ Ошибка: Неверный формат команды export.")
+                        print("📝 Формат: export <таблица> to <файл.csv|файл.jsonl>")
+
+                elif command == 'snapshot':
+                    if len(parts) == 2:
+                        snapshot(metadata, parts[1])
+                    else:
+                        print("❌ Ошибка: Не указан каталог для снимка.")
+
+                elif command == 'create':
+                    try:
+                        view_name, source, where_clause = parse_create_view(parts[1:])
+                    except ValueError as e:
+                        print(f"❌ Ошибка: {e}.")
+                        print("📝 Формат: create materialized view <имя> as "
+                              "select from <таблица> [where ...]")
+                    else:
+                        create_view(metadata, view_name, source, where_clause)
+
+                elif command == 'refresh':
+                    if len(parts) == 2:
+                        refresh(metadata, parts[1])
+                    else:
+                        print("❌ Ошибка: Не указано имя представления.")
+
+                elif command == 'changes':
+                    args = parts[1:]
+                    from_seq = None
+                    if len(args) >= 2 and args[-2].lower() == 'from' \
+                            and args[-1].isdigit():
+                        from_seq = int(args[-1])
+                        args = args[:-2]
+                    if len(args) <= 1:
+                        show_changes(metadata, args[0] if args else None, from_seq)
+                    else:
+                        print("❌ Ошибка: Неверный формат команды changes.")
+                        print("📝 Формат: changes [<таблица>] [from <seq>]")
+
+                elif command == 'expire':
+                    if len(parts) == 2:
+                        expire(metadata, parts[1])
+                    else:
+                        print("❌ Ошибка: Не указано имя таблицы.")
+
+                elif command == 'compact':
+                    if len(parts) == 2:
+                        compact(metadata, parts[1])
+                    else:
+                        print("❌ Ошибка: Не указано имя таблицы.")
+
                 # CRUD операции
                 elif command == 'insert':
                     if len(parts) >= 4 and parts[1] == 'into' and parts[3] == 'values':
@@ -76,17 +234,69 @@ def run():
                         msg = "📝 Формат: insert into <таблица> values (значение1, ...)"
                         print(msg)
 
+                elif command == 'upsert':
+                    try:
+                        # Кавычки сохраняются: в значениях могут быть запятые
+                        spec = parse_upsert(shlex.split(user_input, posix=False)[1:])
+                    except ValueError as e:
+                        print(f"❌ Ошибка: {e}.")
+                        print("📝 Формат: upsert into <таблица> values (...) "
+                              "on conflict (<столбец>) do update set с = знач, ... "
+                              "| do nothing")
+                    else:
+                        upsert(metadata, spec)
+
+                elif command == 'merge':
+                    try:
+                        table_name, filepath, key = parse_merge(parts[1:])
+                    except ValueError as e:
+                        print(f"❌ Ошибка: {e}.")
+                        print("📝 Формат: merge <таблица> from <файл.csv|файл.jsonl> "
+                              "[on <столбец>]")
+                    else:
+                        merge(metadata, table_name, filepath, key)
+
+                elif command == 'select' and 'join' in parts:
+                    try:
+                        spec = parse_join(parts[1:])
+                    except ValueError as e:
+                        print(f"❌ Ошибка парсинга JOIN: {e}")
+                        msg = "📝 Формат: select from <т1> join <т2> on <т1.с> = <т2.с>"
+                        print(msg)
+                    else:
+                        select_join(metadata, spec)
+
+                elif command == 'select' and len(parts) > 1 and \
+                        parts[1].lower().startswith('count('):
+                    try:
+                        table_name, where_clause, group_by, distinct = \
+                            parse_count(parts[1:])
+                    except ValueError as e:
+                        print(f"❌ Ошибка: {e}.")
+                        print("📝 Формат: select count(*) | count(distinct <с>) "
+                              "from <таблица> [where ...] [group by <столбец>]")
+                    else:
+                        select_count(metadata, table_name, where_clause, group_by,
+                                     distinct)
+
                 elif command == 'select':
+                    try:
+                        parts, order_by = parse_order_by(parts)
+                    except ValueError as e:
+                        print(f"❌ Ошибка: {e}.")
+                        print("📝 Формат: select from <таблица> [where ...] "
+                              "order by <столбец> [asc|desc]")
+                        continue
                     if len(parts) >= 3 and parts[1] == 'from':
                         table_name = parts[2]
                         if len(parts) > 4 and parts[3] == 'where':
                             try:
                                 where_clause = parse_where(parts[4:])
-                                select(metadata, table_name, where_clause)
+                                select(metadata, table_name, where_clause, order_by)
                             except Exception as e:
                                 print(f"❌ Ошибка парсинга условия WHERE: {e}")
                         else:
-                            select(metadata, table_name)
+                            select(metadata, table_name, order_by=order_by)
                     else:
                         print("❌ Ошибка: Неверный формат команды select.")
                         msg1 = "📝 Формат: select from <таблица>"
@@ -99,7 +309,7 @@ def run():
                         table_name = parts[1]
                         try:
                             set_clause = parse_set(parts[3:5])
-                            where_clause = parse_where(parts[6:8])
+                            where_clause = parse_where(parts[6:])
                             update(metadata, table_name, set_clause, where_clause)
                         except Exception as e:
                             print(f"❌ Ошибка парсинга: {e}")
@@ -114,7 +324,7 @@ def run():
                     if len(parts) >= 5 and parts[1] == 'from' and parts[3] == 'where':
                         table_name = parts[2]
                         try:
-                            where_clause = parse_where(parts[4:6])
+                            where_clause = parse_where(parts[4:])
                             delete(metadata, table_name, where_clause)
                         except Exception as e:
                             print(f"❌ Ошибка парсинга условия WHERE: {e}")
@@ -123,6 +333,41 @@ def run():
                         msg = "📝 Формат: delete from <таблица> where столбец=значение"
                         print(msg)
 
+                elif command in ('create_index', 'drop_index'):
+                    try:
+                        table_name, column, kind, params = parse_index(parts[1:])
+                    except ValueError:
+                        print(f"❌ Ошибка: Неверный формат команды {command}.")
+                        print(f"📝 Формат: {command} <таблица> <столбец> "
+                              f"[using {'|'.join(INDEX_KINDS)}] [ngram[=n]]")
+                    else:
+                        if command == 'create_index':
+                            create_index(metadata, table_name, column, kind, **params)
+                        else:
+                            remove_index(metadata, table_name, column, kind)
+
+                elif command == 'analyze':
+                    if len(parts) == 2:
+                        analyze(metadata, parts[1])
+                    else:
+                        print("❌ Ошибка: Не указано имя таблицы.")
+
+                elif command == 'explain':
+                    query = parts[1:]
+                    try:
+                        query, order_by = parse_order_by(query)
+                        if len(query) < 3 or query[:2] != ['select', 'from'] or \
+                                (len(query) > 3 and query[3] != 'where'):
+                            raise ValueError("ожидается запрос select from <таблица>")
+                        where_clause = parse_where(query[4:]) if len(query) > 3 \
+                            else None
+                    except Exception as e:
+                        print(f"❌ Ошибка: {e}.")
+                        print("📝 Формат: explain select from <таблица> [where ...] "
+                              "[order by <столбец> [asc|desc]]")
+                    else:
+                        explain(metadata, query[2], where_clause, order_by)
+
                 elif command == 'info':
                     if len(parts) >= 2:
                         table_name = parts[1]
@@ -135,12 +380,31 @@ def run():
                     print("💡 Используйте 'help' для просмотра доступных команд")
 
         except KeyboardInterrupt:
+            sweeper.stop()
+            stop_write_behind()
+            flush_sketches()
+            flush_fulltext()
             print("\n👋 Выход из программы. До свидания!")
             break
         except Exception as e:
             print(f"❌ Произошла непредвиденная ошибка: {e}")
 
 
+def print_replica_status():
+    """
+    Выводит состояние репликации.
+    """
+    if not is_replica():
+        print("ℹ️  База не является репликой.")
+        return
+    state = load_state()
+    print(f"Ведущая база: {state.get('leader')}")
+    print(f"Применено до seq: {state.get('seq', 0)}")
+    print(f"Последний seq ведущей базы: {state.get('leader_seq', 0)}")
+    print(f"Отставание: {state.get('lag_entries', 0)} зап., "
+          f"{state.get('lag_seconds', 0)} с")
+
+
 def print_crud_help():
     """
     Выводит справочную информацию по командам.
@@ -152,21 +416,68 @@ def print_crud_help():
     print("\n📊 **ОПЕРАЦИИ С ДАННЫМИ:**")
     msg1 = "  insert into <таблица> values (знач1, знач2, ...)"
     print(msg1 + " - создать запись")
+    msg18 = "  upsert into <таблица> values (...) on conflict (<с>)"
+    print(msg18 + "      - вставить или обновить")
+    print("    do update set с = знач|excluded.с, ... | do nothing")
+    msg19 = "  merge <таблица> from <файл.csv|файл.jsonl> [on <с>]"
+    print(msg19 + "    - слить файл (по ID)")
     msg2 = "  select from <таблица> [where столбец=значение]"
     print(msg2 + "   - прочитать записи")
     msg3 = "  update <таблица> set столбец=значение where ..."
     print(msg3 + "  - обновить запись")
     msg4 = "  delete from <таблица> where столбец=значение"
     print(msg4 + "     - удалить запись")
+    print("    операторы WHERE: = != < <= > >=, is null, is not null")
+    print("    contains 'подстрока', like 'шаблон%' (без учета регистра)")
+    print("    [order by столбец [asc|desc]]                  - сортировка")
+    msg13 = "  select count(*) from <таблица> [where ...] [group by <с>]"
+    print(msg13 + " - подсчет")
+    msg14 = "  select count(distinct <с>) from <таблица>"
+    print(msg14 + "          - различные значения (оценка)")
     print("  info <таблица>                                   - информация")
+    print("  analyze <таблица>                                 - собрать статистику")
+    msg15 = "  explain select from <таблица> [where ...]"
+    print(msg15 + "          - план запроса")
+    msg9 = "  select from <т1> join <т2> on <т1.с> = <т2.с> [where ...]"
+    print(msg9 + " - соединение")
     
     print("\n🗂️  **УПРАВЛЕНИЕ ТАБЛИЦАМИ:**")
     msg5 = "  create_table <таблица> <столбец1:тип> ..."
     print(msg5 + "        - создать таблицу")
+    print("    типы: int, float, str, bool, date, timestamp; тип? допускает NULL")
+    msg6 = "    [partition by range(ID, 100000) | hash(столбец, N)]"
+    print(msg6 + "  - партиционирование")
+    msg7 = "    [with compression=zlib|lzma|dict]"
+    print(msg7 + "                    - сжатие")
+    msg16 = "    [with ttl=<секунды> on <столбец timestamp>]"
+    print(msg16 + "         - время жизни записей")
+    msg8 = "  alter table <таблица> set compression <кодек>"
+    print(msg8 + "     - сменить сжатие")
+    msg10 = "  alter table <таблица> add column <с:тип> [default <знач>]"
+    print(msg10 + " - добавить столбец")
+    msg11 = "  alter table <таблица> drop column <с> | rename column <с> to <имя>"
+    print(msg11)
+    print("  compact <таблица>                                 - переписать файлы")
+    print("  expire <таблица>                                  - удалить истекшие")
+    print("  export <таблица> to <файл.csv|файл.jsonl>         - выгрузить таблицу")
+    print("  snapshot <каталог>                                - снимок базы")
+    print("  changes [<таблица>] [from <seq>]                  - поток изменений")
+    msg12 = "  create materialized view <имя> as select from <т> [where ...]"
+    print(msg12)
+    print("  refresh <представление>                           - перестроить")
     print("  list_tables                                       - список таблиц")
     print("  drop_table <таблица>                              - удалить таблицу")
+    print("  create_index <таблица> <столбец> [using bloom]    - создать индекс")
+    print("  drop_index <таблица> <столбец> [using bloom]      - удалить индекс")
+    msg17 = "    [using fulltext [ngram[=n]]]"
+    print(msg17 + "                  - полнотекстовый индекс (str)")
     
     print("\n🔧 **ОБЩИЕ КОМАНДЫ:**")
+    print("  write_behind on|off                               - отложенная запись")
+    print("  flush                                             - сбросить на диск")
+    print("  memory_limit [<N>k|<N>m|<N>g]                     - память на запрос")
+    print("  replica_status                                    - состояние реплики")
+    print("  (запуск реплики: project follow <каталог ведущей базы>)")
     print("  exit                                              - выход")
     print("  help                                              - справка")
     
@@ -174,4 +485,8 @@ def print_crud_help():
     print("  create_table users name:str age:int is_active:bool")
     print("  insert into users values (\"Иван\", 25, true)")
     print("  select from users where age = 25")
+    print("  create_index users name using fulltext ngram")
+    print("  select from users where name contains ива")
+    print("  create_table events at:timestamp note:str?")
+    print("  select from events where at >= 2024-01-01T00:00:00")
     print("="*50)
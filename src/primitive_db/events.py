@@ -0,0 +1,40 @@
+"""
+Уведомления об изменениях данных таблиц.
+Бизнес-логика публикует пакет изменений после каждой успешной записи,
+а вспомогательные структуры (индексы и т.п.) подписываются на них.
+"""
+
+from collections import namedtuple
+
+# op — 'insert', 'update' или 'delete'; before/after — запись до и после
+Change = namedtuple('Change', ['op', 'before', 'after'])
+
+_listeners = []
+
+
+def subscribe(listener):
+    """
+    Подписывает обработчик listener(table_name, changes) на изменения.
+    Может использоваться как декоратор.
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+    return listener
+
+
+def unsubscribe(listener):
+    """
+    Отписывает обработчик от изменений.
+    """
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def publish(table_name, changes):
+    """
+    Передает пакет изменений таблицы всем подписчикам.
+    """
+    if not changes:
+        return
+    for listener in list(_listeners):
+        listener(table_name, changes)
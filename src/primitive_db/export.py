@@ -0,0 +1,66 @@
+"""
+Экспорт таблиц в файлы CSV и JSON Lines.
+Записи пишутся в файл по мере чтения, поэтому объем памяти не зависит
+от размера таблицы.
+"""
+
+import csv
+import json
+import os
+
+from .constants import EXPORT_FORMATS
+
+
+def export_format(filepath):
+    """
+    Возвращает формат файла экспорта (или merge) по расширению.
+    """
+    extension = os.path.splitext(filepath)[1].lstrip('.').lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f'Неподдерживаемый формат файла "{extension}", '
+                         f'доступны: {", ".join(EXPORT_FORMATS)}')
+    return extension
+
+
+def _write_csv(file, columns, records):
+    """
+    Записывает записи в формате CSV с заголовком из имен столбцов.
+    """
+    writer = csv.writer(file)
+    writer.writerow(columns)
+    count = 0
+    for record in records:
+        writer.writerow(['' if record.get(column) is None else record[column]
+                         for column in columns])
+        count += 1
+    return count
+
+
+def _write_jsonl(file, columns, records):
+    """
+    Записывает записи в формате JSON Lines (один объект на строку).
+    """
+    count = 0
+    for record in records:
+        row = {column: record.get(column) for column in columns}
+        file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def export_rows(records, columns, filepath):
+    """
+    Записывает поток записей в файл и возвращает их количество.
+    Файл появляется на месте только после успешной записи.
+    """
+    writer = _write_csv if export_format(filepath) == 'csv' else _write_jsonl
+    tmp_path = f"{filepath}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as file:
+            count = writer(file, columns, records)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, filepath)
+    return count
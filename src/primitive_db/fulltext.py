@@ -0,0 +1,374 @@
+"""
+Полнотекстовые индексы по строковым столбцам.
+
+Индекс хранится в data/<таблица>.fts.<столбец>.json как инвертированный
+список: для каждого слова (последовательности букв и цифр в нижнем
+регистре) — ID записей и сколько раз слово в них встречается, а для
+каждой записи — ее длина в словах. Индекс с n-граммами (using fulltext
+ngram[=n]) хранит еще n-граммы словаря: для каждой n-граммы — слова,
+в которые она входит, поэтому слова с подстрокой запроса находятся без
+перебора всего словаря.
+
+Условия contains и like разбираются на слова запроса: запись может
+подойти, только если каждое слово запроса входит в какое-нибудь ее
+слово. Найденные по индексу записи проверяются условием целиком, а
+результат упорядочивается по релевантности (BM25; совпадение слова
+целиком весит больше, чем совпадение части слова).
+
+Разобранный индекс хранится в памяти и обновляется по событиям изменения
+данных, а в файл записывается пакетами (FULLTEXT_SAVE_CHANGES измененных
+записей, а также при flush, snapshot и выходе). Пока есть несохраненные
+изменения, рядом с файлом лежит метка .dirty: если процесс завершится,
+не записав их, индекс перестроится по данным таблицы.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+
+from .catalog import load_table_options, save_table_options
+from .constants import (
+    DATA_DIR,
+    FULLTEXT_BM25_B,
+    FULLTEXT_BM25_K1,
+    FULLTEXT_SAVE_CHANGES,
+    TEXT_OPERATORS,
+)
+from .events import subscribe
+from .storage import scan
+from .utils import ensure_data_dir, load_json_file, save_json_file
+
+# Вес совпадения части слова относительно совпадения слова целиком
+_PARTIAL_WEIGHT = 0.5
+
+
+def fulltext_path(table_name, column):
+    """
+    Возвращает путь к файлу полнотекстового индекса.
+    """
+    return f"{DATA_DIR}/{table_name}.fts.{column}.json"
+
+
+def _dirty_path(filepath):
+    """
+    Возвращает путь к метке несохраненных изменений индекса.
+    """
+    return filepath[:-len('.json')] + '.dirty'
+
+
+def tokenize(text):
+    """
+    Разбивает текст на слова в нижнем регистре.
+    """
+    return re.findall(r'\w+', str(text).lower())
+
+
+def query_words(op, value):
+    """
+    Возвращает слова запроса contains или like (шаблоны % и _ like
+    разделяют слова).
+    """
+    if op == 'like':
+        value = re.sub(r'[%_]', ' ', value)
+    return tokenize(value)
+
+
+def fulltext_columns(table_name):
+    """
+    Возвращает полнотекстовые индексы таблицы: {столбец: размер n-грамм}
+    (0 — индекс без n-грамм).
+    """
+    return load_table_options(table_name).get('fulltext', {})
+
+
+def has_fulltext(table_name, column):
+    """
+    Проверяет, есть ли полнотекстовый индекс по столбцу.
+    """
+    return column in fulltext_columns(table_name)
+
+
+def describe_fulltext(columns):
+    """
+    Возвращает описание полнотекстовых индексов для вывода.
+    """
+    return ", ".join(f"{column} (ngram={ngram})" if ngram else column
+                     for column, ngram in columns.items())
+
+
+def searchable(table_name, where_clause):
+    """
+    Проверяет, можно ли найти записи под условие WHERE по полнотекстовому
+    индексу: условие contains или like по столбцу с индексом, в котором
+    есть хотя бы одно слово.
+    """
+    if not where_clause or len(where_clause) != 3:
+        return False
+    column, value, op = where_clause
+    return op in TEXT_OPERATORS and has_fulltext(table_name, column) and \
+        bool(query_words(op, value))
+
+
+def _ngrams(token, size):
+    """
+    Возвращает n-граммы слова.
+    """
+    return {token[i:i + size] for i in range(len(token) - size + 1)}
+
+
+def _add(index, record_id, text):
+    """
+    Добавляет текст записи в индекс.
+    """
+    tokens = tokenize(text)
+    key = str(record_id)
+    index['lengths'][key] = len(tokens)
+    for token, count in Counter(tokens).items():
+        postings = index['postings'].get(token)
+        if postings is None:
+            postings = index['postings'][token] = {}
+            for gram in _ngrams(token, index['ngram']) if index['ngram'] else ():
+                index['grams'].setdefault(gram, []).append(token)
+        postings[key] = count
+
+
+def _remove(index, record_id, text):
+    """
+    Убирает текст записи из индекса (слова без записей удаляются из словаря).
+    """
+    key = str(record_id)
+    index['lengths'].pop(key, None)
+    for token in set(tokenize(text)):
+        postings = index['postings'].get(token)
+        if postings is None or postings.pop(key, None) is None or postings:
+            continue
+        del index['postings'][token]
+        for gram in _ngrams(token, index['ngram']) if index['ngram'] else ():
+            tokens = index['grams'].get(gram, [])
+            if token in tokens:
+                tokens.remove(token)
+                if not tokens:
+                    del index['grams'][gram]
+
+
+def _build(column, records, ngram):
+    """
+    Строит индекс по столбцу из записей.
+    """
+    index = {'ngram': ngram, 'lengths': {}, 'postings': {}, 'grams': {}}
+    for record in records:
+        if record.get(column) is not None:
+            _add(index, record['ID'], record[column])
+    return index
+
+
+def build_fulltext(table_name, column, records, ngram=0):
+    """
+    Строит полнотекстовый индекс по столбцу из записей таблицы
+    и регистрирует его. Возвращает количество различных слов.
+    """
+    index = _build(column, records, ngram)
+    _save_index(fulltext_path(table_name, column), index)
+
+    options = load_table_options(table_name)
+    options.setdefault('fulltext', {})[column] = ngram
+    save_table_options(table_name, options)
+    return len(index['postings'])
+
+
+def drop_fulltext(table_name, column):
+    """
+    Удаляет полнотекстовый индекс по столбцу.
+    """
+    options = load_table_options(table_name)
+    if options.get('fulltext', {}).pop(column, None) is not None:
+        if not options['fulltext']:
+            del options['fulltext']
+        save_table_options(table_name, options)
+    filepath = fulltext_path(table_name, column)
+    _cache.pop(filepath, None)
+    _unsaved.pop(filepath, None)
+    for path in (filepath, _dirty_path(filepath)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def drop_fulltext_indexes(table_name):
+    """
+    Удаляет все полнотекстовые индексы таблицы.
+    """
+    for column in list(fulltext_columns(table_name)):
+        drop_fulltext(table_name, column)
+
+
+def rename_fulltext(table_name, column, new_name):
+    """
+    Переименовывает полнотекстовый индекс вслед за столбцом.
+    """
+    options = load_table_options(table_name)
+    if column not in options.get('fulltext', {}):
+        return
+    options['fulltext'] = {new_name if name == column else name: ngram
+                           for name, ngram in options['fulltext'].items()}
+    save_table_options(table_name, options)
+    filepath = fulltext_path(table_name, column)
+    if filepath in _unsaved:
+        _save_index(filepath, _cache[filepath][1])
+    _cache.pop(filepath, None)
+    if os.path.exists(filepath):
+        os.replace(filepath, fulltext_path(table_name, new_name))
+
+
+# Разобранные индексы: {путь: (отметка файла, индекс)}
+_cache = {}
+# Индексы с несохраненными изменениями: {путь: число изменений}
+_unsaved = {}
+
+
+def _stamp(filepath):
+    """
+    Возвращает отметку файла для проверки кэша (None, если файла нет).
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size
+
+
+def _save_index(filepath, index):
+    """
+    Записывает индекс в файл и запоминает его в кэше.
+    """
+    ensure_data_dir()
+    save_json_file(filepath, index)
+    if os.path.exists(_dirty_path(filepath)):
+        os.remove(_dirty_path(filepath))
+    _unsaved.pop(filepath, None)
+    _cache[filepath] = (_stamp(filepath), index)
+
+
+def load_fulltext(table_name, column):
+    """
+    Загружает полнотекстовый индекс для поиска. Разобранный файл
+    кэшируется до его изменения; файл с несохраненными изменениями
+    другого процесса перестраивается по данным таблицы.
+    """
+    filepath = fulltext_path(table_name, column)
+    stamp = _stamp(filepath)
+    if stamp is None:
+        return {'ngram': 0, 'lengths': {}, 'postings': {}, 'grams': {}}
+    cached = _cache.get(filepath)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    _unsaved.pop(filepath, None)
+    if os.path.exists(_dirty_path(filepath)):
+        index = _build(column, scan(table_name),
+                       fulltext_columns(table_name).get(column, 0))
+        _save_index(filepath, index)
+        return index
+    index = load_json_file(filepath, {})
+    _cache[filepath] = (stamp, index)
+    return index
+
+
+def flush_fulltext():
+    """
+    Записывает все несохраненные изменения полнотекстовых индексов.
+    Возвращает количество записанных файлов.
+    """
+    count = 0
+    for filepath in list(_unsaved):
+        cached = _cache.get(filepath)
+        # Файл, который с тех пор изменили или удалили, не перезаписывается
+        if cached is not None and cached[0] == _stamp(filepath):
+            _save_index(filepath, cached[1])
+            count += 1
+        _unsaved.pop(filepath, None)
+    return count
+
+
+def _matching_tokens(index, word):
+    """
+    Возвращает слова словаря, содержащие слово запроса.
+    """
+    size = index['ngram']
+    if not size or len(word) < size:
+        return [token for token in index['postings'] if word in token]
+    candidates = None
+    for gram in _ngrams(word, size):
+        tokens = set(index['grams'].get(gram, ()))
+        candidates = tokens if candidates is None else candidates & tokens
+        if not candidates:
+            return []
+    return [token for token in candidates if word in token]
+
+
+def search(table_name, column, op, value):
+    """
+    Ищет по полнотекстовому индексу записи, которые могут подойти под
+    условие contains или like. Возвращает {ID: релевантность}.
+    """
+    index = load_fulltext(table_name, column)
+    lengths = index['lengths']
+    average = sum(lengths.values()) / max(len(lengths), 1) or 1
+    scores = None
+    for word in query_words(op, value):
+        frequencies = Counter()
+        for token in _matching_tokens(index, word):
+            weight = 1.0 if token == word else _PARTIAL_WEIGHT
+            for key, count in index['postings'][token].items():
+                frequencies[key] += count * weight
+        if scores is not None:
+            frequencies = {key: frequency for key, frequency in frequencies.items()
+                           if key in scores}
+        idf = math.log(1 + (len(lengths) - len(frequencies) + 0.5) /
+                       (len(frequencies) + 0.5))
+        word_scores = {}
+        for key, frequency in frequencies.items():
+            norm = 1 - FULLTEXT_BM25_B + \
+                FULLTEXT_BM25_B * lengths.get(key, 0) / average
+            saturated = frequency * (FULLTEXT_BM25_K1 + 1) / \
+                (frequency + FULLTEXT_BM25_K1 * norm)
+            word_scores[key] = (scores or {}).get(key, 0.0) + idf * saturated
+        scores = word_scores
+        if not scores:
+            break
+    return {int(key): score for key, score in (scores or {}).items()}
+
+
+def rank(records, scores):
+    """
+    Упорядочивает записи по убыванию релевантности (при равенстве — по ID).
+    """
+    return sorted(records, key=lambda record: (-scores.get(record['ID'], 0.0),
+                                               record['ID']))
+
+
+@subscribe
+def _maintain_fulltext(table_name, changes):
+    """
+    Обновляет полнотекстовые индексы таблицы по пакету изменений.
+    Индекс меняется в памяти и записывается, когда изменений накопилось
+    FULLTEXT_SAVE_CHANGES.
+    """
+    for column in fulltext_columns(table_name):
+        filepath = fulltext_path(table_name, column)
+        if not os.path.exists(filepath):
+            continue
+        index = load_fulltext(table_name, column)
+        for change in changes:
+            if change.before is not None and change.before.get(column) is not None:
+                _remove(index, change.before['ID'], change.before[column])
+            if change.after is not None and change.after.get(column) is not None:
+                _add(index, change.after['ID'], change.after[column])
+
+        if filepath not in _unsaved:
+            with open(_dirty_path(filepath), 'w', encoding='utf-8'):
+                pass
+        changed = _unsaved.get(filepath, 0) + len(changes)
+        if changed >= FULLTEXT_SAVE_CHANGES:
+            _save_index(filepath, index)
+        else:
+            _unsaved[filepath] = changed
@@ -0,0 +1,188 @@
+"""
+Хэш-индексы по столбцам таблиц.
+Индекс хранится в data/<таблица>.idx.<столбец>.json как словарь
+{значение: [ID, ...]} и обновляется по событиям изменения данных.
+Для поиска по диапазону ключи индекса упорядочиваются по типизированному
+значению; упорядоченный список кэшируется до изменения файла индекса.
+"""
+
+import os
+from bisect import bisect_left, bisect_right
+
+from .catalog import load_table_options, save_table_options
+from .constants import DATA_DIR
+from .events import subscribe
+from .utils import (
+    ensure_data_dir,
+    load_json_file,
+    save_json_file,
+)
+
+
+def index_path(table_name, column):
+    """
+    Возвращает путь к файлу индекса.
+    """
+    return f"{DATA_DIR}/{table_name}.idx.{column}.json"
+
+
+def index_key(value):
+    """
+    Возвращает ключ индекса для типизированного значения столбца.
+    """
+    return str(value)
+
+
+def indexed_columns(table_name):
+    """
+    Возвращает столбцы таблицы, по которым построены индексы.
+    """
+    return load_table_options(table_name).get('indexes', [])
+
+
+def has_index(table_name, column):
+    """
+    Проверяет, есть ли индекс по столбцу.
+    """
+    return column in indexed_columns(table_name)
+
+
+def build_index(table_name, column, records):
+    """
+    Строит индекс по столбцу из записей таблицы и регистрирует его.
+    Возвращает количество различных значений.
+    """
+    index = {}
+    for record in records:
+        value = record.get(column)
+        if value is not None:
+            index.setdefault(index_key(value), []).append(record['ID'])
+
+    ensure_data_dir()
+    save_json_file(index_path(table_name, column), index)
+
+    options = load_table_options(table_name)
+    columns = options.setdefault('indexes', [])
+    if column not in columns:
+        columns.append(column)
+        save_table_options(table_name, options)
+    return len(index)
+
+
+def drop_index(table_name, column):
+    """
+    Удаляет индекс по столбцу.
+    """
+    options = load_table_options(table_name)
+    if column in options.get('indexes', []):
+        options['indexes'].remove(column)
+        save_table_options(table_name, options)
+    filepath = index_path(table_name, column)
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+
+def drop_indexes(table_name):
+    """
+    Удаляет все индексы таблицы.
+    """
+    for column in list(indexed_columns(table_name)):
+        drop_index(table_name, column)
+
+
+def lookup(table_name, column, value):
+    """
+    Возвращает ID записей, у которых столбец равен типизированному значению.
+    """
+    index = load_json_file(index_path(table_name, column), {})
+    return index.get(index_key(value), [])
+
+
+# Упорядоченные ключи индексов: {путь: (отметка файла, ключи, списки ID)}
+_ordered = {}
+
+
+def _ordered_index(table_name, column, convert):
+    """
+    Возвращает ключи индекса, упорядоченные по типизированному значению,
+    и соответствующие им списки ID.
+    """
+    filepath = index_path(table_name, column)
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return [], []
+    stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _ordered.get(filepath)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
+
+    items = sorted(((convert(key), ids)
+                    for key, ids in load_json_file(filepath, {}).items()),
+                   key=lambda item: item[0])
+    keys = [key for key, _ in items]
+    id_lists = [ids for _, ids in items]
+    _ordered[filepath] = (stamp, keys, id_lists)
+    return keys, id_lists
+
+
+def lookup_range(table_name, column, op, value, convert):
+    """
+    Возвращает ID записей, у которых столбец удовлетворяет сравнению
+    op (<, <=, >, >=) с типизированным значением.
+    convert приводит ключ индекса к типу столбца.
+    """
+    keys, id_lists = _ordered_index(table_name, column, convert)
+    if op == '<':
+        selected = id_lists[:bisect_left(keys, value)]
+    elif op == '<=':
+        selected = id_lists[:bisect_right(keys, value)]
+    elif op == '>':
+        selected = id_lists[bisect_right(keys, value):]
+    else:
+        selected = id_lists[bisect_left(keys, value):]
+    return [record_id for ids in selected for record_id in ids]
+
+
+def load_index(table_name, column):
+    """
+    Загружает индекс целиком для серии поисков (например, при соединении).
+    """
+    return load_json_file(index_path(table_name, column), {})
+
+
+@subscribe
+def _maintain_indexes(table_name, changes):
+    """
+    Обновляет индексы таблицы по пакету изменений.
+    """
+    for column in indexed_columns(table_name):
+        filepath = index_path(table_name, column)
+        index = load_json_file(filepath, {})
+        for change in changes:
+            if change.before is not None:
+                old = change.before.get(column)
+                ids = index.get(index_key(old))
+                if old is not None and ids and change.before['ID'] in ids:
+                    ids.remove(change.before['ID'])
+                    if not ids:
+                        del index[index_key(old)]
+            if change.after is not None:
+                new = change.after.get(column)
+                if new is not None:
+                    index.setdefault(index_key(new), []).append(change.after['ID'])
+        save_json_file(filepath, index)
+
+
+def rename_index(table_name, column, new_name):
+    """
+    Переименовывает индекс вслед за столбцом.
+    """
+    options = load_table_options(table_name)
+    if column not in options.get('indexes', []):
+        return
+    options['indexes'] = [new_name if name == column else name
+                          for name in options['indexes']]
+    save_table_options(table_name, options)
+    if os.path.exists(index_path(table_name, column)):
+        os.replace(index_path(table_name, column), index_path(table_name, new_name))
@@ -0,0 +1,215 @@
+"""
+Соединение таблиц (JOIN).
+
+Поддерживаются две стратегии:
+- hash join: хэш-таблица строится по меньшей таблице, большая читается потоком;
+  если хэш-таблица не помещается в лимит памяти запроса, обе стороны
+  раскладываются по хэш-разделам во временные файлы (grace hash join);
+- index nested loop: если на ключе соединения одной из таблиц есть индекс
+  (или это ID таблицы, которую можно читать по ID), вторая таблица читается
+  потоком пакетами, а для каждого пакета нужные записи достаются по индексу.
+Обе стороны читаются через storage.scan, как и обычный select.
+"""
+
+from .codec import get_codec
+from .constants import JOIN_BATCH_ROWS, SPILL_MAX_DEPTH
+from .indexes import has_index, index_key, load_index
+from .spill import (
+    PartitionWriter,
+    SpillFiles,
+    get_memory_limit,
+    partition_of,
+    read_spilled,
+    record_size,
+)
+from .storage import estimate_size, fetch_records, scan, supports_id_lookup
+
+
+def side_rows(metadata, table_name, where=None):
+    """
+    Потоково выдает записи одной стороны соединения с учетом условия WHERE.
+    """
+    codec = get_codec(metadata[table_name])
+    matches = codec.matcher(*where) if where else None
+    for record in scan(table_name, where, codec):
+        if matches is None or matches(record):
+            yield record
+
+
+def _can_probe(table_name, column):
+    """
+    Проверяет, можно ли искать записи таблицы по столбцу без полного чтения.
+    """
+    if has_index(table_name, column):
+        return True
+    return column == 'ID' and supports_id_lookup(table_name)
+
+
+def choose_strategy(spec):
+    """
+    Выбирает стратегию соединения.
+    Возвращает ('index', сторона с индексом) или ('hash', сторона для построения).
+    """
+    if _can_probe(spec['right'], spec['right_column']):
+        return 'index', 'right'
+    if _can_probe(spec['left'], spec['left_column']):
+        return 'index', 'left'
+    if estimate_size(spec['right']) <= estimate_size(spec['left']):
+        return 'hash', 'right'
+    return 'hash', 'left'
+
+
+def _partition_rows(writer, rows, column, accept=None):
+    """
+    Раскладывает записи с непустым ключом по хэш-разделам.
+    """
+    for record in rows:
+        value = record.get(column)
+        if value is not None and (accept is None or accept(index_key(value))):
+            writer.add(index_key(value), record)
+    writer.close()
+
+
+def hash_join(build_rows, build_column, probe_rows, probe_column,
+              memory_limit=None, stats=None, level=0):
+    """
+    Соединяет записи хэшированием: строит таблицу по build_rows,
+    затем потоково проверяет probe_rows. Выдает пары (build, probe).
+    Если таблица превышает лимит памяти, соединение выполняется по
+    хэш-разделам во временных файлах.
+    """
+    limit = memory_limit or get_memory_limit()
+    build_rows = iter(build_rows)
+    table = {}
+    used = 0
+    spilled = False
+    for record in build_rows:
+        value = record.get(build_column)
+        if value is not None:
+            table.setdefault(index_key(value), []).append(record)
+            used += record_size(record)
+            if used >= limit and level < SPILL_MAX_DEPTH:
+                spilled = True
+                break
+
+    if not spilled:
+        for record in probe_rows:
+            value = record.get(probe_column)
+            if value is None:
+                continue
+            for match in table.get(index_key(value), ()):
+                yield match, record
+        return
+
+    with SpillFiles() as spill:
+        builds = PartitionWriter(spill, level)
+        for records in table.values():
+            for record in records:
+                builds.add(index_key(record[build_column]), record)
+        table = None
+        _partition_rows(builds, build_rows, build_column)
+
+        probes = PartitionWriter(spill, level)
+        _partition_rows(probes, probe_rows, probe_column,
+                        lambda key: partition_of(key, level) in builds.paths)
+        if stats is not None:
+            stats['spilled'] = stats.get('spilled', 0) + spill.files
+
+        for number, path in builds.paths.items():
+            if number in probes.paths:
+                yield from hash_join(read_spilled(path), build_column,
+                                     read_spilled(probes.paths[number]), probe_column,
+                                     memory_limit, stats, level + 1)
+
+
+def _probe_batch(batch, outer_column, inner_table, inner_column, index, accept):
+    """
+    Находит пары для пакета внешних записей через индекс внутренней таблицы.
+    """
+    keys = {index_key(record.get(outer_column)) for record in batch
+            if record.get(outer_column) is not None}
+    if index is None:
+        ids = set()
+        for key in keys:
+            try:
+                ids.add(int(key))
+            except ValueError:
+                continue
+    else:
+        ids = {record_id for key in keys for record_id in index.get(key, ())}
+
+    inner_by_key = {}
+    for record in fetch_records(inner_table, ids):
+        if accept(record):
+            inner_by_key.setdefault(index_key(record.get(inner_column)), []).append(
+                record)
+
+    for record in batch:
+        value = record.get(outer_column)
+        if value is None:
+            continue
+        for match in inner_by_key.get(index_key(value), ()):
+            yield record, match
+
+
+def index_nested_loop_join(outer_rows, outer_column, inner_table, inner_column,
+                           accept=lambda record: True):
+    """
+    Соединяет потоковые внешние записи с внутренней таблицей через индекс
+    по inner_column (или чтение по ID). Выдает пары (outer, inner).
+    """
+    if has_index(inner_table, inner_column):
+        index = load_index(inner_table, inner_column)
+    else:
+        index = None  # поиск по ID без отдельного индекса
+
+    batch = []
+    for record in outer_rows:
+        batch.append(record)
+        if len(batch) >= JOIN_BATCH_ROWS:
+            yield from _probe_batch(batch, outer_column, inner_table,
+                                    inner_column, index, accept)
+            batch = []
+    if batch:
+        yield from _probe_batch(batch, outer_column, inner_table,
+                                inner_column, index, accept)
+
+
+def execute_join(metadata, spec, stats=None):
+    """
+    Выполняет соединение. Возвращает стратегию и генератор пар
+    (левая запись, правая запись). В stats (если передан) записывается
+    количество временных файлов, сброшенных на диск.
+    """
+    left, right = spec['left'], spec['right']
+    where = spec['where']
+    left_where = where[1:] if where and where[0] == left else None
+    right_where = where[1:] if where and where[0] == right else None
+
+    strategy, side = choose_strategy(spec)
+    if strategy == 'index':
+        if side == 'right':
+            outer, outer_col, outer_where = left, spec['left_column'], left_where
+            inner, inner_col, inner_where = right, spec['right_column'], right_where
+        else:
+            outer, outer_col, outer_where = right, spec['right_column'], right_where
+            inner, inner_col, inner_where = left, spec['left_column'], left_where
+
+        accept = get_codec(metadata[inner]).matcher(*inner_where) \
+            if inner_where else (lambda record: True)
+        pairs = index_nested_loop_join(side_rows(metadata, outer, outer_where),
+                                       outer_col, inner, inner_col, accept)
+        if side == 'left':
+            pairs = ((left_rec, right_rec) for right_rec, left_rec in pairs)
+        return f'index nested loop ({inner}.{inner_col})', pairs
+
+    if side == 'right':
+        pairs = hash_join(side_rows(metadata, right, right_where), spec['right_column'],
+                          side_rows(metadata, left, left_where), spec['left_column'],
+                          stats=stats)
+        pairs = ((left_rec, right_rec) for right_rec, left_rec in pairs)
+    else:
+        pairs = hash_join(side_rows(metadata, left, left_where), spec['left_column'],
+                          side_rows(metadata, right, right_where), spec['right_column'],
+                          stats=stats)
+    return f'hash join (build: {spec[side]})', pairs
@@ -3,14 +3,24 @@
 Точка входа для командной строки.
 """
 
+import sys
+
 from .engine import run
+from .replication import follow
 
 
 def main():
     """
     Главная функция, запускающая приложение.
+    С аргументами follow <каталог ведущей базы> запускает репликацию.
     """
-    run()
+    args = sys.argv[1:]
+    if len(args) == 2 and args[0] == 'follow':
+        follow(args[1])
+    elif args:
+        print("📝 Формат: project [follow <каталог ведущей базы>]")
+    else:
+        run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,179 @@
+"""
+Вставка с обновлением при конфликте (upsert) и слияние файла с таблицей (merge).
+
+Строки применяются пакетами: для пакета записи с теми же значениями
+ключа находятся за один поиск (по ID, по хэш-индексу ключа или одним
+просмотром таблицы, если индекса нет), затем все вставки и обновления
+пакета записываются одним изменением таблицы и публикуются одним
+событием. Поэтому синхронизация N строк стоит N / размер пакета
+записей таблицы вместо чтения и записи таблицы на каждую строку.
+"""
+
+import csv
+import json
+from collections import Counter, namedtuple
+
+from .constants import MERGE_BATCH_ROWS
+from .events import Change, publish
+from .export import export_format
+from .indexes import has_index, index_key, lookup
+from .storage import apply_changes, fetch_records, last_record_id, scan
+from .ttl import expired_predicate, ttl_spec
+
+# Значение SET из вставляемой строки: excluded.<столбец>
+Excluded = namedtuple('Excluded', ['column'])
+
+
+def read_rows(filepath):
+    """
+    Потоково читает строки файла CSV (с заголовком) или JSON Lines
+    как словари {столбец: значение}.
+    """
+    file_format = export_format(filepath)
+    with open(filepath, encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f'строка {number}: ожидался объект JSON')
+            yield row
+
+
+def parse_row(codec, fields, key):
+    """
+    Преобразует строку файла в частичную типизированную запись.
+    ID сохраняется только для слияния по ID.
+    """
+    fields = dict(fields)
+    record_id = fields.pop('ID', None)
+    row = codec.encode_fields(fields, complete=False)
+    if key == 'ID' and record_id not in (None, ''):
+        row['ID'] = codec.convert('ID', record_id)
+    return row
+
+
+def batches(rows, size=MERGE_BATCH_ROWS):
+    """
+    Разбивает поток строк на списки не длиннее size.
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def find_conflicts(table_name, key, values):
+    """
+    Возвращает записи таблицы, у которых ключ совпадает с одним из
+    значений: {ключ индекса: [записи]}. По ID возвращаются и истекшие
+    записи таблицы с TTL — их ID нельзя выдать повторно.
+    """
+    wanted = {index_key(value) for value in values}
+    if not wanted:
+        return {}
+    if key == 'ID':
+        records = fetch_records(table_name, values, include_expired=True)
+    elif has_index(table_name, key):
+        record_ids = [record_id for value in set(values)
+                      for record_id in lookup(table_name, key, value)]
+        records = fetch_records(table_name, record_ids)
+    else:
+        records = (record for record in scan(table_name)
+                   if record.get(key) is not None and
+                   index_key(record[key]) in wanted)
+
+    conflicts = {}
+    for record in records:
+        conflicts.setdefault(index_key(record[key]), []).append(record)
+    return conflicts
+
+
+def _assign(record, values):
+    """
+    Возвращает копию записи с новыми значениями (None удаляет значение).
+    """
+    updated = dict(record)
+    for column, value in values.items():
+        if value is None:
+            updated.pop(column, None)
+        else:
+            updated[column] = value
+    return updated
+
+
+def upsert_rows(table_name, codec, rows, key, assignments=None, do_nothing=False):
+    """
+    Применяет пакет строк: строка без конфликта по ключу вставляется,
+    а у записей с тем же ключом обновляются столбцы из assignments
+    ({столбец: значение или Excluded}; без assignments — все столбцы
+    строки). Строки — частичные типизированные записи (ID — только при
+    конфликте по ID). Все изменения пакета записываются одним изменением
+    таблицы.
+    Возвращает счетчик {'inserted', 'updated', 'skipped'}.
+    """
+    conflicts = find_conflicts(table_name, key, [row[key] for row in rows
+                                                 if row.get(key) is not None])
+    expired = expired_predicate(ttl_spec(table_name))
+    changes = {}
+    counts = Counter()
+    next_id = None
+
+    for row in rows:
+        matched = conflicts.get(index_key(row[key]), []) \
+            if row.get(key) is not None else []
+        live = [record for record in matched if not expired(record)]
+        if not live:
+            fields = codec.encode_fields(row)
+            if next_id is None:
+                next_id = last_record_id(table_name) + 1
+            record_id = row.get('ID', next_id)
+            next_id = max(next_id, record_id + 1)
+            record = {'ID': record_id, **{column: value for column, value
+                                          in fields.items() if value is not None}}
+            # Истекшая запись с тем же ID заменяется новой
+            before = matched[0] if matched else None
+            op = 'update' if before else 'insert'
+            changes[record_id] = Change(op, before, record)
+            if row.get(key) is not None:
+                conflicts[index_key(row[key])] = [record]
+            counts['inserted'] += 1
+            continue
+        if do_nothing:
+            counts['skipped'] += 1
+            continue
+
+        if assignments is None:
+            values = {column: value for column, value in row.items()
+                      if column not in ('ID', key)}
+        else:
+            # Значение из excluded может оказаться NULL: проверяется,
+            # как и значения вставляемой строки
+            values = codec.encode_fields(
+                {column: row.get(value.column) if isinstance(value, Excluded)
+                 else value for column, value in assignments.items()},
+                complete=False)
+        updated_records = []
+        for record in live:
+            updated = _assign(record, values)
+            previous = changes.get(record['ID'])
+            if previous is not None:
+                changes[record['ID']] = Change(previous.op, previous.before, updated)
+            else:
+                changes[record['ID']] = Change('update', record, updated)
+            updated_records.append(updated)
+        conflicts[index_key(row[key])] = updated_records
+        counts['updated'] += len(live)
+
+    if changes:
+        batch = list(changes.values())
+        apply_changes(table_name, batch)
+        publish(table_name, batch)
+    return counts
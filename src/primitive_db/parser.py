@@ -2,6 +2,17 @@
 Парсер для сложных команд SQL-подобного синтаксиса.
 """
 
+import re
+
+from .constants import (
+    CREATE_TABLE_OPTIONS,
+    FULLTEXT_NGRAM,
+    INDEX_KINDS,
+    NULL_LITERAL,
+    PARTITION_KINDS,
+    WHERE_OPERATORS,
+)
+
 
 def parse_values(values_str):
     """
@@ -9,13 +20,19 @@ def parse_values(values_str):
     """
     if values_str.startswith('(') and values_str.endswith(')'):
         values_str = values_str[1:-1]
-    
+    return split_values(values_str)
+
+
+def split_values(text):
+    """
+    Разбивает строку по запятым вне кавычек; кавычки сохраняются.
+    """
     values = []
     current_value = ""
     in_quotes = False
     quote_char = None
-    
-    for char in values_str:
+
+    for char in text:
         if char in ['"', "'"] and not in_quotes:
             in_quotes = True
             quote_char = char
@@ -37,12 +54,22 @@ def parse_values(values_str):
 
 def parse_where(where_parts):
     """
-    Парсит условие WHERE.
+    Парсит условие WHERE: столбец <оператор> значение или столбец is [not] null.
+    Для равенства возвращает пару (столбец, значение), для остальных
+    операторов — (столбец, значение, оператор).
     """
-    if len(where_parts) != 3 or where_parts[1] != '=':
+    lowered = [part.lower() for part in where_parts]
+    if len(where_parts) in (3, 4) and lowered[1] == 'is' and \
+            lowered[-1] == NULL_LITERAL:
+        if len(where_parts) == 4 and lowered[2] != 'not':
+            raise ValueError("Некорректный формат условия WHERE")
+        return where_parts[0], None, ' '.join(lowered[1:-1])
+
+    if len(where_parts) != 3 or lowered[1] not in WHERE_OPERATORS:
         raise ValueError("Некорректный формат условия WHERE")
     
     column = where_parts[0]
+    operator = lowered[1]
     value = where_parts[2]
     
     # Убираем кавычки для строковых значений
@@ -50,6 +77,8 @@ def parse_where(where_parts):
        (value.startswith("'") and value.endswith("'")):
         value = value[1:-1]
     
+    if operator != '=':
+        return column, value, operator
     return column, value
 
 
@@ -69,3 +98,309 @@ def parse_set(set_parts):
         value = value[1:-1]
     
     return column, value
+
+
+def parse_partition(clause):
+    """
+    Парсит описание партиционирования вида 'range(ID, 100000)' или 'hash(col, 8)'.
+    """
+    match = re.fullmatch(r'\s*(\w+)\s*\(\s*(\w+)\s*,\s*(\d+)\s*\)\s*', clause)
+    if not match or match.group(1).lower() not in PARTITION_KINDS:
+        raise ValueError("Некорректный формат условия PARTITION BY")
+
+    kind, column, size = match.groups()
+    return {'kind': kind.lower(), 'column': column, 'size': int(size)}
+
+
+def parse_create_table(parts):
+    """
+    Парсит аргументы create_table:
+    <имя> <столбец:тип> ... [partition by <спецификация>] [with ключ=значение ...],
+    где время жизни записей задается как ttl=<секунды> on <столбец>.
+    Возвращает имя таблицы, список столбцов и словарь параметров хранения.
+    """
+    lowered = [part.lower() for part in parts]
+    end = len(parts)
+    options = {}
+
+    if 'with' in lowered:
+        idx = lowered.index('with')
+        items = parts[idx + 1:]
+        position = 0
+        while position < len(items):
+            item = items[position]
+            position += 1
+            if '=' not in item:
+                raise ValueError(f'Некорректный параметр "{item}"')
+            key, value = item.split('=', 1)
+            key = key.lower()
+            if key not in CREATE_TABLE_OPTIONS:
+                raise ValueError(f'Неизвестный параметр таблицы "{key}"')
+            if key == 'ttl':
+                # ttl=<секунды> on <столбец timestamp>
+                if position + 1 >= len(items) or items[position].lower() != 'on':
+                    raise ValueError("Ожидается ttl=<секунды> on <столбец>")
+                try:
+                    seconds = int(value)
+                except ValueError:
+                    raise ValueError(f'Некорректное время жизни "{value}"') from None
+                options['ttl'] = {'seconds': seconds, 'column': items[position + 1]}
+                position += 2
+            else:
+                options[key] = value.lower()
+        end = idx
+
+    if 'partition' in lowered[:end]:
+        idx = lowered.index('partition')
+        if lowered[idx + 1:idx + 2] != ['by'] or idx + 2 >= end:
+            raise ValueError("Некорректный формат условия PARTITION BY")
+        options['partition'] = parse_partition(' '.join(parts[idx + 2:end]))
+        end = idx
+
+    if end < 2:
+        raise ValueError("Недостаточно аргументов")
+
+    return parts[0], parts[1:end], options
+
+
+def _split_qualified(name):
+    """
+    Разбивает имя вида 'таблица.столбец' на части.
+    """
+    if '.' not in name:
+        return None, name
+    table, column = name.split('.', 1)
+    return table, column
+
+
+def parse_join(parts):
+    """
+    Парсит запрос с соединением таблиц:
+    from <t1> join <t2> on <t1.столбец> = <t2.столбец> [where столбец = значение].
+    """
+    if len(parts) < 8 or parts[0] != 'from' or parts[2] != 'join' \
+            or parts[4] != 'on' or parts[6] != '=':
+        raise ValueError("Некорректный формат условия JOIN")
+
+    left, right = parts[1], parts[3]
+    conditions = {}
+    for name in (parts[5], parts[7]):
+        table, column = _split_qualified(name)
+        if table not in (left, right) or table in conditions:
+            raise ValueError(f'Некорректный столбец соединения "{name}"')
+        conditions[table] = column
+
+    where = None
+    if len(parts) > 8:
+        if parts[8] != 'where':
+            raise ValueError("Некорректный формат условия JOIN")
+        column, *condition = parse_where(parts[9:])
+        table, column = _split_qualified(column)
+        where = (table, column, *condition)
+
+    return {
+        'left': left,
+        'right': right,
+        'left_column': conditions[left],
+        'right_column': conditions[right],
+        'where': where,
+    }
+
+
+def parse_alter(parts):
+    """
+    Парсит аргументы команды alter:
+    table <т> add column <столбец:тип> [default <значение>]
+    table <т> drop column <столбец>
+    table <т> rename column <столбец> to <новое_имя>
+    table <т> set compression <кодек>
+    """
+    lowered = [part.lower() for part in parts]
+    if len(parts) < 5 or lowered[0] != 'table':
+        raise ValueError("Некорректный формат команды ALTER TABLE")
+
+    table_name = parts[1]
+    action = lowered[2:4]
+
+    if action == ['set', 'compression'] and len(parts) == 5:
+        return table_name, {'op': 'compression', 'codec': lowered[4]}
+
+    if action == ['add', 'column'] and len(parts) in (5, 7):
+        if ':' not in parts[4]:
+            raise ValueError(f'Некорректный формат столбца "{parts[4]}"')
+        column, col_type = parts[4].split(':', 1)
+        default = None
+        if len(parts) == 7:
+            if lowered[5] != 'default':
+                raise ValueError("Некорректный формат команды ALTER TABLE")
+            default = parts[6]
+        return table_name, {'op': 'add', 'column': column, 'type': col_type,
+                            'default': default}
+
+    if action == ['drop', 'column'] and len(parts) == 5:
+        return table_name, {'op': 'drop', 'column': parts[4]}
+
+    if action == ['rename', 'column'] and len(parts) == 7 and lowered[5] == 'to':
+        return table_name, {'op': 'rename', 'column': parts[4],
+                            'new_name': parts[6]}
+
+    raise ValueError("Некорректный формат команды ALTER TABLE")
+
+
+def parse_create_view(parts):
+    """
+    Парсит аргументы команды create:
+    materialized view <имя> as select from <таблица> [where условие].
+    Возвращает (имя представления, исходная таблица, условие или None).
+    """
+    lowered = [part.lower() for part in parts]
+    if len(parts) < 7 or lowered[:2] != ['materialized', 'view'] or \
+            lowered[3:6] != ['as', 'select', 'from']:
+        raise ValueError("Некорректный формат команды CREATE MATERIALIZED VIEW")
+
+    where = None
+    if len(parts) > 7:
+        if lowered[7] != 'where':
+            raise ValueError("Некорректный формат команды CREATE MATERIALIZED VIEW")
+        where = parse_where(parts[8:])
+    return parts[2], parts[6], where
+
+
+def _split_tail(parts, first, second):
+    """
+    Отделяет окончание команды, начинающееся с пары слов first second
+    (например, order by). Возвращает (части до него, части после него или None).
+    """
+    lowered = [part.lower() for part in parts]
+    for i in range(len(parts) - 2, -1, -1):
+        if lowered[i] == first and lowered[i + 1] == second:
+            return parts[:i], parts[i + 2:]
+    return parts, None
+
+
+def parse_order_by(parts):
+    """
+    Отделяет от команды select окончание order by <столбец> [asc|desc].
+    Возвращает (остальные части, (столбец, по убыванию) или None).
+    """
+    parts, tail = _split_tail(parts, 'order', 'by')
+    if tail is None:
+        return parts, None
+    if len(tail) not in (1, 2) or \
+            (len(tail) == 2 and tail[1].lower() not in ('asc', 'desc')):
+        raise ValueError("Некорректный формат ORDER BY")
+    return parts, (tail[0], len(tail) == 2 and tail[1].lower() == 'desc')
+
+
+def parse_count(parts):
+    """
+    Парсит аргументы команды select count(*) | count(distinct <столбец>)
+    from <таблица> [where условие] [group by <столбец>].
+    Возвращает (таблица, условие или None, столбец группировки или None,
+    столбец count(distinct) или None).
+    """
+    parts, group = _split_tail(parts, 'group', 'by')
+    if group is not None and len(group) != 1:
+        raise ValueError("Некорректный формат GROUP BY")
+    lowered = [part.lower() for part in parts]
+    if 'from' not in lowered:
+        raise ValueError("Некорректный формат команды SELECT COUNT")
+    position = lowered.index('from')
+    match = re.fullmatch(r'count\(\s*(?:\*|distinct\s+(\w+))\s*\)',
+                         ' '.join(parts[:position]), re.IGNORECASE)
+    if not match or len(parts) < position + 2:
+        raise ValueError("Некорректный формат команды SELECT COUNT")
+    table_name = parts[position + 1]
+    rest = parts[position + 2:]
+
+    where = None
+    if rest:
+        if rest[0].lower() != 'where':
+            raise ValueError("Некорректный формат команды SELECT COUNT")
+        where = parse_where(rest[1:])
+    return table_name, where, group[0] if group else None, match.group(1)
+
+
+def parse_index(parts):
+    """
+    Парсит аргументы команд create_index и drop_index:
+    <таблица> <столбец> [using <вид>] (для fulltext — еще [ngram[=n]]).
+    Возвращает (таблица, столбец, вид, параметры вида).
+    """
+    if len(parts) == 2:
+        return parts[0], parts[1], 'hash', {}
+    if len(parts) not in (4, 5) or parts[2].lower() != 'using' or \
+            parts[3].lower() not in INDEX_KINDS:
+        raise ValueError("Некорректный формат команды индекса")
+    kind = parts[3].lower()
+    if len(parts) == 4:
+        return parts[0], parts[1], kind, {}
+
+    match = re.fullmatch(r'ngram(?:=(\d+))?', parts[4].lower())
+    if kind != 'fulltext' or not match:
+        raise ValueError("Некорректный формат команды индекса")
+    ngram = int(match.group(1) or FULLTEXT_NGRAM)
+    if ngram < 2:
+        raise ValueError("Размер n-грамм должен быть не меньше 2")
+    return parts[0], parts[1], kind, {'ngram': ngram}
+
+
+def parse_size(text):
+    """
+    Парсит размер в байтах: число с необязательным суффиксом k, m или g.
+    """
+    match = re.fullmatch(r'(\d+)([kmg]?)b?', text.strip().lower())
+    if not match:
+        raise ValueError(f'Некорректный размер "{text}"')
+    return int(match.group(1)) * 1024 ** ' kmg'.index(match.group(2) or ' ')
+
+
+def parse_upsert(parts):
+    """
+    Парсит аргументы команды upsert:
+    into <таблица> values (...) on conflict (<столбец>)
+    do update set <столбец> = <значение>, ... | do nothing.
+    Части команды должны сохранять кавычки значений (shlex.split с
+    posix=False), иначе запятая внутри строки разделит присваивания.
+    Возвращает словарь: таблица, строка значений, столбец конфликта
+    и присваивания [(столбец, значение)] (None для do nothing).
+    """
+    lowered = [part.lower() for part in parts]
+    conflicts = [i for i in range(len(parts) - 1)
+                 if lowered[i:i + 2] == ['on', 'conflict']]
+    if len(parts) < 4 or lowered[0] != 'into' or lowered[2] != 'values' or \
+            not conflicts or 'do' not in lowered[conflicts[-1]:]:
+        raise ValueError("Некорректный формат команды upsert")
+    on = conflicts[-1]
+    do = lowered.index('do', on)
+    values = ' '.join(parts[3:on])
+    key = ''.join(parts[on + 2:do]).strip('()').strip()
+    if not values or not key:
+        raise ValueError("Некорректный формат команды upsert")
+
+    action = lowered[do + 1:]
+    if action == ['nothing']:
+        assignments = None
+    elif action[:2] == ['update', 'set'] and len(action) > 2:
+        assignments = []
+        for item in split_values(' '.join(parts[do + 3:])):
+            column, _, value = item.partition('=')
+            if not column.strip() or not value.strip():
+                raise ValueError("Некорректный формат условия SET")
+            assignments.append(parse_set([column.strip(), '=', value.strip()]))
+    else:
+        raise ValueError("Ожидалось do update set ... или do nothing")
+    return {'table': parts[1], 'values': values, 'key': key, 'set': assignments}
+
+
+def parse_merge(parts):
+    """
+    Парсит аргументы команды merge: <таблица> from <файл> [on <столбец>].
+    Возвращает (таблица, файл, столбец ключа; по умолчанию ID).
+    """
+    lowered = [part.lower() for part in parts]
+    if len(parts) == 3 and lowered[1] == 'from':
+        return parts[0], parts[2], 'ID'
+    if len(parts) == 5 and lowered[1] == 'from' and lowered[3] == 'on':
+        return parts[0], parts[2], parts[4].strip('()')
+    raise ValueError("Некорректный формат команды merge")
@@ -0,0 +1,74 @@
+"""
+Партиционирование таблиц по диапазону или хэшу значения столбца.
+"""
+
+import zlib
+
+from .codec import where_parts
+
+
+def validate_partition(spec, table_structure):
+    """
+    Проверяет, что описание партиционирования подходит к схеме таблицы.
+    """
+    column = spec['column']
+    if column not in table_structure:
+        raise ValueError(f'Столбец "{column}" не существует')
+    if spec['kind'] == 'range' and table_structure[column] != 'int':
+        raise ValueError("Партиционирование range возможно только по int столбцу")
+    if spec['size'] <= 0:
+        raise ValueError("Размер партиции должен быть положительным")
+
+
+def _hash_key(value, count):
+    """
+    Стабильный между запусками хэш значения столбца.
+    """
+    return zlib.crc32(str(value).encode('utf-8')) % count
+
+
+def partition_key(spec, record):
+    """
+    Возвращает номер партиции для записи.
+    """
+    value = record.get(spec['column'])
+    if spec['kind'] == 'range':
+        return value // spec['size']
+    return _hash_key(value, spec['size'])
+
+
+def prune_partitions(spec, where_clause, codec, existing=None):
+    """
+    Возвращает номера партиций, которые могут содержать записи под условие,
+    или None, если условие не позволяет отсечь партиции.
+    Сравнения на больше/меньше отсекают партиции по диапазону среди
+    существующих партиций existing.
+    """
+    if not where_clause or where_clause[0] != spec['column']:
+        return None
+
+    column, value, op = where_parts(where_clause)
+    if op == '=':
+        try:
+            value = codec.convert(column, value)
+        except (TypeError, ValueError):
+            return []
+        return [partition_key(spec, {column: value})]
+
+    if spec['kind'] != 'range' or existing is None or \
+            op not in ('<', '<=', '>', '>='):
+        return None
+    try:
+        bound = partition_key(spec, {column: codec.convert(column, value)})
+    except (TypeError, ValueError):
+        return None
+    if op in ('<', '<='):
+        return [key for key in existing if key <= bound]
+    return [key for key in existing if key >= bound]
+
+
+def describe_partition(spec):
+    """
+    Возвращает описание партиционирования в синтаксисе команды.
+    """
+    return f"{spec['kind']}({spec['column']}, {spec['size']})"
@@ -0,0 +1,392 @@
+"""
+Планировщик запросов select.
+
+Для каждого запроса оцениваются способы доступа к данным и выбирается
+самый дешевый:
+- empty: фильтр Блума показывает, что подходящих записей нет;
+- cache: результат того же запроса уже в кэше и таблица не менялась;
+- index: поиск ID по индексу и чтение только этих записей;
+- fulltext: поиск записей под условие contains/like по полнотекстовому
+  индексу и чтение только найденных записей;
+- scan: просмотр таблицы (только партиций, подходящих под условие).
+Количество подходящих записей оценивается по статистике analyze
+(число различных значений, min/max, гистограмма) или, если ее нет, по
+оценке HyperLogLog и значениям по умолчанию. Статистика собирается
+заново, когда после analyze изменилась заметная часть таблицы, поэтому
+планы меняются вместе с данными.
+"""
+
+import math
+import os
+import random
+from bisect import bisect_left
+from collections import Counter, OrderedDict, namedtuple
+
+from .catalog import get_catalog, load_table_options
+from .codec import where_parts
+from .constants import (
+    ANALYZE_COMMON_VALUES,
+    ANALYZE_SAMPLE_ROWS,
+    ANALYZE_STALE_FRACTION,
+    CACHE_ENABLED,
+    HISTOGRAM_BUCKETS,
+    PLAN_FETCH_ROW_COST,
+    PLAN_INDEX_COST,
+    PLAN_INDEX_KEY_COST,
+    PLAN_SCAN_ROW_COST,
+    PLAN_TEXT_MATCH_COST,
+    RESULT_CACHE_ENTRIES,
+    RESULT_CACHE_ROWS,
+    SEGMENT_ROWS,
+    TEXT_OPERATORS,
+)
+from .events import subscribe
+from .fulltext import searchable
+from .indexes import has_index, index_key
+from .sketches import HyperLogLog, load_sketches, might_contain
+from .storage import (
+    count_rows,
+    partition_counts,
+    scan,
+    supports_id_lookup,
+    table_files,
+)
+
+# access — способ доступа, rows — оценка количества записей, cost — стоимость
+Plan = namedtuple('Plan', ['access', 'rows', 'cost', 'detail'])
+
+# Доля подходящих записей, если статистики нет
+_DEFAULT_SELECTIVITY = {'=': 0.05, '!=': 0.95, 'range': 1 / 3, 'null': 0.1,
+                        'text': 0.1}
+
+
+def _histogram(values):
+    """
+    Возвращает границы корзин гистограммы равной наполненности
+    по отсортированной выборке.
+    """
+    if not values:
+        return []
+    buckets = min(HISTOGRAM_BUCKETS, len(values))
+    last = len(values) - 1
+    return [values[round(i * last / buckets)] for i in range(buckets + 1)]
+
+
+def _most_common(values, non_null_fraction):
+    """
+    Возвращает частые значения выборки [[значение, доля записей], ...]:
+    встречающиеся заметно чаще среднего (их доля не следует из 1/distinct).
+    """
+    if not values:
+        return []
+    counts = Counter(values)
+    average = len(values) / len(counts)
+    return [[value, count / len(values) * non_null_fraction]
+            for value, count in counts.most_common(ANALYZE_COMMON_VALUES)
+            if count > 1 and count > 2 * average]
+
+
+def analyze_table(table_name):
+    """
+    Собирает статистику таблицы за один просмотр: количество записей,
+    для каждого столбца — количество NULL, различных значений (оценка),
+    min/max, частые значения и гистограмму по случайной выборке.
+    Сохраняет ее в каталоге.
+    """
+    catalog = get_catalog()
+    columns = list(catalog[table_name])
+    stats = {column: {'nulls': 0, 'min': None, 'max': None} for column in columns}
+    sketches = {column: HyperLogLog() for column in columns}
+    samples = {column: [] for column in columns}
+    rng = random.Random(0)
+
+    rows = 0
+    for record in scan(table_name):
+        rows += 1
+        for column in columns:
+            value = record.get(column)
+            column_stats = stats[column]
+            if value is None:
+                column_stats['nulls'] += 1
+                continue
+            if column_stats['min'] is None or value < column_stats['min']:
+                column_stats['min'] = value
+            if column_stats['max'] is None or value > column_stats['max']:
+                column_stats['max'] = value
+            sketches[column].add(index_key(value))
+            sample = samples[column]
+            if len(sample) < ANALYZE_SAMPLE_ROWS:
+                sample.append(value)
+            else:
+                position = rng.randrange(rows - column_stats['nulls'])
+                if position < ANALYZE_SAMPLE_ROWS:
+                    sample[position] = value
+
+    for column in columns:
+        non_null = rows - stats[column]['nulls']
+        stats[column]['distinct'] = min(sketches[column].count(), non_null)
+        stats[column]['histogram'] = _histogram(sorted(samples[column]))
+        stats[column]['common'] = _most_common(samples[column], non_null / max(rows, 1))
+    catalog.update_stats(table_name, rows=rows, columns=stats,
+                         analyzed_rows=rows, modified=0)
+    return stats
+
+
+def _refresh_stats(table_name):
+    """
+    Возвращает статистику таблицы, собирая ее заново, если после
+    analyze изменилась заметная часть записей.
+    """
+    stats = get_catalog().stats(table_name)
+    analyzed = stats.get('analyzed_rows')
+    if analyzed is not None and \
+            stats.get('modified', 0) > ANALYZE_STALE_FRACTION * max(analyzed, 100):
+        analyze_table(table_name)
+        stats = get_catalog().stats(table_name)
+    return stats
+
+
+def _fraction_below(bounds, value):
+    """
+    Оценивает долю значений меньше value по границам гистограммы.
+    """
+    if not bounds:
+        return None
+    if value <= bounds[0]:
+        return 0.0
+    if value > bounds[-1]:
+        return 1.0
+    position = bisect_left(bounds, value)
+    low, high = bounds[position - 1], bounds[position]
+    inside = 0.5
+    numeric = all(isinstance(item, (int, float)) and not isinstance(item, bool)
+                  for item in (low, high, value))
+    if numeric and high > low:
+        inside = (value - low) / (high - low)
+    return (position - 1 + inside) / (len(bounds) - 1)
+
+
+def _distinct_without_stats(table_name, column):
+    """
+    Возвращает оценку HyperLogLog, если она уже построена, иначе None.
+    """
+    sketches = load_sketches(table_name)
+    hll = sketches['hll'].get(column) if sketches else None
+    return hll.count() if hll is not None else None
+
+
+def selectivity(table_name, column, op, value, stats=None):
+    """
+    Оценивает долю записей таблицы, подходящих под условие.
+    """
+    stats = stats if stats is not None else get_catalog().stats(table_name)
+    rows = stats.get('rows') or 0
+    column_stats = stats.get('columns', {}).get(column)
+    if column == 'ID' and op == '=':
+        return 1 / max(rows, 1)
+    if op in TEXT_OPERATORS:
+        return _DEFAULT_SELECTIVITY['text']
+
+    if column_stats is None:
+        if op in ('is', 'is not'):
+            fraction = _DEFAULT_SELECTIVITY['null']
+            return fraction if op == 'is' else 1 - fraction
+        if op in ('=', '!='):
+            distinct = _distinct_without_stats(table_name, column)
+            equal = 1 / distinct if distinct else _DEFAULT_SELECTIVITY['=']
+            return equal if op == '=' else 1 - equal
+        return _DEFAULT_SELECTIVITY['range']
+
+    analyzed = max(stats.get('analyzed_rows') or rows, 1)
+    null_fraction = column_stats['nulls'] / analyzed
+    if op in ('is', 'is not'):
+        return null_fraction if op == 'is' else 1 - null_fraction
+
+    non_null = 1 - null_fraction
+    try:
+        if op in ('=', '!='):
+            common = column_stats.get('common', [])
+            frequent = [fraction for item, fraction in common if item == value]
+            if frequent:
+                equal = frequent[0]
+            else:
+                # Остальные значения считаются равновероятными
+                rest = non_null - sum(fraction for _, fraction in common)
+                equal = max(rest, 0) / max(column_stats['distinct'] - len(common), 1)
+            low, high = column_stats['min'], column_stats['max']
+            if low is not None and (value < low or value > high):
+                equal = min(equal, 1 / analyzed)
+            return equal if op == '=' else non_null - equal
+        below = _fraction_below(column_stats['histogram'], value)
+    except TypeError:
+        return _DEFAULT_SELECTIVITY['range']
+    if below is None:
+        return _DEFAULT_SELECTIVITY['range']
+    return non_null * (below if op in ('<', '<=') else 1 - below)
+
+
+def _table_rows(table_name, stats):
+    """
+    Возвращает количество записей таблицы из статистики (или считает его).
+    """
+    rows = stats.get('rows')
+    if rows is None:
+        rows = count_rows(table_name)
+        get_catalog().update_stats(table_name, rows=rows)
+    return rows
+
+
+def definitely_absent(table_name, condition):
+    """
+    Проверяет по фильтру Блума, что под условие равенства точно
+    не подходит ни одна запись (тогда данные можно не читать).
+    """
+    if not condition or condition[1] != '=' or condition[2] is None:
+        return False
+    return not might_contain(table_name, condition[0], condition[2])
+
+
+def _fetch_cost(table_name, rows, estimated):
+    """
+    Оценивает чтение записей с найденными по индексу ID. Записи читаются
+    сегментами сжатой таблицы или партициями по ID, а без них файл
+    таблицы разбирается целиком.
+    """
+    options = load_table_options(table_name)
+    partitions = max(len(options.get('partitions', [])), 1)
+    unit = max(rows, 1)
+    if supports_id_lookup(table_name):
+        unit = max(rows / partitions, 1)
+        if options.get('compression', 'none') != 'none':
+            unit = min(unit, SEGMENT_ROWS)
+    touched = min(max(estimated, 1), math.ceil(max(rows, 1) / unit))
+    return touched * unit * PLAN_FETCH_ROW_COST
+
+
+def _index_plan(table_name, condition, rows, estimated, stats):
+    """
+    Оценивает поиск по индексу: чтение ключей индекса и записей с найденными ID.
+    """
+    column, op, _ = condition
+    cost = PLAN_INDEX_COST + _fetch_cost(table_name, rows, estimated)
+    if op != '=':
+        column_stats = stats.get('columns', {}).get(column, {})
+        cost += column_stats.get('distinct', rows) * PLAN_INDEX_KEY_COST
+    return Plan('index', estimated, cost, f'индекс по {column}')
+
+
+def candidate_plans(table_name, codec, where_clause=None, cache_key=None):
+    """
+    Возвращает возможные планы запроса, начиная с самого дешевого.
+    """
+    if cache_key is not None:
+        cached = results.get(cache_key)
+        if cached is not None:
+            return [Plan('cache', len(cached), 0.0, 'кэш результатов')]
+    condition = codec.condition(where_clause) if where_clause else None
+    if definitely_absent(table_name, condition):
+        return [Plan('empty', 0, 0.0, 'фильтр Блума')]
+
+    stats = _refresh_stats(table_name)
+    rows = _table_rows(table_name, stats)
+    estimated = rows
+    if where_clause:
+        column, value, op = where_parts(where_clause)
+        if op not in ('is', 'is not'):
+            try:
+                value = codec.convert(column, value)
+            except (KeyError, TypeError, ValueError):
+                pass
+        estimated = rows * selectivity(table_name, column, op, value, stats)
+
+    kept, total = partition_counts(table_name, where_clause, codec)
+    detail = f'партиций {kept} из {total}' if total > 1 else 'вся таблица'
+    row_cost = PLAN_SCAN_ROW_COST
+    if where_clause and where_parts(where_clause)[2] in TEXT_OPERATORS:
+        row_cost += PLAN_TEXT_MATCH_COST
+    plans = [Plan('scan', estimated, rows * kept / max(total, 1) * row_cost, detail)]
+    if condition and has_index(table_name, condition[0]):
+        plans.append(_index_plan(table_name, condition, rows, estimated, stats))
+    if searchable(table_name, where_clause):
+        # Проверяются только записи, найденные по словам запроса
+        cost = PLAN_INDEX_COST + _fetch_cost(table_name, rows, estimated)
+        plans.append(Plan('fulltext', estimated, cost,
+                          f'полнотекстовый индекс по {where_clause[0]}'))
+    return sorted(plans, key=lambda plan: plan.cost)
+
+
+def choose_plan(table_name, codec, where_clause=None, cache_key=None):
+    """
+    Выбирает самый дешевый план запроса.
+    """
+    return candidate_plans(table_name, codec, where_clause, cache_key)[0]
+
+
+class ResultCache:
+    """
+    Кэш результатов select. Результат действителен, пока не изменились
+    данные таблицы (события изменений в этом процессе, версия схемы и
+    отметки файлов — для изменений из других процессов).
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_ENTRIES, max_rows=RESULT_CACHE_ROWS):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self.max_rows = max_rows
+
+    def _stamp(self, table_name):
+        """
+        Возвращает отметку состояния таблицы.
+        """
+        files = []
+        for filepath in table_files(table_name):
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                continue
+            files.append((os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size))
+        return get_catalog().table_version(table_name), tuple(files)
+
+    def get(self, key):
+        """
+        Возвращает сохраненные записи или None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != self._stamp(key[0]):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, rows):
+        """
+        Сохраняет результат запроса. Слишком большие результаты и результаты
+        по таблицам с TTL (записи в них истекают со временем) не сохраняются.
+        """
+        if not CACHE_ENABLED or len(rows) > self.max_rows \
+                or load_table_options(key[0]).get('ttl'):
+            return
+        self._entries[key] = (self._stamp(key[0]), rows)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, table_name):
+        """
+        Удаляет результаты запросов к таблице.
+        """
+        for key in [key for key in self._entries if key[0] == table_name]:
+            del self._entries[key]
+
+
+results = ResultCache()
+
+
+@subscribe
+def _invalidate_results(table_name, changes):
+    """
+    Сбрасывает кэш результатов таблицы при изменении ее данных.
+    """
+    results.invalidate(table_name)
@@ -0,0 +1,176 @@
+"""
+Репликация доставкой журнала изменений.
+
+Реплика (follower) — отдельная база, которая читает журнал изменений
+ведущей базы (leader) из ее каталога и применяет записи по порядку.
+Новая или сильно отставшая реплика сначала копирует файлы ведущей базы
+(через жесткие ссылки, если это возможно), а затем повторяет журнал
+с номера, прочитанного до копирования: применение записей идемпотентно,
+поэтому изменения, уже попавшие в скопированные файлы, безопасно
+применить еще раз. Реплика доступна только для чтения.
+"""
+
+import os
+import shutil
+import time
+
+from .catalog import get_catalog
+from .changelog import first_seq, get_changelog, last_seq, read_entries
+from .constants import (
+    CHANGELOG_DIR,
+    DATA_DIR,
+    META_FILE,
+    REPLICA_CATCHUP_ENTRIES,
+    REPLICA_POLL_INTERVAL,
+    REPLICA_STATE_FILE,
+    WAL_PREFIX,
+)
+from .core import apply_log_entries
+from .decorators import handle_db_errors
+from .storage import count_rows, link_or_copy
+from .utils import load_json_file, save_json_atomic
+
+_SKIPPED_DIRS = (os.path.dirname(WAL_PREFIX), CHANGELOG_DIR)
+
+
+def is_replica():
+    """
+    Проверяет, является ли текущая база репликой.
+    """
+    return os.path.exists(REPLICA_STATE_FILE)
+
+
+def load_state():
+    """
+    Возвращает состояние реплики (или пустой словарь).
+    """
+    return load_json_file(REPLICA_STATE_FILE, {})
+
+
+def save_state(state):
+    """
+    Атомарно сохраняет состояние реплики.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    save_json_atomic(REPLICA_STATE_FILE, state)
+
+
+def _wait_for_flush(leader_dir, timeout=30.0):
+    """
+    Ждет, пока ведущая база запишет на диск отложенные изменения
+    (журнал отложенной записи станет пустым).
+    """
+    wal_dir = os.path.join(leader_dir, os.path.dirname(WAL_PREFIX))
+    deadline = time.monotonic() + timeout
+    while os.path.isdir(wal_dir) and os.listdir(wal_dir):
+        if time.monotonic() > deadline:
+            raise ValueError("Ведущая база не сбросила отложенные изменения на диск")
+        time.sleep(0.1)
+
+
+def catch_up(leader_dir):
+    """
+    Заменяет данные реплики копией файлов ведущей базы.
+    Возвращает seq журнала, с которого нужно продолжить применение.
+    """
+    if not is_replica() and get_catalog():
+        raise ValueError("Текущая база не пуста и не является репликой")
+
+    from_seq = last_seq(leader_dir)
+    _wait_for_flush(leader_dir)
+
+    get_changelog().close()
+    if os.path.isdir(DATA_DIR):
+        shutil.rmtree(DATA_DIR)
+    source_data = os.path.join(leader_dir, DATA_DIR)
+    for root, dirs, files in os.walk(source_data):
+        relative = os.path.relpath(root, leader_dir)
+        dirs[:] = [name for name in dirs
+                   if os.path.join(relative, name) not in _SKIPPED_DIRS]
+        for name in files:
+            target = os.path.join(relative, name)
+            if name.endswith('.tmp') or target == REPLICA_STATE_FILE:
+                continue
+            link_or_copy(os.path.join(root, name), target)
+    leader_meta = os.path.join(leader_dir, META_FILE)
+    if os.path.exists(leader_meta):
+        shutil.copy2(leader_meta, META_FILE)
+
+    catalog = get_catalog()
+    catalog.load()
+    for table_name in catalog:
+        catalog.update_stats(table_name, rows=count_rows(table_name))
+    return from_seq + 1
+
+
+def sync_once(leader_dir, state=None):
+    """
+    Применяет новые записи журнала ведущей базы.
+    Если реплика еще не инициализирована или отстала больше, чем хранит
+    журнал, сначала выполняется копирование файлов.
+    Возвращает обновленное состояние реплики.
+    """
+    state = dict(state if state is not None else load_state())
+    leader_dir = os.path.abspath(leader_dir)
+    if not os.path.isdir(os.path.join(leader_dir, DATA_DIR)):
+        raise ValueError(f'Каталог "{leader_dir}" не содержит базу данных')
+
+    leader_seq = last_seq(leader_dir)
+    oldest = first_seq(leader_dir)
+    next_seq = state.get('seq', 0) + 1
+    if (not state.get('initialized') or state.get('leader') != leader_dir
+            or next_seq - 1 > leader_seq
+            or (oldest is not None and next_seq < oldest)
+            or leader_seq - next_seq >= REPLICA_CATCHUP_ENTRIES):
+        next_seq = catch_up(leader_dir)
+        state = {'leader': leader_dir, 'seq': next_seq - 1, 'initialized': True}
+        save_state(state)
+
+    lag_seconds = 0.0
+    for applied, entry in _applied(leader_dir, next_seq):
+        state['seq'] = applied
+        lag_seconds = max(0.0, time.time() - entry['ts'])
+
+    state.update({
+        'leader_seq': leader_seq,
+        'lag_entries': max(0, leader_seq - state['seq']),
+        'lag_seconds': round(lag_seconds, 3),
+        'applied_at': time.time(),
+    })
+    save_state(state)
+    return state
+
+
+def _applied(leader_dir, from_seq, batch_size=1000):
+    """
+    Применяет записи журнала пакетами и выдает (seq, последняя запись пакета).
+    """
+    metadata = get_catalog()
+    batch = []
+    for entry in read_entries(from_seq, leader_dir):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield apply_log_entries(metadata, batch), batch[-1]
+            batch = []
+    if batch:
+        yield apply_log_entries(metadata, batch), batch[-1]
+
+
+@handle_db_errors
+def follow(leader_dir, interval=REPLICA_POLL_INTERVAL):
+    """
+    Непрерывно применяет журнал ведущей базы до прерывания (Ctrl+C).
+    """
+    print(f"🔁 Реплика базы {os.path.abspath(leader_dir)} (только чтение)")
+    reported = None
+    try:
+        while True:
+            state = sync_once(leader_dir)
+            position = (state['seq'], state['lag_entries'])
+            if position != reported:
+                print(f"📥 Применено до seq {state['seq']}, отставание: "
+                      f"{state['lag_entries']} зап., {state['lag_seconds']} с")
+                reported = position
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n👋 Репликация остановлена.")
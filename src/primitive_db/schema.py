@@ -0,0 +1,87 @@
+"""
+Изменение схемы таблиц без перезаписи данных.
+
+ALTER TABLE меняет только каталог: схема получает новую версию, а
+изменение записывается в историю. Файлы данных помнят версию схемы,
+с которой были записаны; при чтении к их записям применяются изменения
+из истории, сделанные позже, а при следующей записи файл сохраняется
+уже в новом виде.
+"""
+
+from .codec import converter_for, is_nullable, is_valid_type, strip_quotes
+from .constants import NULL_LITERAL
+
+
+def apply_change(schema, change):
+    """
+    Возвращает новую схему таблицы после изменения change.
+    """
+    op = change['op']
+    column = change['column']
+    schema = dict(schema)
+
+    if column == 'ID':
+        raise ValueError("Столбец ID нельзя изменять")
+
+    if op == 'add':
+        if column in schema:
+            raise ValueError(f'Столбец "{column}" уже существует')
+        if not is_valid_type(change['type']):
+            raise ValueError(f'Неподдерживаемый тип данных "{change["type"]}"')
+        schema[column] = change['type']
+    elif op == 'drop':
+        if column not in schema:
+            raise ValueError(f'Столбец "{column}" не существует')
+        del schema[column]
+    elif op == 'rename':
+        new_name = change['new_name']
+        if column not in schema:
+            raise ValueError(f'Столбец "{column}" не существует')
+        if new_name in schema:
+            raise ValueError(f'Столбец "{new_name}" уже существует')
+        schema = {new_name if name == column else name: typ
+                  for name, typ in schema.items()}
+    else:
+        raise ValueError(f'Неизвестное изменение схемы "{op}"')
+    return schema
+
+
+def convert_default(col_type, value):
+    """
+    Приводит значение по умолчанию из команды к типу столбца.
+    Без значения по умолчанию (или с null) можно добавить только
+    столбец, допускающий NULL: иначе существующие записи остались бы
+    без значения в обязательном столбце.
+    """
+    if value is None or value.lower() == NULL_LITERAL:
+        if not is_nullable(col_type):
+            raise ValueError(
+                f'Столбец типа "{col_type}" не допускает NULL: '
+                'укажите значение по умолчанию')
+        return None
+    return converter_for(col_type)(strip_quotes(value))
+
+
+def upgrade_record(record, changes):
+    """
+    Применяет к записи изменения схемы по порядку.
+    """
+    for change in changes:
+        column = change['column']
+        if change['op'] == 'add':
+            if column not in record and change.get('default') is not None:
+                record[column] = change['default']
+        elif change['op'] == 'drop':
+            record.pop(column, None)
+        elif change['op'] == 'rename' and column in record:
+            record[change['new_name']] = record.pop(column)
+    return record
+
+
+def upgrade_rows(rows, changes):
+    """
+    Приводит записи, сохраненные со старой версией схемы, к текущей.
+    """
+    if not changes:
+        return rows
+    return [upgrade_record(record, changes) for record in rows]
@@ -0,0 +1,427 @@
+"""
+Вероятностные структуры данных по столбцам таблиц.
+
+Фильтр Блума по выбранному столбцу отвечает, что значения в таблице
+точно нет, без чтения данных (ответ «возможно есть» бывает ложным
+с заданной вероятностью). HyperLogLog по каждому столбцу оценивает
+количество различных значений для планирования запросов и быстрого
+count(distinct ...).
+
+Обе структуры хранятся в data/<таблица>.sketch.json и обновляются по
+событиям изменения данных. Удаленные значения из них не убираются:
+фильтр дает больше ложных «возможно есть», а оценка HyperLogLog
+завышается. Поэтому в файле считаются удаленные и измененные записи,
+и когда их становится больше доли SKETCH_REBUILD_FRACTION записей
+таблицы (в том числе когда таблица опустела), а также при переполнении
+фильтра и после изменения схемы структуры перестраиваются по данным.
+
+Изменения структур копятся в памяти и записываются в файл пакетами
+(SKETCH_SAVE_CHANGES измененных записей, а также при flush, snapshot и
+выходе). Пока в памяти есть несохраненные изменения, рядом с файлом
+лежит метка data/<таблица>.sketch.dirty: если процесс завершится, не
+записав их, устаревший файл по метке не будет использован, и структуры
+перестроятся по данным.
+"""
+
+import base64
+import hashlib
+import math
+import os
+
+from .catalog import get_catalog, load_table_options, save_table_options
+from .constants import (
+    BLOOM_ERROR_RATE,
+    BLOOM_MIN_CAPACITY,
+    DATA_DIR,
+    HLL_PRECISION,
+    SKETCH_REBUILD_FRACTION,
+    SKETCH_SAVE_CHANGES,
+)
+from .events import subscribe
+from .indexes import index_key
+from .storage import scan
+from .utils import ensure_data_dir, load_json_file, save_json_atomic
+
+
+def hash64(key):
+    """
+    Возвращает 64-битный хэш строки.
+    """
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def _encode(data):
+    return base64.b64encode(bytes(data)).decode('ascii')
+
+
+def _decode(text):
+    return bytearray(base64.b64decode(text))
+
+
+class BloomFilter:
+    """
+    Фильтр Блума на capacity значений с долей ложных срабатываний error_rate.
+    """
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate)
+                                     / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        """
+        Возвращает номера битов значения (двойное хэширование).
+        """
+        value = hash64(key)
+        low, high = value & 0xFFFFFFFF, value >> 32
+        return ((low + i * high) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        """
+        Добавляет значение в фильтр.
+        """
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'error_rate': self.error_rate,
+                'count': self.count, 'bits': _encode(self.bits)}
+
+    @classmethod
+    def from_dict(cls, data):
+        bloom = cls(data['capacity'], data['error_rate'])
+        bloom.bits = _decode(data['bits'])
+        bloom.count = data['count']
+        return bloom
+
+
+class HyperLogLog:
+    """
+    Оценка количества различных значений (2 ** precision регистров).
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key):
+        """
+        Добавляет значение.
+        """
+        value = hash64(key)
+        rest_bits = 64 - self.precision
+        register = value >> rest_bits
+        rest = value & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def count(self):
+        """
+        Возвращает оценку количества различных значений.
+        """
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': _encode(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        hll = cls(data['precision'])
+        hll.registers = _decode(data['registers'])
+        return hll
+
+
+def sketch_path(table_name):
+    """
+    Возвращает путь к файлу структур таблицы.
+    """
+    return f"{DATA_DIR}/{table_name}.sketch.json"
+
+
+def _dirty_path(filepath):
+    """
+    Возвращает путь к метке несохраненных изменений файла структур.
+    """
+    return filepath[:-len('.json')] + '.dirty'
+
+
+def bloom_columns(table_name):
+    """
+    Возвращает столбцы таблицы, по которым построены фильтры Блума.
+    """
+    return load_table_options(table_name).get('bloom', [])
+
+
+def has_bloom(table_name, column):
+    """
+    Проверяет, есть ли фильтр Блума по столбцу.
+    """
+    return column in bloom_columns(table_name)
+
+
+def _stamp(filepath):
+    """
+    Возвращает отметку файла для проверки кэша (None, если файла нет).
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size
+
+
+# Структуры в памяти: {таблица: (отметка файла, структуры)}
+_cache = {}
+# Несохраненные структуры: {путь к файлу: (таблица, число изменений)}
+_unsaved = {}
+
+
+def load_sketches(table_name):
+    """
+    Возвращает структуры таблицы {'bloom': {...}, 'hll': {...},
+    'rows': записей, 'stale': удаленных и измененных после построения
+    записей} или None, если они еще не построены или файл устарел.
+    Разобранный файл кэшируется до его изменения.
+    """
+    filepath = sketch_path(table_name)
+    stamp = _stamp(filepath)
+    if stamp is None:
+        return None
+    cached = _cache.get(table_name)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    _unsaved.pop(stamp[0], None)
+    if os.path.exists(_dirty_path(filepath)):
+        return None
+
+    data = load_json_file(filepath, {})
+    sketches = {
+        'bloom': {column: BloomFilter.from_dict(item)
+                  for column, item in data.get('bloom', {}).items()},
+        'hll': {column: HyperLogLog.from_dict(item)
+                for column, item in data.get('hll', {}).items()},
+        'rows': data.get('rows'),
+        'stale': data.get('stale', 0),
+    }
+    _cache[table_name] = (stamp, sketches)
+    return sketches
+
+
+def _save_sketches(table_name, sketches):
+    """
+    Атомарно записывает структуры таблицы.
+    """
+    ensure_data_dir()
+    filepath = sketch_path(table_name)
+    save_json_atomic(filepath, {
+        **{kind: {column: item.to_dict() for column, item in sketches[kind].items()}
+           for kind in ('bloom', 'hll')},
+        'rows': sketches['rows'],
+        'stale': sketches['stale'],
+    })
+    if os.path.exists(_dirty_path(filepath)):
+        os.remove(_dirty_path(filepath))
+    _unsaved.pop(os.path.abspath(filepath), None)
+    _cache[table_name] = (_stamp(filepath), sketches)
+
+
+def _defer_save(table_name, sketches, changed):
+    """
+    Оставляет измененные структуры в памяти и записывает их, когда
+    изменений накопилось SKETCH_SAVE_CHANGES.
+    """
+    filepath = sketch_path(table_name)
+    key = os.path.abspath(filepath)
+    if key not in _unsaved:
+        with open(_dirty_path(filepath), 'w', encoding='utf-8'):
+            pass
+    changed += _unsaved.get(key, (table_name, 0))[1]
+    if changed >= SKETCH_SAVE_CHANGES:
+        _save_sketches(table_name, sketches)
+    else:
+        _unsaved[key] = (table_name, changed)
+
+
+def flush_sketches():
+    """
+    Записывает все несохраненные изменения структур.
+    Возвращает количество записанных файлов.
+    """
+    count = 0
+    for key, (table_name, _) in list(_unsaved.items()):
+        cached = _cache.get(table_name)
+        # Файл, который с тех пор изменили или удалили, не перезаписывается
+        if cached and cached[0] == _stamp(sketch_path(table_name)) and \
+                cached[0][0] == key:
+            _save_sketches(table_name, cached[1])
+            count += 1
+        _unsaved.pop(key, None)
+    return count
+
+
+def _add_record(sketches, record):
+    """
+    Добавляет значения записи в структуры.
+    """
+    for column, hll in sketches['hll'].items():
+        value = record.get(column)
+        if value is not None:
+            hll.add(index_key(value))
+    for column, bloom in sketches['bloom'].items():
+        value = record.get(column)
+        if value is not None:
+            bloom.add(index_key(value))
+
+
+def _removes_values(sketches, change):
+    """
+    Проверяет, убирает ли изменение значения, уже добавленные в структуры.
+    """
+    if change.before is None:
+        return False
+    if change.after is None:
+        return True
+    columns = set(sketches['hll']) | set(sketches['bloom'])
+    return any(change.before.get(column) != change.after.get(column)
+               for column in columns)
+
+
+def rebuild_sketches(table_name):
+    """
+    Строит структуры таблицы заново по ее данным.
+    Возвращает построенные структуры.
+    """
+    catalog = get_catalog()
+    columns = [column for column in catalog.get(table_name, {}) if column != 'ID']
+    capacity = max(BLOOM_MIN_CAPACITY,
+                   2 * catalog.stats(table_name).get('rows', 0))
+    sketches = {
+        'bloom': {column: BloomFilter(capacity)
+                  for column in bloom_columns(table_name)},
+        'hll': {column: HyperLogLog() for column in columns},
+        'rows': 0,
+        'stale': 0,
+    }
+    for record in scan(table_name):
+        _add_record(sketches, record)
+        sketches['rows'] += 1
+    _save_sketches(table_name, sketches)
+    return sketches
+
+
+def invalidate_sketches(table_name):
+    """
+    Удаляет структуры таблицы; они будут перестроены при следующем обращении.
+    """
+    _cache.pop(table_name, None)
+    filepath = sketch_path(table_name)
+    _unsaved.pop(os.path.abspath(filepath), None)
+    for path in (filepath, _dirty_path(filepath)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def create_bloom(table_name, column):
+    """
+    Строит фильтр Блума по столбцу и регистрирует его.
+    """
+    options = load_table_options(table_name)
+    columns = options.setdefault('bloom', [])
+    if column not in columns:
+        columns.append(column)
+        save_table_options(table_name, options)
+    return rebuild_sketches(table_name)['bloom'][column]
+
+
+def drop_bloom(table_name, column):
+    """
+    Удаляет фильтр Блума по столбцу.
+    """
+    options = load_table_options(table_name)
+    if column in options.get('bloom', []):
+        options['bloom'].remove(column)
+        save_table_options(table_name, options)
+    sketches = load_sketches(table_name)
+    if sketches and sketches['bloom'].pop(column, None) is not None:
+        _save_sketches(table_name, sketches)
+
+
+def rename_bloom(table_name, column, new_name):
+    """
+    Переносит фильтр Блума вслед за переименованным столбцом
+    (сам фильтр перестраивается вместе с остальными структурами).
+    """
+    options = load_table_options(table_name)
+    if column in options.get('bloom', []):
+        options['bloom'] = [new_name if name == column else name
+                            for name in options['bloom']]
+        save_table_options(table_name, options)
+
+
+def might_contain(table_name, column, value):
+    """
+    Возвращает False, только если значения столбца в таблице точно нет.
+    """
+    if not has_bloom(table_name, column):
+        return True
+    sketches = load_sketches(table_name)
+    if sketches is None or column not in sketches['bloom']:
+        return True
+    return index_key(value) in sketches['bloom'][column]
+
+
+def distinct_estimate(table_name, column):
+    """
+    Возвращает оценку количества различных значений столбца
+    (структуры строятся по данным, если их еще нет).
+    """
+    sketches = load_sketches(table_name)
+    if sketches is None or column not in sketches['hll']:
+        sketches = rebuild_sketches(table_name)
+    hll = sketches['hll'].get(column)
+    return hll.count() if hll is not None else None
+
+
+@subscribe
+def _maintain_sketches(table_name, changes):
+    """
+    Добавляет новые значения в структуры таблицы и считает убранные.
+    Если структур еще нет, фильтр Блума переполнен или убранных значений
+    больше доли записей, структуры строятся заново по данным; иначе
+    изменения записываются в файл пакетами.
+    """
+    sketches = load_sketches(table_name)
+    if sketches is None:
+        rebuild_sketches(table_name)
+        return
+    for change in changes:
+        if change.after is not None:
+            _add_record(sketches, change.after)
+        if _removes_values(sketches, change):
+            sketches['stale'] += 1
+        if sketches['rows'] is not None:
+            sketches['rows'] += (change.after is not None) - (change.before is not None)
+    # Файл без числа записей (записанный до его появления) не перестраивается
+    rows = sketches['rows']
+    if rows is not None and sketches['stale'] > SKETCH_REBUILD_FRACTION * rows or \
+            any(bloom.count > bloom.capacity for bloom in sketches['bloom'].values()):
+        rebuild_sketches(table_name)
+    else:
+        _defer_save(table_name, sketches, len(changes))
@@ -0,0 +1,238 @@
+"""
+Операции над результатами запросов с ограничением памяти.
+
+Сортировка, хэш-агрегация и хэш-соединение держат в памяти не больше
+лимита на запрос (приблизительно, по размеру объектов Python). Если
+данных больше, промежуточные результаты сбрасываются во временные файлы
+JSON Lines: сортировка пишет отсортированные серии и сливает их,
+агрегация и соединение раскладывают данные по хэш-разделам и
+обрабатывают разделы по одному.
+"""
+
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+
+from .constants import (
+    QUERY_MEMORY_LIMIT,
+    SPILL_DIR,
+    SPILL_MAX_DEPTH,
+    SPILL_MERGE_FANIN,
+    SPILL_PARTITIONS,
+)
+
+_memory_limit = QUERY_MEMORY_LIMIT
+
+
+def get_memory_limit():
+    """
+    Возвращает лимит памяти на запрос в байтах.
+    """
+    return _memory_limit
+
+
+def set_memory_limit(limit):
+    """
+    Устанавливает лимит памяти на запрос в байтах.
+    """
+    global _memory_limit
+    if limit <= 0:
+        raise ValueError("Лимит памяти должен быть положительным")
+    _memory_limit = limit
+
+
+def record_size(record):
+    """
+    Приблизительно оценивает память, занятую записью (словарем или кортежем).
+    """
+    values = record.values() if isinstance(record, dict) else record
+    return sys.getsizeof(record) + sum(sys.getsizeof(value) for value in values)
+
+
+def sort_key(column):
+    """
+    Возвращает ключ сортировки записей по столбцу (NULL — после значений).
+    """
+    def key(record):
+        value = record.get(column)
+        return (value is None, value if value is not None else 0)
+    return key
+
+
+def partition_of(value, level=0, partitions=SPILL_PARTITIONS):
+    """
+    Возвращает номер хэш-раздела значения (на каждом уровне — свой хэш).
+    """
+    return zlib.crc32(f"{level}:{value}".encode('utf-8')) % partitions
+
+
+class SpillFiles:
+    """
+    Временный каталог для сброса данных запроса; удаляется при закрытии.
+    Ведет счетчик созданных файлов.
+    """
+
+    def __init__(self):
+        self._dir = None
+        self.files = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def new_path(self):
+        """
+        Возвращает путь к новому временному файлу.
+        """
+        if self._dir is None:
+            if SPILL_DIR:
+                os.makedirs(SPILL_DIR, exist_ok=True)
+            self._dir = tempfile.mkdtemp(prefix='spill-', dir=SPILL_DIR)
+        self.files += 1
+        return os.path.join(self._dir, f"{self.files:06d}.jsonl")
+
+    def write(self, items):
+        """
+        Записывает элементы в новый файл и возвращает путь к нему.
+        """
+        path = self.new_path()
+        with open(path, 'w', encoding='utf-8') as file:
+            for item in items:
+                file.write(json.dumps(item, ensure_ascii=False) + '\n')
+        return path
+
+    def close(self):
+        """
+        Удаляет временные файлы.
+        """
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+
+def read_spilled(path, as_tuple=False):
+    """
+    Потоково читает элементы временного файла.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            item = json.loads(line)
+            yield tuple(item) if as_tuple else item
+
+
+class PartitionWriter:
+    """
+    Раскладывает элементы по файлам хэш-разделов.
+    """
+
+    def __init__(self, spill, level):
+        self._files = {}
+        self._spill = spill
+        self._level = level
+        self.paths = {}
+
+    def add(self, value, item):
+        """
+        Дописывает элемент в раздел значения value.
+        """
+        number = partition_of(value, self._level)
+        file = self._files.get(number)
+        if file is None:
+            self.paths[number] = self._spill.new_path()
+            file = open(self.paths[number], 'w', encoding='utf-8')
+            self._files[number] = file
+        file.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+    def close(self):
+        """
+        Закрывает файлы разделов.
+        """
+        for file in self._files.values():
+            file.close()
+        self._files = {}
+
+
+def _merge(paths, key, reverse):
+    """
+    Сливает отсортированные серии в один поток.
+    """
+    return heapq.merge(*(read_spilled(path) for path in paths),
+                       key=key, reverse=reverse)
+
+
+def external_sort(rows, key, reverse=False, memory_limit=None, stats=None):
+    """
+    Потоково сортирует записи, сбрасывая отсортированные серии на диск
+    при превышении лимита памяти и сливая их. Выдает записи по порядку.
+    В stats (если передан) записывается количество сброшенных файлов.
+    """
+    limit = memory_limit or _memory_limit
+    with SpillFiles() as spill:
+        runs = []
+        buffer = []
+        used = 0
+        for record in rows:
+            buffer.append(record)
+            used += record_size(record)
+            if used >= limit:
+                buffer.sort(key=key, reverse=reverse)
+                runs.append(spill.write(buffer))
+                buffer = []
+                used = 0
+
+        buffer.sort(key=key, reverse=reverse)
+        if runs and buffer:
+            runs.append(spill.write(buffer))
+        while len(runs) > SPILL_MERGE_FANIN:
+            merged = spill.write(_merge(runs[:SPILL_MERGE_FANIN], key, reverse))
+            runs = runs[SPILL_MERGE_FANIN:] + [merged]
+        if stats is not None:
+            stats['spilled'] = stats.get('spilled', 0) + spill.files
+
+        if runs:
+            yield from _merge(runs, key, reverse)
+        else:
+            yield from buffer
+
+
+def hash_count(values, memory_limit=None, stats=None, level=0):
+    """
+    Считает количество каждого значения (GROUP BY с COUNT(*)).
+    Если группы не помещаются в лимит памяти, частичные счетчики
+    сбрасываются по хэш-разделам и досчитываются по одному разделу.
+    Выдает пары (значение, количество) в произвольном порядке.
+    """
+    limit = memory_limit or _memory_limit
+    with SpillFiles() as spill:
+        writer = None
+        counts = {}
+        used = 0
+        for value, count in values:
+            if value not in counts:
+                used += record_size((value, count))
+                counts[value] = 0
+            counts[value] += count
+            if used >= limit and level < SPILL_MAX_DEPTH:
+                writer = writer or PartitionWriter(spill, level)
+                for item in counts.items():
+                    writer.add(item[0], item)
+                counts = {}
+                used = 0
+
+        if writer is None:
+            yield from counts.items()
+            return
+        for item in counts.items():
+            writer.add(item[0], item)
+        writer.close()
+        if stats is not None:
+            stats['spilled'] = stats.get('spilled', 0) + spill.files
+        for path in writer.paths.values():
+            yield from hash_count(read_spilled(path, as_tuple=True), memory_limit,
+                                  stats, level + 1)
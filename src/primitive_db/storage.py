@@ -0,0 +1,715 @@
+"""
+Слой хранения таблиц.
+Скрывает от бизнес-логики то, как таблица разложена по файлам:
+обычная таблица хранится в одном файле, партиционированная — в файле
+на каждую партицию. Файлы хранятся в JSON либо, если для таблицы включено
+сжатие, в посегментном формате из модуля compression.
+В режиме отложенной записи чтение и запись файлов идут через буфер
+из модуля writeback. Асинхронные варианты чтения и записи выполняют
+блокирующие операции в пуле потоков модуля aio.
+Файлы таблиц никогда не переписываются на месте, а заменяются целиком,
+поэтому снимок базы может разделять их с рабочей копией через жесткие ссылки.
+"""
+
+import os
+import shutil
+import threading
+from contextlib import ExitStack, contextmanager
+
+from . import writeback
+from .aio import iter_json_array_async, prefetch, run_blocking
+from .catalog import get_catalog, load_table_options, save_table_options
+from .compression import (
+    iter_segments,
+    read_header,
+    read_segments,
+    sample_segments,
+    segment_stats,
+    write_segments,
+)
+from .constants import (
+    COMPRESSION_SAMPLE_SEGMENTS,
+    DATA_DIR,
+    META_FILE,
+    WAL_PREFIX,
+)
+from .partition import partition_key, prune_partitions
+from .schema import upgrade_record, upgrade_rows
+from .ttl import expired_predicate
+from .utils import (
+    ensure_data_dir,
+    iter_json_array,
+    load_json_file,
+    save_json_file,
+)
+
+
+class _FileLocks:
+    """
+    Блокировки записи файлов таблиц: у каждого файла своя блокировка,
+    поэтому запись разных таблиц (и партиций) не ждет друг друга.
+    Снимок базы приостанавливает запись всех файлов на время работы.
+    """
+
+    def __init__(self):
+        self._guard = threading.Condition()
+        self._locks = {}
+        self._writers = 0
+        self._frozen_by = None
+        self._freezes = 0
+
+    def _blocked(self, me):
+        return self._frozen_by is not None and self._frozen_by != me
+
+    @contextmanager
+    def hold(self, filepath):
+        """
+        Удерживает блокировку записи одного файла.
+        """
+        me = threading.get_ident()
+        with self._guard:
+            self._guard.wait_for(lambda: not self._blocked(me))
+            lock = self._locks.setdefault(os.path.abspath(filepath),
+                                          threading.RLock())
+            self._writers += 1
+        try:
+            with lock:
+                yield
+        finally:
+            with self._guard:
+                self._writers -= 1
+                self._guard.notify_all()
+
+    @contextmanager
+    def frozen(self):
+        """
+        Приостанавливает запись всех файлов, дождавшись начатых записей.
+        Поток, удерживающий блокировку, может сам записывать файлы.
+        """
+        me = threading.get_ident()
+        with self._guard:
+            self._guard.wait_for(lambda: not self._blocked(me) and
+                                 (self._frozen_by == me or not self._writers))
+            self._frozen_by = me
+            self._freezes += 1
+        try:
+            yield
+        finally:
+            with self._guard:
+                self._freezes -= 1
+                if not self._freezes:
+                    self._frozen_by = None
+                self._guard.notify_all()
+
+
+_file_locks = _FileLocks()
+
+
+def _compression(options):
+    """
+    Возвращает кодек сжатия таблицы или None для обычного JSON.
+    """
+    codec = options.get('compression', 'none')
+    return None if codec == 'none' else codec
+
+
+def partition_path(table_name, key, options=None):
+    """
+    Возвращает путь к файлу партиции (key=None — вся таблица).
+    """
+    base = f"{DATA_DIR}/{table_name}" if key is None \
+        else f"{DATA_DIR}/{table_name}.p{key}"
+    return base + ('.seg' if _compression(options or {}) else '.json')
+
+
+def table_files(table_name, options=None):
+    """
+    Возвращает пути ко всем файлам данных таблицы.
+    """
+    if options is None:
+        options = load_table_options(table_name)
+    if options.get('partition'):
+        return [partition_path(table_name, key, options)
+                for key in options.get('partitions', [])]
+    return [partition_path(table_name, None, options)]
+
+
+def _read_file(filepath, codec, record_ids=None):
+    """
+    Читает файл таблицы в формате JSON (codec=None) или сжатом формате.
+    record_ids позволяет прочитать из сжатого файла только нужные сегменты.
+    """
+    if codec:
+        try:
+            return read_segments(filepath, record_ids)
+        except FileNotFoundError:
+            return []
+    return load_json_file(filepath, [])
+
+
+def _write_file(filepath, rows, codec):
+    """
+    Записывает файл таблицы в формате JSON (codec=None) или сжатом формате.
+    """
+    ensure_data_dir()
+    with _file_locks.hold(filepath):
+        if codec:
+            write_segments(filepath, rows, codec)
+        else:
+            save_json_file(filepath, rows)
+
+
+def _remove_file(filepath):
+    """
+    Удаляет файл таблицы с диска и из буфера отложенной записи.
+    """
+    buffer = writeback.current()
+    if buffer is not None:
+        buffer.discard(filepath)
+    with _file_locks.hold(filepath):
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def _load_partition(table_name, key, options, record_ids=None):
+    """
+    Загружает одну партицию (key=None — непартиционированная таблица).
+    Записи, сохраненные со старой версией схемы, приводятся к текущей.
+    """
+    filepath = partition_path(table_name, key, options)
+    codec = _compression(options)
+    buffer = writeback.current()
+    if buffer is not None:
+        rows = buffer.load(filepath, codec)
+    else:
+        rows = _read_file(filepath, codec, record_ids)
+    return upgrade_rows(rows, get_catalog().pending_changes(table_name, filepath))
+
+
+def _iter_partition(table_name, key, options, record_ids=None, condition=None):
+    """
+    Потоково читает одну партицию: JSON файл по одной записи, сжатый —
+    по одному сегменту, поэтому в памяти не держится весь файл.
+    condition позволяет пропустить сегменты, не подходящие под условие.
+    """
+    if writeback.current() is not None:
+        yield from _load_partition(table_name, key, options, record_ids)
+        return
+
+    filepath = partition_path(table_name, key, options)
+    changes = get_catalog().pending_changes(table_name, filepath)
+    if _compression(options):
+        if not os.path.exists(filepath):
+            return
+        # Диапазоны сегментов записаны в старой схеме: после ее изменения
+        # отсекать сегменты по столбцу нельзя
+        for rows in iter_segments(filepath, record_ids,
+                                  None if changes else condition):
+            yield from upgrade_rows(rows, changes)
+    else:
+        for record in iter_json_array(filepath):
+            yield upgrade_record(record, changes) if changes else record
+
+
+def _save_partition(table_name, key, rows, options):
+    """
+    Сохраняет одну партицию (key=None — непартиционированная таблица).
+    """
+    filepath = partition_path(table_name, key, options)
+    codec = _compression(options)
+    buffer = writeback.current()
+    if buffer is not None:
+        buffer.save(filepath, codec, rows)
+    else:
+        _write_file(filepath, rows, codec)
+    get_catalog().mark_file_version(table_name, filepath)
+
+
+def _condition(where_clause, codec):
+    """
+    Возвращает типизированное условие (столбец, оператор, значение)
+    для отсечения сегментов или None.
+    """
+    if codec is None or not where_clause:
+        return None
+    return codec.condition(where_clause)
+
+
+def load_partitions(table_name, where_clause=None, codec=None):
+    """
+    Загружает партиции, которые могут содержать записи под условие.
+    Возвращает словарь {номер партиции: список записей}.
+    Партиции всегда читаются целиком, поэтому их можно изменить и сохранить.
+    """
+    options = load_table_options(table_name)
+    keys = _pruned_keys(options, where_clause, codec)
+    return {key: _load_partition(table_name, key, options) for key in keys}
+
+
+def _pruned_keys(options, where_clause, codec):
+    """
+    Возвращает номера партиций, которые нужно прочитать для условия.
+    """
+    spec = options.get('partition')
+    if not spec:
+        return [None]
+    existing = options.get('partitions', [])
+    keys = prune_partitions(spec, where_clause, codec, existing) if codec else None
+    if keys is None:
+        return list(existing)
+    return [key for key in keys if key in existing]
+
+
+def partition_counts(table_name, where_clause=None, codec=None):
+    """
+    Возвращает (сколько партиций нужно прочитать для условия, сколько их всего).
+    """
+    options = load_table_options(table_name)
+    if not options.get('partition'):
+        return 1, 1
+    total = len(options.get('partitions', []))
+    return len(_pruned_keys(options, where_clause, codec)), total
+
+
+def scan(table_name, where_clause=None, codec=None, include_expired=False):
+    """
+    Потоково выдает записи таблицы, читая по одной партиции (или набору
+    сегментов) за раз и отсекая те, что не подходят под условие.
+    Истекшие записи таблицы с TTL пропускаются (кроме include_expired).
+    Записи предназначены только для чтения; фильтрация по условию остается
+    за вызывающим кодом.
+    """
+    options = load_table_options(table_name)
+    condition = _condition(where_clause, codec)
+    record_ids = None
+    if condition and condition[0] == 'ID' and condition[1] == '=':
+        record_ids = [condition[2]]
+    expired = expired_predicate(None if include_expired else options.get('ttl'))
+    for key in _pruned_keys(options, where_clause, codec):
+        for record in _iter_partition(table_name, key, options, record_ids,
+                                      condition):
+            if not expired(record):
+                yield record
+
+
+def load_rows(table_name, where_clause=None, codec=None):
+    """
+    Загружает записи таблицы с отсечением лишних партиций и сегментов.
+    Результат предназначен только для чтения.
+    """
+    return list(scan(table_name, where_clause, codec))
+
+
+async def _iter_partition_async(table_name, key, options, record_ids=None,
+                                condition=None):
+    """
+    Асинхронный вариант _iter_partition: файл читается и разбирается
+    в пуле потоков, следующий кусок или сегмент — пока обрабатывается текущий.
+    """
+    if writeback.current() is not None:
+        rows = await run_blocking(_load_partition, table_name, key, options,
+                                  record_ids)
+        for record in rows:
+            yield record
+        return
+
+    filepath = partition_path(table_name, key, options)
+    changes = get_catalog().pending_changes(table_name, filepath)
+    if _compression(options):
+        if not await run_blocking(os.path.exists, filepath):
+            return
+        segments = (upgrade_rows(rows, changes) for rows in
+                    iter_segments(filepath, record_ids, None if changes else condition))
+        async for rows in prefetch(segments):
+            for record in rows:
+                yield record
+    else:
+        async for record in iter_json_array_async(filepath):
+            yield upgrade_record(record, changes) if changes else record
+
+
+async def scan_async(table_name, where_clause=None, codec=None):
+    """
+    Асинхронный вариант scan: не блокирует цикл событий, поэтому запросы
+    к разным таблицам читают файлы одновременно.
+    """
+    options = load_table_options(table_name)
+    condition = _condition(where_clause, codec)
+    record_ids = None
+    if condition and condition[0] == 'ID' and condition[1] == '=':
+        record_ids = [condition[2]]
+    expired = expired_predicate(options.get('ttl'))
+    for key in _pruned_keys(options, where_clause, codec):
+        async for record in _iter_partition_async(table_name, key, options,
+                                                  record_ids, condition):
+            if not expired(record):
+                yield record
+
+
+async def load_rows_async(table_name, where_clause=None, codec=None):
+    """
+    Асинхронный вариант load_rows.
+    """
+    return [record async for record in scan_async(table_name, where_clause, codec)]
+
+
+def fetch_records(table_name, record_ids, include_expired=False):
+    """
+    Возвращает записи с указанными ID, читая только партиции и сегменты,
+    которые могут их содержать. Истекшие записи таблицы с TTL
+    не возвращаются (кроме include_expired).
+    """
+    record_ids = set(record_ids)
+    if not record_ids:
+        return []
+
+    options = load_table_options(table_name)
+    spec = options.get('partition')
+    existing = options.get('partitions', [])
+    if not spec:
+        keys = [None]
+    elif spec['kind'] == 'range' and spec['column'] == 'ID':
+        keys = sorted({partition_key(spec, {'ID': record_id})
+                       for record_id in record_ids}.intersection(existing))
+    else:
+        keys = existing
+
+    expired = expired_predicate(None if include_expired else options.get('ttl'))
+    records = []
+    for key in keys:
+        for record in _load_partition(table_name, key, options, record_ids):
+            if record.get('ID') in record_ids and not expired(record):
+                records.append(record)
+    return records
+
+
+def supports_id_lookup(table_name):
+    """
+    Проверяет, можно ли читать записи по ID, не читая всю таблицу.
+    """
+    options = load_table_options(table_name)
+    spec = options.get('partition') or {}
+    by_id_range = spec.get('kind') == 'range' and spec.get('column') == 'ID'
+    return by_id_range or bool(_compression(options))
+
+
+def estimate_size(table_name):
+    """
+    Возвращает размер файлов таблицы на диске в байтах (оценка объема данных).
+    """
+    return sum(os.path.getsize(filepath) for filepath in table_files(table_name)
+               if os.path.exists(filepath))
+
+
+def save_partitions(table_name, partitions):
+    """
+    Сохраняет измененные партиции.
+    Записи, у которых изменился ключ партиционирования, переносятся
+    в свою партицию.
+    """
+    options = load_table_options(table_name)
+    spec = options.get('partition')
+    if not spec:
+        for key, rows in partitions.items():
+            _save_partition(table_name, key, rows, options)
+        return
+
+    partitions = {key: list(rows) for key, rows in partitions.items()}
+    moved = []
+    for key, rows in partitions.items():
+        stay = []
+        for record in rows:
+            (stay if partition_key(spec, record) == key else moved).append(record)
+        partitions[key] = stay
+
+    for record in moved:
+        key = partition_key(spec, record)
+        if key not in partitions:
+            partitions[key] = _load_partition(table_name, key, options)
+        partitions[key].append(record)
+
+    for key, rows in partitions.items():
+        _save_partition(table_name, key, rows, options)
+    _register_partitions(table_name, options, partitions)
+
+
+async def save_partitions_async(table_name, partitions):
+    """
+    Асинхронный вариант save_partitions: кодирование и запись файлов
+    выполняются в пуле потоков.
+    """
+    await run_blocking(save_partitions, table_name, partitions)
+
+
+def _register_partitions(table_name, options, keys):
+    """
+    Добавляет новые номера партиций в параметры таблицы.
+    """
+    existing = set(options.get('partitions', []))
+    if not existing.issuperset(keys):
+        options['partitions'] = sorted(existing.union(keys))
+        save_table_options(table_name, options)
+
+
+def insert_record(table_name, fields):
+    """
+    Добавляет запись в таблицу и возвращает ее ID.
+    В партиционированной таблице читается и пишется только одна партиция.
+    """
+    options = load_table_options(table_name)
+    spec = options.get('partition')
+
+    if not spec:
+        table_data = _load_partition(table_name, None, options)
+        new_id = max((item['ID'] for item in table_data), default=0) + 1
+        table_data.append({'ID': new_id, **fields})
+        _save_partition(table_name, None, table_data, options)
+        return new_id
+
+    new_id = options.get('last_id', 0) + 1
+    record = {'ID': new_id, **fields}
+    key = partition_key(spec, record)
+    rows = _load_partition(table_name, key, options)
+    rows.append(record)
+    _save_partition(table_name, key, rows, options)
+
+    options['last_id'] = new_id
+    options['partitions'] = sorted(set(options.get('partitions', [])) | {key})
+    save_table_options(table_name, options)
+    return new_id
+
+
+def last_record_id(table_name):
+    """
+    Возвращает наибольший выданный ID таблицы (с учетом истекших записей).
+    """
+    options = load_table_options(table_name)
+    if options.get('partition'):
+        return options.get('last_id', 0)
+    return max((record['ID'] for record in _iter_partition(table_name, None, options)),
+               default=0)
+
+
+def apply_changes(table_name, changes):
+    """
+    Применяет к таблице готовые изменения строк (например, полученные
+    из журнала ведущей базы): запись after сохраняется с ее ID, запись
+    before удаляется. Повторное применение тех же изменений безопасно.
+    """
+    options = load_table_options(table_name)
+    spec = options.get('partition')
+    existing = set(options.get('partitions', []))
+
+    def key_of(record):
+        return partition_key(spec, record) if spec else None
+
+    partitions = {}
+    for change in changes:
+        for record in (change.before, change.after):
+            if record is not None and key_of(record) not in partitions:
+                key = key_of(record)
+                rows = _load_partition(table_name, key, options) \
+                    if not spec or key in existing else []
+                partitions[key] = {item['ID']: item for item in rows}
+
+    for change in changes:
+        if change.before is not None:
+            partitions[key_of(change.before)].pop(change.before['ID'], None)
+        if change.after is not None:
+            partitions[key_of(change.after)][change.after['ID']] = dict(change.after)
+
+    for key, rows in partitions.items():
+        _save_partition(table_name, key,
+                        sorted(rows.values(), key=lambda item: item['ID']), options)
+    if spec:
+        last_id = max((change.after['ID'] for change in changes
+                       if change.after is not None), default=0)
+        if last_id > options.get('last_id', 0):
+            options['last_id'] = last_id
+            options['partitions'] = sorted(existing)
+            save_table_options(table_name, options)
+        _register_partitions(table_name, options, partitions)
+
+
+def count_rows(table_name):
+    """
+    Возвращает количество записей в таблице.
+    Для сжатых таблиц читаются только заголовки файлов.
+    """
+    options = load_table_options(table_name)
+    if not _compression(options) or writeback.current() is not None:
+        return sum(len(rows) for rows in load_partitions(table_name).values())
+
+    count = 0
+    for filepath in table_files(table_name, options):
+        if os.path.exists(filepath):
+            count += sum(seg['rows'] for seg in read_header(filepath)['segments'])
+    return count
+
+
+def compression_stats(table_name):
+    """
+    Возвращает суммарную статистику сжатия таблицы или None,
+    если сжатие не включено. Размеры сегментов берутся из заголовков,
+    а размер в JSON и скорость распаковки (байт в секунду) оцениваются
+    по COMPRESSION_SAMPLE_SEGMENTS распакованным сегментам.
+    """
+    options = load_table_options(table_name)
+    if not _compression(options):
+        return None
+
+    total = {'codec': options['compression'], 'segments': 0, 'rows': 0,
+             'raw_size': 0, 'stored_size': 0}
+    sample = {'segments': 0, 'raw_size': 0, 'json_size': 0, 'seconds': 0.0}
+    for filepath in table_files(table_name, options):
+        if not os.path.exists(filepath):
+            continue
+        stats = segment_stats(filepath)
+        for field in total:
+            if field != 'codec':
+                total[field] += stats[field]
+        budget = COMPRESSION_SAMPLE_SEGMENTS - sample['segments']
+        if budget > 0:
+            for field, value in sample_segments(filepath, budget).items():
+                sample[field] += value
+
+    total['json_size'] = 0
+    total['decode_speed'] = None
+    if sample['raw_size']:
+        total['json_size'] = round(total['raw_size'] * sample['json_size']
+                                   / sample['raw_size'])
+        total['decode_speed'] = sample['raw_size'] / max(sample['seconds'], 1e-9)
+    return total
+
+
+def set_compression(table_name, codec):
+    """
+    Переписывает все файлы таблицы в формате с новым кодеком сжатия.
+    """
+    options = load_table_options(table_name)
+    partitions = load_partitions(table_name)
+    old_files = table_files(table_name, options)
+
+    options['compression'] = codec
+    for key, rows in partitions.items():
+        _save_partition(table_name, key, rows, options)
+    save_table_options(table_name, options)
+
+    new_files = set(table_files(table_name, options))
+    for filepath in old_files:
+        if filepath not in new_files:
+            _remove_file(filepath)
+
+
+def compact_table(table_name):
+    """
+    Переписывает все файлы таблицы, приводя записи к текущей схеме.
+    Возвращает количество переписанных файлов.
+    """
+    partitions = load_partitions(table_name)
+    options = load_table_options(table_name)
+    for key, rows in partitions.items():
+        _save_partition(table_name, key, rows, options)
+    return len(partitions)
+
+
+def drop_table_files(table_name):
+    """
+    Удаляет все файлы данных таблицы, в том числе из буфера отложенной записи.
+    """
+    for filepath in table_files(table_name):
+        _remove_file(filepath)
+
+
+@contextmanager
+def frozen_files():
+    """
+    Приостанавливает запись файлов таблиц на время блока.
+    Возвращает файлы, изменения которых еще не сброшены из буфера
+    отложенной записи: {путь: (кодек, записи)}.
+    """
+    buffer = writeback.current()
+    with ExitStack() as stack:
+        pending = stack.enter_context(buffer.frozen()) if buffer is not None else {}
+        stack.enter_context(_file_locks.frozen())
+        yield pending
+
+
+def link_or_copy(source, target):
+    """
+    Создает жесткую ссылку на файл, а если это невозможно — копирует его.
+    Возвращает True, если удалось создать ссылку.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+        return True
+    except OSError:
+        shutil.copy2(source, target)
+        return False
+
+
+def snapshot_files(target_dir):
+    """
+    Создает согласованный снимок каталога и всех таблиц в target_dir.
+    Неизменные файлы разделяются с рабочей копией через жесткие ссылки,
+    несброшенные изменения из буфера записываются в снимок отдельно.
+    Возвращает словарь с количеством связанных, скопированных и записанных файлов.
+    """
+    if os.path.isdir(target_dir) and os.listdir(target_dir):
+        raise ValueError(f'Каталог "{target_dir}" не пуст')
+
+    wal_dir = os.path.dirname(WAL_PREFIX)
+    counts = {'linked': 0, 'copied': 0, 'written': 0}
+    with frozen_files() as pending:
+        for root, dirs, files in os.walk(DATA_DIR):
+            dirs[:] = [name for name in dirs
+                       if os.path.join(root, name) != wal_dir]
+            for name in files:
+                source = os.path.join(root, name)
+                if name.endswith('.tmp') or source in pending:
+                    continue
+                linked = link_or_copy(source, os.path.join(target_dir, source))
+                counts['linked' if linked else 'copied'] += 1
+
+        for filepath, (codec, rows) in pending.items():
+            target = os.path.join(target_dir, filepath)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write_file(target, rows, codec)
+            counts['written'] += 1
+
+        if os.path.exists(META_FILE):
+            shutil.copy2(META_FILE, os.path.join(target_dir, META_FILE))
+            counts['copied'] += 1
+    return counts
+
+
+def start_write_behind(interval=None):
+    """
+    Включает отложенную запись файлов таблиц.
+    """
+    kwargs = {} if interval is None else {'interval': interval}
+    return writeback.start(_read_file, _write_file, **kwargs)
+
+
+def stop_write_behind():
+    """
+    Выключает отложенную запись, сбросив изменения на диск.
+    """
+    writeback.stop()
+
+
+def flush_tables():
+    """
+    Немедленно записывает на диск все отложенные изменения.
+    Возвращает количество записанных файлов.
+    """
+    buffer = writeback.current()
+    return buffer.flush() if buffer is not None else 0
+
+
+def recover_tables():
+    """
+    Восстанавливает файлы таблиц по журналу отложенной записи.
+    """
+    return writeback.recover(_read_file, _write_file)
@@ -0,0 +1,183 @@
+"""
+Фоновая очистка истекших записей таблиц с TTL.
+
+Очистка берет из индекса истечения самые старые истекшие записи
+пакетами ограниченного размера, читает только содержащие их партиции
+и сегменты и удаляет записи как обычное изменение данных (с событиями
+для индексов, журнала изменений и представлений). Поэтому ее стоимость
+зависит от количества истекших записей, а не от размера таблицы.
+
+Фоновый поток и команды пользователя не изменяют таблицы одновременно:
+консоль удерживает блокировку, пока выполняет команду, и отпускает ее
+на время ожидания ввода.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from .catalog import get_catalog
+from .constants import TTL_SWEEP_BATCH, TTL_SWEEP_INTERVAL
+from .events import Change, publish
+from .storage import apply_changes, fetch_records
+from .ttl import expired_entries, expired_predicate, forget_entries, ttl_spec
+
+
+def sweep(table_name, limit=TTL_SWEEP_BATCH, now=None):
+    """
+    Удаляет не больше limit истекших записей таблицы.
+    Возвращает количество удаленных записей.
+    """
+    spec = ttl_spec(table_name)
+    if not spec:
+        return 0
+    entries = expired_entries(table_name, limit, now)
+    if not entries:
+        return 0
+
+    column = spec['column']
+    expired = expired_predicate(spec, now)
+    records = {record['ID']: record for record in
+               fetch_records(table_name, [record_id for _, record_id in entries],
+                             include_expired=True)}
+    changes = []
+    stale = []
+    for timestamp, record_id in entries:
+        record = records.get(record_id)
+        if record is not None and record.get(column) == timestamp and expired(record):
+            changes.append(Change('delete', record, None))
+        else:
+            stale.append([timestamp, record_id])
+
+    if stale:
+        forget_entries(table_name, stale)
+    if changes:
+        apply_changes(table_name, changes)
+        publish(table_name, changes)
+    return len(changes)
+
+
+def ttl_tables():
+    """
+    Возвращает имена таблиц с TTL.
+    """
+    return [table_name for table_name in get_catalog() if ttl_spec(table_name)]
+
+
+class ExpirySweeper:
+    """
+    Фоновый поток очистки. Каждые interval секунд проходит по таблицам
+    с TTL, удаляя не больше batch записей таблицы за проход; если истекших
+    записей больше, следующий проход начинается сразу.
+    """
+
+    def __init__(self, interval=TTL_SWEEP_INTERVAL, batch=TTL_SWEEP_BATCH):
+        self._interval = interval
+        self._batch = batch
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self.swept = 0
+        self._thread = threading.Thread(target=self._run, name='ttl-sweeper',
+                                        daemon=True)
+
+    def start(self):
+        """
+        Запускает фоновый поток. Вызывающий поток получает блокировку
+        таблиц и отпускает ее только внутри idle().
+        """
+        self._lock.acquire()
+        self._thread.start()
+
+    @contextmanager
+    def idle(self):
+        """
+        Разрешает очистку на время блока (например, ожидания ввода).
+        """
+        self._lock.release()
+        try:
+            yield
+        finally:
+            self._lock.acquire()
+
+    def sweep_once(self):
+        """
+        Выполняет один проход очистки по всем таблицам с TTL.
+        Возвращает True, если в какой-то таблице остались истекшие записи.
+        """
+        more = False
+        for table_name in ttl_tables():
+            swept = sweep(table_name, self._batch)
+            self.swept += swept
+            more = more or swept >= self._batch
+        return more
+
+    def _run(self):
+        """
+        Цикл фонового потока.
+        """
+        more = False
+        while not self._stopped:
+            if not more:
+                self._wake.wait(self._interval)
+                self._wake.clear()
+            if self._stopped:
+                break
+            with self._lock:
+                try:
+                    more = self.sweep_once()
+                except Exception as e:
+                    more = False
+                    print(f"Ошибка фоновой очистки истекших записей: {e}")
+
+    def stop(self):
+        """
+        Останавливает фоновый поток (блокировку держит вызывающий поток).
+        """
+        self._stopped = True
+        self._wake.set()
+        self._lock.release()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+_sweeper = None
+
+
+def current():
+    """
+    Возвращает запущенную фоновую очистку или None.
+    """
+    return _sweeper
+
+
+def start(interval=TTL_SWEEP_INTERVAL, batch=TTL_SWEEP_BATCH):
+    """
+    Запускает фоновую очистку истекших записей.
+    """
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = ExpirySweeper(interval, batch)
+        _sweeper.start()
+    return _sweeper
+
+
+def stop():
+    """
+    Останавливает фоновую очистку.
+    """
+    global _sweeper
+    if _sweeper is not None:
+        sweeper, _sweeper = _sweeper, None
+        sweeper.stop()
+
+
+@contextmanager
+def idle():
+    """
+    Разрешает фоновую очистку на время блока, если она запущена.
+    """
+    if _sweeper is None:
+        yield
+    else:
+        with _sweeper.idle():
+            yield
@@ -0,0 +1,152 @@
+"""
+Время жизни записей (TTL).
+
+Таблица, созданная с параметром ttl=<секунды> on <столбец timestamp>,
+хранит записи ограниченное время: запись истекает, когда с отметки
+времени в столбце прошло больше ttl секунд (запись с NULL не истекает).
+Истекшие записи сразу перестают быть видны при чтении, а удаляет их
+фоновая очистка (модуль sweeper).
+
+Для очистки поддерживается индекс истечения data/<таблица>.ttl.json —
+список пар [отметка времени, ID], упорядоченный по времени. Истекшие
+записи образуют его начало, поэтому очистка находит их без просмотра
+таблицы.
+"""
+
+import os
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta, timezone
+
+from .catalog import load_table_options
+from .codec import base_type
+from .constants import DATA_DIR
+from .events import subscribe
+from .utils import ensure_data_dir, load_json_file, save_json_file
+
+
+def validate_ttl(spec, table_structure):
+    """
+    Проверяет, что описание TTL подходит к схеме таблицы.
+    """
+    column = spec['column']
+    if column not in table_structure:
+        raise ValueError(f'Столбец "{column}" не существует')
+    if base_type(table_structure[column]) != 'timestamp':
+        raise ValueError("TTL задается только по столбцу типа timestamp")
+    if spec['seconds'] <= 0:
+        raise ValueError("Время жизни записей должно быть положительным")
+
+
+def describe_ttl(spec):
+    """
+    Возвращает описание TTL в синтаксисе команды.
+    """
+    return f"ttl={spec['seconds']} on {spec['column']}"
+
+
+def ttl_spec(table_name):
+    """
+    Возвращает описание TTL таблицы или None.
+    """
+    return load_table_options(table_name).get('ttl')
+
+
+def expiry_cutoff(spec, now=None):
+    """
+    Возвращает границу истечения: записи с отметкой времени не позже
+    нее истекли. Отметки хранятся строками ISO в UTC, поэтому граница
+    сравнивается с ними как строка.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    return (now - timedelta(seconds=spec['seconds'])).isoformat()
+
+
+def expired_predicate(spec, now=None):
+    """
+    Возвращает предикат «запись истекла» (для таблицы без TTL — всегда ложь).
+    """
+    if not spec:
+        return lambda record: False
+    column = spec['column']
+    cutoff = expiry_cutoff(spec, now)
+
+    def expired(record):
+        value = record.get(column)
+        return value is not None and value <= cutoff
+    return expired
+
+
+def expiry_path(table_name):
+    """
+    Возвращает путь к индексу истечения таблицы.
+    """
+    return f"{DATA_DIR}/{table_name}.ttl.json"
+
+
+def build_expiry_index(table_name, records):
+    """
+    Строит индекс истечения по записям таблицы.
+    """
+    column = ttl_spec(table_name)['column']
+    entries = sorted([record[column], record['ID']] for record in records
+                     if record.get(column) is not None)
+    ensure_data_dir()
+    save_json_file(expiry_path(table_name), entries)
+    return len(entries)
+
+
+def drop_expiry_index(table_name):
+    """
+    Удаляет индекс истечения таблицы.
+    """
+    filepath = expiry_path(table_name)
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+
+def expired_entries(table_name, limit, now=None):
+    """
+    Возвращает не больше limit самых старых истекших записей индекса
+    истечения: пары [отметка времени, ID].
+    """
+    spec = ttl_spec(table_name)
+    if not spec:
+        return []
+    entries = load_json_file(expiry_path(table_name), [])
+    end = bisect_right(entries, [expiry_cutoff(spec, now), float('inf')])
+    return entries[:min(end, limit)]
+
+
+def forget_entries(table_name, stale):
+    """
+    Убирает из индекса истечения устаревшие пары (записей с такой
+    отметкой времени в таблице уже нет).
+    """
+    stale = {tuple(entry) for entry in stale}
+    filepath = expiry_path(table_name)
+    entries = load_json_file(filepath, [])
+    save_json_file(filepath, [entry for entry in entries
+                              if tuple(entry) not in stale])
+
+
+@subscribe
+def _maintain_expiry(table_name, changes):
+    """
+    Обновляет индекс истечения таблицы с TTL по пакету изменений.
+    """
+    spec = ttl_spec(table_name)
+    if not spec:
+        return
+    column = spec['column']
+    filepath = expiry_path(table_name)
+    entries = load_json_file(filepath, [])
+    for change in changes:
+        if change.before is not None and change.before.get(column) is not None:
+            entry = [change.before[column], change.before['ID']]
+            position = bisect_right(entries, entry) - 1
+            if position >= 0 and entries[position] == entry:
+                del entries[position]
+        if change.after is not None and change.after.get(column) is not None:
+            insort(entries, [change.after[column], change.after['ID']])
+    ensure_data_dir()
+    save_json_file(filepath, entries)
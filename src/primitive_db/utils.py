@@ -6,7 +6,7 @@
 import json
 import os
 
-from .constants import DATA_DIR, META_FILE
+from .constants import DATA_DIR, JSON_CHUNK_SIZE, META_FILE
 
 
 def load_metadata(filepath=META_FILE):
@@ -42,6 +42,112 @@ def ensure_data_dir():
         os.makedirs(DATA_DIR)
 
 
+def load_json_file(filepath, default):
+    """
+    Загружает JSON файл, возвращая default если файла нет или он поврежден.
+    """
+    try:
+        with open(filepath, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return default
+    except json.JSONDecodeError as e:
+        print(f"Ошибка чтения файла {filepath}: {e}")
+        return default
+
+
+def save_json_file(filepath, data):
+    """
+    Сохраняет данные в JSON файл (атомарно, см. save_json_atomic).
+    """
+    try:
+        save_json_atomic(filepath, data)
+    except Exception as e:
+        print(f"Ошибка сохранения файла {filepath}: {e}")
+
+
+def save_json_atomic(filepath, data):
+    """
+    Атомарно сохраняет данные в JSON файл: сначала во временный файл,
+    затем заменяет им старый, поэтому читатель никогда не увидит
+    наполовину записанный файл.
+    """
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, filepath)
+
+
+class JsonArrayDecoder:
+    """
+    Инкрементальный разбор JSON массива объектов: куски текста подаются
+    по мере чтения, разобранные элементы возвращаются сразу, а в памяти
+    остается только недоразобранный хвост.
+    """
+
+    def __init__(self, filepath):
+        self._decoder = json.JSONDecoder()
+        self._filepath = filepath
+        self._buffer = ''
+        self._started = False
+        self.done = False
+
+    def feed(self, chunk):
+        """
+        Добавляет очередной кусок текста и возвращает разобранные элементы.
+        """
+        self._buffer += chunk
+        items = []
+        while not self.done:
+            buffer = self._buffer.lstrip()
+            if not self._started and buffer:
+                if buffer[0] != '[':
+                    raise ValueError(f"Файл {self._filepath} не содержит JSON массив")
+                buffer = buffer[1:].lstrip()
+                self._started = True
+            if buffer[:1] == ',':
+                buffer = buffer[1:].lstrip()
+            if self._started and buffer[:1] == ']':
+                self.done = True
+                self._buffer = ''
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                self._buffer = buffer
+                break
+            items.append(item)
+            self._buffer = buffer[end:]
+        return items
+
+    def finish(self):
+        """
+        Проверяет, что после конца файла не осталось недоразобранного текста.
+        """
+        if not self.done and self._buffer.strip():
+            raise json.JSONDecodeError("Неожиданный конец JSON массива",
+                                       self._buffer, len(self._buffer))
+
+
+def iter_json_array(filepath, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Потоково читает JSON файл с массивом объектов, выдавая элементы по одному.
+    В памяти держится только очередной кусок файла, а не весь массив.
+    """
+    decoder = JsonArrayDecoder(filepath)
+    try:
+        file = open(filepath, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with file:
+        while not decoder.done:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                decoder.finish()
+                return
+            yield from decoder.feed(chunk)
+
+
 def load_table_data(table_name):
     """
     Загружает данные таблицы из JSON файла.
@@ -65,7 +171,6 @@ def save_table_data(table_name, data):
     ensure_data_dir()
     filepath = f"{DATA_DIR}/{table_name}.json"
     try:
-        with open(filepath, 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=2, ensure_ascii=False)
+        save_json_atomic(filepath, data)
     except Exception as e:
         print(f"Ошибка сохранения данных таблицы {table_name}: {e}")
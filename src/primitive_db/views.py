@@ -0,0 +1,151 @@
+"""
+Материализованные представления.
+Представление хранится как обычная таблица с параметром view
+{source, where} в каталоге: его строки — записи исходной таблицы
+(с теми же ID), подходящие под условие. Представление обновляется
+инкрементально по событиям изменения исходной таблицы: к нему
+применяется только разница, а не повторное вычисление запроса.
+"""
+
+from .catalog import get_catalog, load_table_options
+from .codec import get_codec, where_parts
+from .constants import NULL_LITERAL
+from .events import Change, publish, subscribe
+from .fulltext import build_fulltext, fulltext_columns
+from .indexes import build_index, indexed_columns
+from .planner import results
+from .sketches import rebuild_sketches
+from .storage import load_partitions, save_partitions, scan
+from .ttl import build_expiry_index, ttl_spec
+
+
+def view_spec(table_name):
+    """
+    Возвращает описание представления {source, where} или None,
+    если таблица не является представлением.
+    """
+    return load_table_options(table_name).get('view')
+
+
+def views_of(table_name):
+    """
+    Возвращает имена представлений, построенных по таблице.
+    """
+    return get_catalog().views_of(table_name)
+
+
+def describe_view(spec):
+    """
+    Возвращает запрос представления в синтаксисе команды.
+    """
+    query = f"select from {spec['source']}"
+    if spec.get('where'):
+        column, value, op = where_parts(spec['where'])
+        query += f" where {column} {op} {NULL_LITERAL if value is None else value}"
+    return query
+
+
+def _view_matcher(spec):
+    """
+    Возвращает предикат условия представления по схеме исходной таблицы.
+    """
+    where = spec.get('where')
+    if not where:
+        return lambda record: True
+    return get_codec(get_catalog()[spec['source']]).matcher(*where)
+
+
+def compute_view(spec):
+    """
+    Потоково вычисляет строки представления по исходной таблице.
+    """
+    source = spec['source']
+    where = tuple(spec['where']) if spec.get('where') else None
+    matches = _view_matcher(spec)
+    codec = get_codec(get_catalog()[source])
+    for record in scan(source, where, codec):
+        if matches(record):
+            yield dict(record)
+
+
+def view_delta(spec, changes):
+    """
+    Переводит пакет изменений исходной таблицы в изменения представления.
+    """
+    matches = _view_matcher(spec)
+    delta = []
+    for change in changes:
+        was = change.before is not None and matches(change.before)
+        now = change.after is not None and matches(change.after)
+        if was and now:
+            delta.append(Change('update', change.before, dict(change.after)))
+        elif was:
+            delta.append(Change('delete', change.before, None))
+        elif now:
+            delta.append(Change('insert', None, dict(change.after)))
+    return delta
+
+
+def apply_delta(view_name, delta):
+    """
+    Применяет изменения к строкам представления и сохраняет его.
+    """
+    rows = load_partitions(view_name)[None]
+    removed = {change.before['ID'] for change in delta if change.before is not None}
+    upserts = {change.after['ID']: change.after
+               for change in delta if change.after is not None}
+    result = []
+    for record in rows:
+        if record['ID'] in upserts:
+            result.append(upserts.pop(record['ID']))
+        elif record['ID'] not in removed:
+            result.append(record)
+    result.extend(upserts.values())
+    result.sort(key=lambda record: record['ID'])
+    save_partitions(view_name, {None: result})
+
+
+@subscribe
+def _maintain_views(table_name, changes):
+    """
+    Применяет изменения таблицы к построенным по ней представлениям.
+    """
+    for view_name in views_of(table_name):
+        delta = view_delta(view_spec(view_name), changes)
+        if delta:
+            apply_delta(view_name, delta)
+            publish(view_name, delta)
+
+
+def dependent_views(table_name):
+    """
+    Возвращает все представления, зависящие от таблицы (в том числе
+    построенные по другим представлениям).
+    """
+    result = []
+    for view_name in views_of(table_name):
+        result.append(view_name)
+        result.extend(dependent_views(view_name))
+    return result
+
+
+def refresh_view(view_name):
+    """
+    Полностью перестраивает представление, его индексы и структуры,
+    а затем представления, построенные по нему.
+    Возвращает количество записей.
+    """
+    rows = list(compute_view(view_spec(view_name)))
+    save_partitions(view_name, {None: rows})
+    get_catalog().update_stats(view_name, rows=len(rows))
+    for column in indexed_columns(view_name):
+        build_index(view_name, column, rows)
+    for column, ngram in fulltext_columns(view_name).items():
+        build_fulltext(view_name, column, rows, ngram)
+    if ttl_spec(view_name):
+        build_expiry_index(view_name, rows)
+    rebuild_sketches(view_name)
+    results.invalidate(view_name)
+    for dependent in views_of(view_name):
+        refresh_view(dependent)
+    return len(rows)
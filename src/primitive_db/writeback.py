@@ -0,0 +1,313 @@
+"""
+Отложенная запись (write-behind) файлов таблиц.
+
+В этом режиме изменения применяются к копии файла в памяти и сразу
+подтверждаются, а на диск попадает только короткая запись в журнале
+(WAL) с разницей между старой и новой версией. Фоновый поток по таймеру
+или по объему накопленных изменений записывает измененные файлы и удаляет
+журнал, который они покрывают.
+"""
+
+import glob
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from .constants import (
+    FLUSH_DIRTY_BYTES,
+    FLUSH_INTERVAL,
+    WAL_FSYNC,
+    WAL_PREFIX,
+)
+
+
+def _segment_path(number):
+    """
+    Возвращает путь к сегменту журнала.
+    """
+    return f"{WAL_PREFIX}.{number:08d}.jsonl"
+
+
+def _segment_number(filepath):
+    """
+    Возвращает номер сегмента журнала по пути к нему.
+    """
+    return int(filepath.rsplit('.', 2)[-2])
+
+
+def _list_segments():
+    """
+    Возвращает пути к сегментам журнала в порядке записи.
+    """
+    return sorted(glob.glob(f"{WAL_PREFIX}.*.jsonl"), key=_segment_number)
+
+
+def diff_rows(old_rows, new_rows):
+    """
+    Возвращает записи, которые появились или изменились, и ID удаленных записей.
+    """
+    old = {record['ID']: record for record in old_rows}
+    upsert = [record for record in new_rows if old.get(record['ID']) != record]
+    new_ids = {record['ID'] for record in new_rows}
+    deleted = [record_id for record_id in old if record_id not in new_ids]
+    return upsert, deleted
+
+
+def apply_diff(rows, upsert, deleted):
+    """
+    Применяет разницу из журнала к списку записей.
+    """
+    deleted = set(deleted)
+    changed = {record['ID']: record for record in upsert}
+    result = []
+    for record in rows:
+        if record['ID'] in deleted:
+            continue
+        result.append(changed.pop(record['ID'], record))
+    result.extend(changed.values())
+    return result
+
+
+class WriteBehindBuffer:
+    """
+    Буфер файлов таблиц с журналом и фоновым потоком сброса на диск.
+    reader(path, codec) и writer(path, rows, codec) выполняют реальный ввод-вывод.
+    """
+
+    def __init__(self, reader, writer, interval=FLUSH_INTERVAL,
+                 max_dirty_bytes=FLUSH_DIRTY_BYTES):
+        self._reader = reader
+        self._writer = writer
+        self._interval = interval
+        self._max_dirty_bytes = max_dirty_bytes
+        self._files = {}
+        # Несброшенные файлы: {путь: первый сегмент журнала с их изменениями}
+        self._dirty = {}
+        self._dirty_bytes = 0
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+
+        segments = _list_segments()
+        self._segment = _segment_number(segments[-1]) + 1 if segments else 1
+        self._log = None
+        self._thread = threading.Thread(target=self._run, name='write-behind',
+                                        daemon=True)
+
+    def start(self):
+        """
+        Запускает фоновый поток сброса.
+        """
+        self._thread.start()
+
+    def _append_log(self, entry):
+        """
+        Добавляет запись в текущий сегмент журнала.
+        """
+        if self._log is None:
+            os.makedirs(os.path.dirname(WAL_PREFIX), exist_ok=True)
+            self._log = open(_segment_path(self._segment), 'a', encoding='utf-8')
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        self._log.write(line)
+        self._log.flush()
+        if WAL_FSYNC:
+            os.fsync(self._log.fileno())
+        return len(line.encode('utf-8'))
+
+    def load(self, path, codec):
+        """
+        Возвращает копию записей файла, читая его с диска только один раз.
+        """
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is None:
+                entry = (codec, self._reader(path, codec))
+                self._files[path] = entry
+            return [dict(record) for record in entry[1]]
+
+    def save(self, path, codec, rows):
+        """
+        Запоминает новую версию файла и записывает разницу в журнал.
+        """
+        with self._lock:
+            entry = self._files.get(path)
+            old_rows = entry[1] if entry else self._reader(path, codec)
+            upsert, deleted = diff_rows(old_rows, rows)
+            if entry and not upsert and not deleted:
+                return
+
+            self._dirty_bytes += self._append_log({
+                'path': path, 'codec': codec,
+                'upsert': upsert, 'delete': deleted,
+            })
+            self._files[path] = (codec, rows)
+            self._dirty.setdefault(path, self._segment)
+            if self._dirty_bytes >= self._max_dirty_bytes:
+                self._wake.set()
+
+    def discard(self, path):
+        """
+        Забывает файл, который удаляется с диска.
+        """
+        with self._lock:
+            if path in self._files:
+                self._append_log({'path': path, 'drop': True})
+                self._files.pop(path)
+                self._dirty.pop(path, None)
+
+    @contextmanager
+    def frozen(self):
+        """
+        Приостанавливает изменения и сброс буфера на время блока.
+        Возвращает несброшенные файлы {путь: (кодек, записи)}.
+        """
+        with self._flush_lock, self._lock:
+            yield {path: self._files[path] for path in self._dirty}
+
+    def dirty_tables(self):
+        """
+        Возвращает пути к файлам, еще не записанным на диск.
+        """
+        with self._lock:
+            return sorted(self._dirty)
+
+    def flush(self):
+        """
+        Записывает измененные файлы на диск и удаляет покрытый ими журнал.
+        Файл, который не удалось записать, остается несброшенным, и журнал
+        с его изменениями сохраняется до следующего сброса.
+        Возвращает количество записанных файлов.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                snapshot = [(path, first, *self._files[path])
+                            for path, first in self._dirty.items()]
+                self._dirty.clear()
+                self._dirty_bytes = 0
+                if self._log is not None:
+                    self._log.close()
+                    self._log = None
+                last_segment = self._segment
+                self._segment += 1
+
+            failed = []
+            error = None
+            for path, first, codec, rows in snapshot:
+                try:
+                    self._writer(path, rows, codec)
+                except Exception as e:
+                    failed.append((path, first))
+                    error = error or e
+
+            with self._lock:
+                for path, first in failed:
+                    if path in self._files:
+                        self._dirty[path] = min(first, self._dirty.get(path, first))
+                keep_from = min(self._dirty.values(), default=last_segment + 1)
+            for segment in _list_segments():
+                number = _segment_number(segment)
+                if number <= last_segment and number < keep_from:
+                    os.remove(segment)
+            if error is not None:
+                raise error
+            return len(snapshot)
+
+    def _run(self):
+        """
+        Цикл фонового потока: сброс по таймеру или по объему изменений.
+        """
+        while not self._stopped:
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            if self._stopped:
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Ошибка фоновой записи таблиц: {e}")
+
+    def close(self):
+        """
+        Останавливает фоновый поток и записывает все изменения.
+        """
+        self._stopped = True
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def recover(reader, writer):
+    """
+    Применяет к файлам таблиц журнал, оставшийся после аварийного завершения.
+    Возвращает количество восстановленных файлов.
+    """
+    segments = _list_segments()
+    if not segments:
+        return 0
+
+    files = {}
+    for segment in segments:
+        with open(segment, 'r', encoding='utf-8') as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                path = entry['path']
+                if entry.get('drop'):
+                    files[path] = None
+                    continue
+                codec = entry['codec']
+                if files.get(path) is None:
+                    base = reader(path, codec) if path not in files else []
+                    files[path] = (codec, base)
+                rows = apply_diff(files[path][1], entry['upsert'], entry['delete'])
+                files[path] = (codec, rows)
+
+    for path, entry in files.items():
+        if entry is not None:
+            writer(path, entry[1], entry[0])
+    for segment in segments:
+        os.remove(segment)
+    return sum(1 for entry in files.values() if entry is not None)
+
+
+_buffer = None
+
+
+def current():
+    """
+    Возвращает активный буфер отложенной записи или None.
+    """
+    return _buffer
+
+
+def start(reader, writer, interval=FLUSH_INTERVAL,
+          max_dirty_bytes=FLUSH_DIRTY_BYTES):
+    """
+    Включает режим отложенной записи.
+    """
+    global _buffer
+    if _buffer is None:
+        _buffer = WriteBehindBuffer(reader, writer, interval, max_dirty_bytes)
+        _buffer.start()
+    return _buffer
+
+
+def stop():
+    """
+    Выключает режим отложенной записи, записав все изменения на диск.
+    """
+    global _buffer
+    if _buffer is not None:
+        buffer, _buffer = _buffer, None
+        buffer.close()
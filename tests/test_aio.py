@@ -0,0 +1,130 @@
+"""
+Тесты для асинхронного ввода-вывода файлов таблиц.
+"""
+
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+from src.primitive_db import aio, storage
+from src.primitive_db.aio import (
+    iter_json_array_async,
+    load_table_data_async,
+    read_chunks,
+    save_table_data_async,
+)
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.codec import get_codec
+from src.primitive_db.core import create_table, insert
+from src.primitive_db.storage import (
+    load_partitions,
+    load_rows,
+    load_rows_async,
+    save_partitions_async,
+)
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestAsyncFiles:
+    """Тесты для асинхронного чтения и записи файлов."""
+
+    def test_read_chunks(self, tmp_path):
+        """Тест чтения файла кусками."""
+        filepath = tmp_path / "text.txt"
+        filepath.write_text("абвгдеёжз", encoding="utf-8")
+        chunks = asyncio.run(_collect(read_chunks(str(filepath), chunk_size=4)))
+        assert chunks == ["абвг", "деёж", "з"]
+        assert asyncio.run(_collect(read_chunks(str(tmp_path / "missing")))) == []
+
+    def test_iter_json_array_async(self, tmp_path):
+        """Тест потокового разбора JSON массива по кускам."""
+        items = [{"ID": i, "name": f"имя {i}"} for i in range(50)]
+        filepath = tmp_path / "items.json"
+        filepath.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+        result = asyncio.run(_collect(iter_json_array_async(str(filepath),
+                                                            chunk_size=16)))
+        assert result == items
+
+    def test_table_data_round_trip(self):
+        """Тест асинхронных вариантов load_table_data и save_table_data."""
+        data = [{"ID": 1, "name": "Иван"}, {"ID": 2, "name": "Мария"}]
+        asyncio.run(save_table_data_async("users", data))
+        assert asyncio.run(load_table_data_async("users")) == data
+
+
+class TestAsyncStorage:
+    """Тесты для асинхронного слоя хранения."""
+
+    def _create(self, table_name, options=None):
+        metadata = get_catalog()
+        create_table(metadata, table_name, ["name:str"], options)
+        for name in ("Иван", "Петя", "Оля"):
+            insert(metadata, table_name, f'("{name}")')
+        return metadata
+
+    def test_load_rows_async(self):
+        """Тест: асинхронное чтение совпадает с синхронным."""
+        metadata = self._create("users")
+        self._create("logs", {"compression": "zlib"})
+        codec = get_codec(metadata["users"])
+        for table_name in ("users", "logs"):
+            assert asyncio.run(load_rows_async(table_name)) == load_rows(table_name)
+        where_clause = ("name", "Петя")
+        assert asyncio.run(load_rows_async("logs", where_clause, codec)) == \
+            load_rows("logs", where_clause, codec)
+
+    def test_save_partitions_async(self):
+        """Тест асинхронного сохранения партиций."""
+        self._create("users")
+        partitions = load_partitions("users")
+        partitions[None][0]["name"] = "Иван Петрович"
+        asyncio.run(save_partitions_async("users", partitions))
+        assert load_rows("users")[0]["name"] == "Иван Петрович"
+
+    def test_tables_read_concurrently(self):
+        """Тест: чтение двух таблиц идет одновременно, а не по очереди."""
+        self._create("users")
+        self._create("tags")
+        barrier = threading.Barrier(2, timeout=5)
+        started = set()
+        read_chunk = aio._read_chunk
+
+        def gated(file, size):
+            # Первое чтение каждого файла ждет первого чтения другого файла
+            if file.name not in started:
+                started.add(file.name)
+                barrier.wait()
+            return read_chunk(file, size)
+
+        async def both():
+            return await asyncio.gather(load_rows_async("users"),
+                                        load_rows_async("tags"))
+
+        with patch.object(aio, "_read_chunk", gated):
+            users, tags = asyncio.run(both())
+        assert len(users) == len(tags) == 3
+
+    def test_tables_written_concurrently(self):
+        """Тест: запись двух таблиц идет одновременно, а не по очереди."""
+        self._create("users")
+        self._create("tags")
+        barrier = threading.Barrier(2, timeout=5)
+        save_json_file = storage.save_json_file
+
+        def gated(filepath, data):
+            # Запись каждого файла ждет начала записи другого файла
+            barrier.wait()
+            save_json_file(filepath, data)
+
+        async def both():
+            await asyncio.gather(
+                save_partitions_async("users", load_partitions("users")),
+                save_partitions_async("tags", load_partitions("tags")))
+
+        with patch.object(storage, "save_json_file", gated):
+            asyncio.run(both())
+        assert len(load_rows("users")) == len(load_rows("tags")) == 3
@@ -0,0 +1,67 @@
+"""
+Тесты для каталога базы данных.
+"""
+
+import json
+import os
+from unittest.mock import patch
+
+from src.primitive_db.catalog import Catalog, get_catalog
+from src.primitive_db.core import create_index, create_table, drop_table, insert
+
+
+class TestCatalog:
+    """Тесты для каталога таблиц."""
+
+    def test_create_table_registers_entry(self):
+        """Тест записи таблицы в каталог отдельным файлом."""
+        create_table({}, "users", ["name:str"], {"compression": "zlib"})
+
+        catalog = Catalog()
+        catalog.load()
+        assert catalog["users"] == {"ID": "int", "name": "str"}
+        assert catalog.options("users") == {"compression": "zlib"}
+        assert catalog.version == get_catalog().version
+        assert os.path.exists("data/_catalog/users.json")
+
+    def test_catalog_reloads_after_external_change(self):
+        """Тест обновления каталога, измененного другим процессом."""
+        catalog = get_catalog()
+        other = Catalog()
+        other.load()
+        other.add_table("logs", {"ID": "int"})
+
+        assert "logs" in get_catalog()
+        assert get_catalog() is catalog
+
+    def test_row_count_tracked_in_stats(self):
+        """Тест поддержки количества записей в статистике."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        insert(metadata, "users", '("Иван")')
+        insert(metadata, "users", '("Мария")')
+        assert get_catalog().stats("users")["rows"] == 2
+
+    @patch('builtins.input', return_value='y')
+    def test_drop_table_removes_files(self, mock_input):
+        """Тест удаления файлов данных и индексов вместе с таблицей."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        insert(metadata, "users", '("Иван")')
+        create_index(metadata, "users", "name")
+
+        drop_table(metadata, "users")
+        assert "users" not in get_catalog()
+        assert not os.path.exists("data/users.json")
+        assert not os.path.exists("data/users.idx.name.json")
+        assert not os.path.exists("data/_catalog/users.json")
+
+    def test_migrate_from_db_meta(self):
+        """Тест переноса таблиц из db_meta.json при первом запуске."""
+        with open("db_meta.json", "w", encoding="utf-8") as file:
+            json.dump({"users": {"ID": "int", "name": "str"}}, file)
+
+        catalog = Catalog()
+        catalog.load()
+        assert catalog["users"] == {"ID": "int", "name": "str"}
+        assert os.path.exists("data/_catalog/users.json")
@@ -0,0 +1,111 @@
+"""
+Тесты для потока изменений (CDC).
+"""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from src.primitive_db import changelog
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.cdc import Subscription, changes
+from src.primitive_db.changelog import list_segments, load_offsets
+from src.primitive_db.core import create_table, delete, insert, show_changes, update
+
+
+@pytest.fixture
+def users():
+    """Создает таблицу users с двумя записями."""
+    metadata = get_catalog()
+    create_table(metadata, "users", ["name:str", "age:int"])
+    insert(metadata, "users", '("Иван", 30)')
+    insert(metadata, "users", '("Петя", 12)')
+    return metadata
+
+
+class TestChanges:
+    """Тесты для чтения событий изменений."""
+
+    @patch('builtins.input', return_value='y')
+    def test_events(self, mock_input, users):
+        """Тест событий вставки, изменения и удаления."""
+        update(users, "users", ("age", "31"), ("name", "Иван"))
+        delete(users, "users", ("name", "Петя"))
+
+        events = list(changes())
+        assert [(event.op, event.id) for event in events] == [
+            ("insert", 1), ("insert", 2), ("update", 1), ("delete", 2)]
+        assert events[2].before["age"] == 30 and events[2].after["age"] == 31
+        assert events[3].after is None
+        assert [event.seq for event in events] == sorted(event.seq for event in events)
+
+    def test_table_filter(self, users):
+        """Тест фильтрации событий по таблице."""
+        create_table(users, "tags", ["label:str"])
+        insert(users, "tags", '("новый")')
+        assert [event.table for event in changes(tables={"tags"})] == ["tags"]
+
+    def test_deleted_segments(self, users):
+        """Тест ошибки при чтении уже удаленной части журнала."""
+        with patch.object(changelog, "CHANGELOG_SEGMENT_ENTRIES", 1), \
+                patch.object(changelog, "CHANGELOG_RETAIN_SEGMENTS", 1):
+            insert(users, "users", '("Оля", 40)')
+        with pytest.raises(ValueError):
+            list(changes(1))
+
+
+class TestSubscription:
+    """Тесты для подписки с возобновляемой позицией."""
+
+    def test_resume_from_committed_offset(self, users):
+        """Тест продолжения чтения после подтверждения позиции."""
+        subscription = Subscription("cache")
+        assert [event.id for event in subscription] == [1, 2]
+        subscription.commit()
+        insert(users, "users", '("Оля", 40)')
+
+        resumed = Subscription("cache")
+        assert [event.id for event in resumed.poll()] == [3]
+        assert load_offsets()["cache"] == 3
+
+    def test_poll_limit(self, users):
+        """Тест ограничения количества событий за один опрос."""
+        subscription = Subscription("search")
+        assert len(subscription.poll(1)) == 1
+        assert len(subscription.poll(5)) == 1
+        assert subscription.poll() == []
+
+    def test_retention_respects_offsets(self, users):
+        """Тест: непрочитанные подписчиком сегменты не удаляются."""
+        Subscription("slow").commit(2)
+        with patch.object(changelog, "CHANGELOG_SEGMENT_ENTRIES", 1), \
+                patch.object(changelog, "CHANGELOG_RETAIN_SEGMENTS", 1):
+            for age in range(3):
+                insert(users, "users", f'("Гость", {age})')
+            assert [event.id for event in Subscription("slow")] == [2, 3, 4, 5]
+
+            Subscription("slow").close()
+            insert(users, "users", '("Оля", 40)')
+        assert len(list_segments()) == 1
+
+    def test_async_stream(self, users):
+        """Тест асинхронного потока с ожиданием новых изменений."""
+        subscription = Subscription("async", tables={"users"})
+
+        async def consume():
+            received = []
+            async for event in subscription.stream(interval=0.01):
+                received.append(event.id)
+                if len(received) == 2:
+                    insert(users, "users", '("Оля", 40)')
+                if len(received) == 3:
+                    return received
+
+        assert asyncio.run(consume()) == [1, 2, 3]
+
+    def test_show_changes(self, users, capsys):
+        """Тест вывода событий командой changes."""
+        show_changes(users, "users", 3)
+        output = capsys.readouterr().out
+        assert "Петя" in output and "Иван" not in output
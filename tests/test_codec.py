@@ -0,0 +1,81 @@
+"""
+Тесты для кодеков строк таблиц.
+"""
+
+import pytest
+
+from src.primitive_db.codec import get_codec
+
+
+class TestCodec:
+    """Тесты для скомпилированных кодеков."""
+
+    schema = {"ID": "int", "name": "str", "age": "int", "is_active": "bool"}
+
+    def test_codec_is_compiled_once(self):
+        """Тест повторного использования кодека для одной схемы."""
+        assert get_codec(dict(self.schema)) is get_codec(dict(self.schema))
+
+    def test_encode_values(self):
+        """Тест преобразования сырых значений insert."""
+        codec = get_codec(self.schema)
+        record = codec.encode(['"Иван"', '25', 'да'])
+        assert record == {"name": "Иван", "age": 25, "is_active": True}
+
+    def test_encode_invalid_value(self):
+        """Тест ошибки преобразования с указанием столбца."""
+        codec = get_codec(self.schema)
+        with pytest.raises(ValueError, match="age"):
+            codec.encode(['"Иван"', 'abc', 'true'])
+
+    def test_decode_returns_row(self):
+        """Тест чтения записи в строку таблицы."""
+        codec = get_codec(self.schema)
+        row = codec.decode({"ID": 1, "name": "Иван", "age": 25})
+        assert row.ID == 1
+        assert row.name == "Иван"
+        assert row.is_active is None
+
+    def test_matcher_is_type_aware(self):
+        """Тест сравнения значения WHERE с учетом типа столбца."""
+        codec = get_codec(self.schema)
+        assert codec.matcher("is_active", "true")({"is_active": True})
+        assert codec.matcher("age", "25")({"age": 25})
+        assert not codec.matcher("age", "abc")({"age": 25})
+
+    def test_temporal_and_float_types(self):
+        """Тест приведения дат, отметок времени и дробных чисел к ISO/float."""
+        codec = get_codec({"ID": "int", "at": "timestamp", "day": "date",
+                           "score": "float"})
+        record = codec.encode(['2024-01-05 10:30', '2024-01-05', '2'])
+        assert record == {"at": "2024-01-05T10:30:00", "day": "2024-01-05",
+                          "score": 2.0}
+        assert codec.convert("at", "2024-01-05T12:00:00+03:00") == \
+            "2024-01-05T09:00:00"
+
+    def test_nullable_columns(self):
+        """Тест NULL в столбцах, допускающих и не допускающих NULL."""
+        codec = get_codec({"ID": "int", "note": "str?", "age": "int"})
+        assert codec.encode(['null', '5']) == {"age": 5}
+        with pytest.raises(ValueError, match="NULL"):
+            codec.encode(['"x"', 'NULL'])
+        assert codec.convert_update("note", "null") is None
+
+    def test_matcher_comparisons(self):
+        """Тест сравнений WHERE: порядок по типу столбца и NULL."""
+        codec = get_codec({"ID": "int", "at": "timestamp", "n": "int?"})
+        later = codec.matcher("at", "2024-01-01", ">=")
+        assert later({"at": "2024-01-01T00:00:00"})
+        assert not later({"at": "2023-12-31T23:59:59"})
+        assert codec.matcher("n", "9", "<")({"n": 10}) is False
+        assert codec.matcher("n", "9", ">")({}) is False
+        assert codec.matcher("n", None, "is")({})
+        with pytest.raises(ValueError, match="at"):
+            codec.matcher("at", "вчера", "<")
+
+    def test_condition(self):
+        """Тест типизированного условия для отсечения данных."""
+        codec = get_codec(self.schema)
+        assert codec.condition(("age", "25", ">")) == ("age", ">", 25)
+        assert codec.condition(("age", "25", "!=")) is None
+        assert codec.condition(("age", None, "is")) is None
@@ -0,0 +1,140 @@
+"""
+Тесты для сжатого посегментного формата таблиц.
+"""
+
+import json
+import os
+import struct
+import zlib
+
+import pytest
+
+from src.primitive_db import compression
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.codec import get_codec
+from src.primitive_db.compression import (
+    MAGIC_V1,
+    iter_segments,
+    read_header,
+    read_segments,
+    sample_segments,
+    segment_stats,
+    write_segments,
+)
+from src.primitive_db.core import alter_compression, create_table, info, insert
+from src.primitive_db.storage import count_rows, load_rows
+
+
+@pytest.fixture
+def rows():
+    """Возвращает записи с низкой кардинальностью строкового столбца."""
+    return [{"ID": i, "level": "INFO" if i % 3 else "WARN", "code": i * 2}
+            for i in range(1, 2501)]
+
+
+class TestCompression:
+    """Тесты для сжатия файлов таблиц."""
+
+    @pytest.mark.parametrize("codec", ["dict", "zlib", "lzma"])
+    def test_roundtrip(self, tmp_path, rows, codec):
+        """Тест записи и чтения сжатого файла."""
+        filepath = str(tmp_path / "table.seg")
+        write_segments(filepath, rows, codec)
+        assert read_segments(filepath) == rows
+
+    def test_segments_and_dictionary(self, tmp_path, rows):
+        """Тест разбиения на сегменты и словарного кодирования."""
+        filepath = str(tmp_path / "table.seg")
+        write_segments(filepath, rows, "zlib")
+        header = read_header(filepath)
+        assert len(header["segments"]) == 3
+        assert header["segments"][1]["min_id"] == 1001
+
+    def test_stats_from_header(self, tmp_path, rows, monkeypatch):
+        """Тест: статистика сжатия читается из заголовка без распаковки."""
+        filepath = str(tmp_path / "table.seg")
+        write_segments(filepath, rows, "zlib")
+        monkeypatch.setitem(compression._CODECS, "zlib", (zlib.compress, None))
+        stats = segment_stats(filepath)
+        assert stats["rows"] == 2500 and stats["segments"] == 3
+        assert stats["stored_size"] < stats["raw_size"]
+
+    def test_sample_segments(self, tmp_path, rows):
+        """Тест: оценка по выбранным сегментам распаковывает только их."""
+        filepath = str(tmp_path / "table.seg")
+        write_segments(filepath, rows, "zlib")
+        sample = sample_segments(filepath, 2)
+        header = read_header(filepath)
+        assert sample["segments"] == 2
+        assert sample["raw_size"] == header["segments"][0]["raw_size"] + \
+            header["segments"][2]["raw_size"]
+        assert sample["json_size"] == \
+            len(json.dumps(rows[:1000], indent=2).encode("utf-8")) + \
+            len(json.dumps(rows[2000:], indent=2).encode("utf-8"))
+        assert sample["seconds"] > 0
+
+    def test_info_reports_decode_speed(self, capsys):
+        """Тест: info показывает степень сжатия и скорость распаковки."""
+        metadata = get_catalog()
+        create_table(metadata, "logs", ["level:str"], {"compression": "zlib"})
+        insert(metadata, "logs", '("INFO")')
+        capsys.readouterr()
+        info(metadata, "logs")
+        output = capsys.readouterr().out
+        assert "Сжатие: zlib, сегментов: 1" in output
+        assert "распаковка" in output and "МБ/с" in output
+
+    def test_read_single_segment_by_id(self, tmp_path, rows):
+        """Тест чтения только сегмента с нужным ID."""
+        filepath = str(tmp_path / "table.seg")
+        write_segments(filepath, rows, "zlib")
+        assert len(read_segments(filepath, record_ids=[1500])) == 1000
+
+    def test_table_with_compression(self):
+        """Тест сжатой таблицы и смены кодека."""
+        metadata = {}
+        create_table(metadata, "logs", ["level:str"], {"compression": "zlib"})
+        insert(metadata, "logs", '("INFO")')
+        insert(metadata, "logs", '("WARN")')
+        assert os.path.exists("data/logs.seg")
+
+        codec = get_codec(metadata["logs"])
+        assert {"ID": 2, "level": "WARN"} in load_rows("logs", ("ID", "2"), codec)
+
+        alter_compression(metadata, "logs", "none")
+        assert not os.path.exists("data/logs.seg")
+        assert count_rows("logs") == 2
+
+    def test_packed_types_with_nulls(self, tmp_path):
+        """Тест упакованных столбцов с битовой картой NULL."""
+        rows = [{"ID": i, "at": f"2024-01-{i:02d}T08:00:00", "day": f"2024-02-{i:02d}",
+                 "score": i / 2, "flag": i % 2 == 0}
+                for i in range(1, 21)]
+        for record in rows[::3]:
+            del record["score"]
+        filepath = str(tmp_path / "table.seg")
+        write_segments(filepath, rows, "zlib")
+        assert read_segments(filepath) == rows
+        assert read_header(filepath)["segments"][0]["ranges"]["day"] == \
+            ["2024-02-01", "2024-02-20"]
+
+    def test_skip_segments_by_range(self, tmp_path, rows):
+        """Тест пропуска сегментов по диапазону значений столбца."""
+        filepath = str(tmp_path / "table.seg")
+        write_segments(filepath, rows, "zlib")
+        chunks = list(iter_segments(filepath, condition=("code", ">", 4000)))
+        assert len(chunks) == 1
+        assert chunks[0][0]["ID"] == 2001
+
+    def test_read_v1_file(self, tmp_path):
+        """Тест чтения файла первой версии формата (сегменты в JSON)."""
+        raw = json.dumps({"ID": {"values": [1, 2]},
+                          "level": {"dict": ["A"], "codes": [0, 0]}}).encode()
+        header = json.dumps({"codec": "zlib", "segments": [{
+            "offset": 0, "length": len(zlib.compress(raw)), "rows": 2,
+            "raw_size": len(raw), "min_id": 1, "max_id": 2}]}).encode()
+        filepath = tmp_path / "old.seg"
+        filepath.write_bytes(MAGIC_V1 + struct.pack(">I", len(header)) + header +
+                             zlib.compress(raw))
+        assert read_segments(str(filepath)) == [{"ID": 1, "level": "A"},
+                                                {"ID": 2, "level": "A"}]
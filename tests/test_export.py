@@ -0,0 +1,87 @@
+"""
+Тесты для экспорта таблиц и снимков базы.
+"""
+
+import json
+import os
+
+import pytest
+
+from src.primitive_db.core import create_table, export_table, insert, snapshot
+from src.primitive_db.export import export_format, export_rows
+from src.primitive_db.storage import (
+    snapshot_files,
+    start_write_behind,
+    stop_write_behind,
+)
+
+
+class TestExport:
+    """Тесты для экспорта таблиц."""
+
+    def test_export_csv(self, tmp_path):
+        """Тест выгрузки в CSV с пропущенными значениями."""
+        filepath = str(tmp_path / "users.csv")
+        count = export_rows(iter([{"ID": 1, "name": "a, b"}, {"ID": 2}]),
+                            ["ID", "name"], filepath)
+        assert count == 2
+        with open(filepath, encoding="utf-8") as file:
+            assert file.read().splitlines() == ["ID,name", '1,"a, b"', "2,"]
+
+    def test_export_table_jsonl(self, tmp_path):
+        """Тест выгрузки таблицы в JSON Lines."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"], {"compression": "zlib"})
+        insert(metadata, "users", '("Иван")')
+        insert(metadata, "users", '("Мария")')
+
+        filepath = str(tmp_path / "users.jsonl")
+        export_table(metadata, "users", filepath)
+        with open(filepath, encoding="utf-8") as file:
+            rows = [json.loads(line) for line in file]
+        assert rows == [{"ID": 1, "name": "Иван"}, {"ID": 2, "name": "Мария"}]
+
+    def test_export_unknown_format(self):
+        """Тест отказа в неизвестном формате экспорта."""
+        with pytest.raises(ValueError, match="формат"):
+            export_format("users.xml")
+
+
+class TestSnapshot:
+    """Тесты для снимков базы."""
+
+    def test_snapshot_links_files(self, tmp_path):
+        """Тест снимка: файлы разделяются через ссылки и не меняются после записи."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        insert(metadata, "users", '("Иван")')
+
+        target = str(tmp_path / "snap")
+        counts = snapshot_files(target)
+        assert counts["linked"] + counts["copied"] >= 3
+        assert os.path.exists(os.path.join(target, "data/_catalog/users.json"))
+
+        insert(metadata, "users", '("Мария")')
+        with open(os.path.join(target, "data/users.json"), encoding="utf-8") as file:
+            assert json.load(file) == [{"ID": 1, "name": "Иван"}]
+
+    def test_snapshot_includes_unflushed_changes(self, tmp_path):
+        """Тест снимка с несброшенными изменениями отложенной записи."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        start_write_behind(interval=3600)
+        try:
+            insert(metadata, "users", '("Иван")')
+            counts = snapshot_files(str(tmp_path / "snap"))
+        finally:
+            stop_write_behind()
+
+        assert counts["written"] == 1
+        with open(tmp_path / "snap" / "data" / "users.json", encoding="utf-8") as file:
+            assert json.load(file) == [{"ID": 1, "name": "Иван"}]
+
+    def test_snapshot_refuses_non_empty_dir(self, tmp_path, capsys):
+        """Тест отказа создавать снимок в непустом каталоге."""
+        (tmp_path / "file.txt").write_text("x")
+        snapshot({}, str(tmp_path))
+        assert "не пуст" in capsys.readouterr().out
@@ -0,0 +1,163 @@
+"""
+Тесты для полнотекстовых индексов и условий contains/like.
+"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src.primitive_db import fulltext
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.codec import get_codec
+from src.primitive_db.core import (
+    create_index,
+    create_table,
+    delete,
+    drop_column,
+    insert,
+    remove_index,
+    rename_column,
+    select,
+    update,
+)
+from src.primitive_db.fulltext import (
+    flush_fulltext,
+    fulltext_columns,
+    fulltext_path,
+    load_fulltext,
+    search,
+    tokenize,
+)
+from src.primitive_db.planner import choose_plan
+
+NAMES = ("Иван Иванов", "Мария Ивасенко", "Пётр Сидоров", "Иван")
+
+
+@pytest.fixture
+def users():
+    """Создает таблицу users с полнотекстовым индексом по имени."""
+    metadata = get_catalog()
+    create_table(metadata, "users", ["name:str", "age:int"])
+    for age, name in enumerate(NAMES, start=20):
+        insert(metadata, "users", f'("{name}", {age})')
+    create_index(metadata, "users", "name", "fulltext", ngram=3)
+    return metadata
+
+
+def _ids(table_output):
+    """Возвращает ID из вывода select в порядке строк."""
+    return [int(line.split("|")[1]) for line in table_output.splitlines()
+            if line.startswith("|") and line.split("|")[1].strip().isdigit()]
+
+
+class TestTextConditions:
+    """Тесты для условий contains и like."""
+
+    def test_tokenize(self):
+        """Тест разбиения текста на слова в нижнем регистре."""
+        assert tokenize("Иван-Петрович, 2-й") == ["иван", "петрович", "2", "й"]
+
+    def test_matchers(self):
+        """Тест: contains ищет подстроку, like — шаблон, без учета регистра."""
+        codec = get_codec({"ID": "int", "name": "str"})
+        contains = codec.matcher("name", "ИВА", "contains")
+        like = codec.matcher("name", "ив_н%", "like")
+        records = [{"ID": 1, "name": "Иван"}, {"ID": 2, "name": "Мария Ивасенко"},
+                   {"ID": 3, "name": None}]
+        assert [contains(record) for record in records] == [True, True, False]
+        assert [like(record) for record in records] == [True, False, False]
+
+
+class TestFulltextIndex:
+    """Тесты для построения и обслуживания полнотекстового индекса."""
+
+    def test_create_only_on_str(self, users, capsys):
+        """Тест: индекс строится только по строковому столбцу."""
+        create_index(users, "users", "age", "fulltext")
+        assert "типа str" in capsys.readouterr().out
+        assert fulltext_columns("users") == {"name": 3}
+
+    def test_search_ranked(self, users):
+        """Тест: совпадение целого слова важнее совпадения части слова."""
+        scores = search("users", "name", "contains", "иван")
+        assert set(scores) == {1, 4}
+        assert scores[4] > scores[1] > 0
+        assert set(search("users", "name", "contains", "ива")) == {1, 2, 4}
+        # Индекс находит кандидатов, само условие проверяется при чтении
+        assert set(search("users", "name", "like", "%ан ив%")) == {1, 4}
+
+    @patch('builtins.input', return_value='y')
+    def test_maintained_by_changes(self, mock_input, users):
+        """Тест: индекс обновляется при вставке, изменении и удалении."""
+        insert(users, "users", '("Ивар", 50)')
+        update(users, "users", ("name", "Олег"), ("ID", "4"))
+        delete(users, "users", ("ID", "2"))
+        assert set(search("users", "name", "contains", "ива")) == {1, 5}
+        index = load_fulltext("users", "name")
+        assert "ивасенко" not in index["postings"]
+        assert "вас" not in index["grams"]
+        assert set(index["lengths"]) == {"1", "3", "4", "5"}
+
+    def test_saved_in_batches(self, users):
+        """Тест: изменения копятся в кэше индекса, а файл пишется при flush."""
+        filepath = fulltext_path("users", "name")
+        stamp = os.stat(filepath).st_mtime_ns
+        with patch.object(fulltext, "load_json_file") as load_json_file:
+            insert(users, "users", '("Ивар", 50)')
+        assert not load_json_file.called
+        assert os.stat(filepath).st_mtime_ns == stamp
+        assert set(search("users", "name", "contains", "ивар")) == {5}
+
+        assert flush_fulltext() == 1
+        assert not os.path.exists(filepath[:-len(".json")] + ".dirty")
+        fulltext._cache.clear()
+        assert "5" in load_fulltext("users", "name")["lengths"]
+
+    def test_unsaved_changes_lost(self, users):
+        """Тест: после потери памяти устаревший индекс перестраивается."""
+        insert(users, "users", '("Ивар", 50)')
+        # Имитируем аварийное завершение: изменения в памяти теряются
+        fulltext._cache.clear()
+        fulltext._unsaved.clear()
+        assert set(search("users", "name", "contains", "ивар")) == {5}
+
+    def test_select_ranked_by_relevance(self, users, capsys):
+        """Тест: select с contains выводит записи по релевантности."""
+        capsys.readouterr()
+        select(users, "users", ("name", "иван", "contains"))
+        assert _ids(capsys.readouterr().out) == [4, 1]
+        select(users, "users", ("name", "ива", "contains"), ("age", True))
+        assert _ids(capsys.readouterr().out) == [4, 2, 1]
+
+    def test_plan_uses_index(self, users):
+        """Тест: на большой таблице запрос выполняется по индексу без просмотра."""
+        for number in range(200):
+            insert(users, "users", f'("Пользователь {number}", {number})')
+        codec = get_codec(users["users"])
+        where_clause = ("name", "ива", "contains")
+        assert choose_plan("users", codec, where_clause).access == "fulltext"
+        assert choose_plan("users", codec, ("name", "%", "like")).access == "scan"
+        with patch("src.primitive_db.core.scan") as scan, \
+                patch("src.primitive_db.core.load_rows") as load_rows, \
+                patch("builtins.print") as output:
+            select(users, "users", where_clause)
+        assert not scan.called and not load_rows.called
+        assert _ids(str(output.call_args_list[0].args[0])) == [1, 4, 2]
+
+    @patch('builtins.input', return_value='y')
+    def test_follows_schema_changes(self, mock_input, users, capsys):
+        """Тест: индекс переименовывается и удаляется вместе со столбцом."""
+        rename_column(users, "users", "name", "title")
+        assert fulltext_columns("users") == {"title": 3}
+        assert set(search("users", "title", "contains", "сидор")) == {3}
+        drop_column(users, "users", "title")
+        assert fulltext_columns("users") == {}
+        assert not os.path.exists(fulltext_path("users", "title"))
+
+    def test_remove_index(self, users, capsys):
+        """Тест удаления полнотекстового индекса."""
+        remove_index(users, "users", "name", "fulltext")
+        assert fulltext_columns("users") == {}
+        remove_index(users, "users", "name", "fulltext")
+        assert "не существует" in capsys.readouterr().out
@@ -0,0 +1,88 @@
+"""
+Тесты для индексов и соединения таблиц.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.primitive_db.core import (
+    create_index,
+    create_table,
+    delete,
+    insert,
+    select_join,
+    update,
+)
+from src.primitive_db.indexes import lookup
+from src.primitive_db.join import choose_strategy, execute_join
+
+
+@pytest.fixture
+def metadata():
+    """Создает таблицы пользователей и заказов."""
+    metadata = {}
+    create_table(metadata, "users", ["name:str"])
+    create_table(metadata, "orders", ["user_id:int", "item:str"])
+    for name in ("Иван", "Мария"):
+        insert(metadata, "users", f'("{name}")')
+    for user_id, item in ((1, "книга"), (2, "ручка"), (1, "чашка")):
+        insert(metadata, "orders", f'({user_id}, "{item}")')
+    return metadata
+
+
+def _spec(where=None):
+    return {"left": "orders", "right": "users", "left_column": "user_id",
+            "right_column": "ID", "where": where}
+
+
+def _pairs(metadata, spec):
+    strategy, pairs = execute_join(metadata, spec)
+    return strategy, sorted((o["ID"], u["name"]) for o, u in pairs)
+
+
+class TestJoin:
+    """Тесты для индексов и соединения таблиц."""
+
+    def test_hash_join(self, metadata):
+        """Тест соединения хэшированием."""
+        strategy, pairs = _pairs(metadata, _spec())
+        assert strategy.startswith("hash join")
+        assert pairs == [(1, "Иван"), (2, "Мария"), (3, "Иван")]
+
+    def test_hash_join_with_where(self, metadata):
+        """Тест соединения с условием на одну из таблиц."""
+        _, pairs = _pairs(metadata, _spec(("users", "name", "Мария")))
+        assert pairs == [(2, "Мария")]
+
+    def test_index_nested_loop_join(self, metadata):
+        """Тест соединения через индекс по ключу."""
+        create_index(metadata, "orders", "user_id")
+        spec = {"left": "users", "right": "orders", "left_column": "ID",
+                "right_column": "user_id", "where": None}
+        assert choose_strategy(spec) == ("index", "right")
+
+        _, pairs = execute_join(metadata, spec)
+        assert sorted((u["name"], o["item"]) for u, o in pairs) == [
+            ("Иван", "книга"), ("Иван", "чашка"), ("Мария", "ручка")]
+
+    @patch('builtins.input', return_value='y')
+    def test_index_maintained_on_writes(self, mock_input, metadata):
+        """Тест обновления индекса при вставке, изменении и удалении."""
+        create_index(metadata, "orders", "user_id")
+        insert(metadata, "orders", '(2, "тетрадь")')
+        assert lookup("orders", "user_id", 2) == [2, 4]
+
+        update(metadata, "orders", ("user_id", "1"), ("ID", "2"))
+        assert lookup("orders", "user_id", 2) == [4]
+
+        delete(metadata, "orders", ("user_id", "1"))
+        assert lookup("orders", "user_id", 1) == []
+
+    def test_select_join_output(self, metadata, capsys):
+        """Тест вывода результата соединения."""
+        select_join(metadata, _spec((None, "name", "Иван")))
+        captured = capsys.readouterr()
+        assert "users.name" in captured.out
+        assert "чашка" in captured.out
+        assert "ручка" not in captured.out
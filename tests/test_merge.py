@@ -0,0 +1,129 @@
+"""
+Тесты для upsert и merge.
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.primitive_db import merge as merge_module
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.constants import MERGE_BATCH_ROWS
+from src.primitive_db.core import create_index, create_table, insert, merge, upsert
+from src.primitive_db.indexes import lookup
+from src.primitive_db.parser import parse_upsert
+from src.primitive_db.storage import load_rows
+
+
+def _upsert(metadata, command):
+    """Выполняет upsert по тексту аргументов команды."""
+    upsert(metadata, parse_upsert(command.split()))
+
+
+@pytest.fixture
+def users():
+    """Создает таблицу users с двумя записями."""
+    metadata = get_catalog()
+    create_table(metadata, "users", ["name:str", "age:int?"])
+    insert(metadata, "users", '("Иван", 30)')
+    insert(metadata, "users", '("Мария", 25)')
+    return metadata
+
+
+def _rows():
+    """Возвращает записи users как {ID: (имя, возраст)}."""
+    return {record["ID"]: (record["name"], record.get("age"))
+            for record in load_rows("users")}
+
+
+class TestUpsert:
+    """Тесты для команды upsert."""
+
+    def test_update_on_conflict(self, users, capsys):
+        """Тест: при конфликте запись обновляется значением из excluded."""
+        _upsert(users, "into users values (Иван, 41) on conflict (name) "
+                       "do update set age = excluded.age")
+        assert _rows() == {1: ("Иван", 41), 2: ("Мария", 25)}
+        assert "обновлено 1" in capsys.readouterr().out
+
+    def test_insert_without_conflict(self, users):
+        """Тест: без конфликта запись вставляется со следующим ID."""
+        _upsert(users, "into users values (Пётр, 22) on conflict (name) "
+                       "do update set age = 1")
+        assert _rows()[3] == ("Пётр", 22)
+
+    def test_do_nothing(self, users, capsys):
+        """Тест: do nothing оставляет существующую запись."""
+        _upsert(users, "into users values (Иван, 99) on conflict (name) do nothing")
+        assert _rows()[1] == ("Иван", 30)
+        assert "пропущено 1" in capsys.readouterr().out
+
+    def test_conflict_by_id(self, users):
+        """Тест: при конфликте по ID первым значением указывается ID."""
+        _upsert(users, "into users values (2, Маша, 26) on conflict (ID) "
+                       "do update set name = excluded.name, age = null")
+        _upsert(users, "into users values (10, Оля, 19) on conflict (ID) do nothing")
+        assert _rows() == {1: ("Иван", 30), 2: ("Маша", None), 10: ("Оля", 19)}
+
+    def test_null_into_required_column(self, users, capsys):
+        """Тест: excluded со значением NULL не записывается в столбец без NULL."""
+        _upsert(users, "into users values (Иван, null) on conflict (name) "
+                       "do update set name = excluded.age")
+        assert "name: столбец не допускает NULL" in capsys.readouterr().out
+        assert _rows() == {1: ("Иван", 30), 2: ("Мария", 25)}
+
+    def test_unknown_column(self, users, capsys):
+        """Тест: столбец конфликта должен существовать."""
+        _upsert(users, "into users values (Иван, 1) on conflict (nope) do nothing")
+        assert 'Столбец "nope" не существует' in capsys.readouterr().out
+
+
+class TestMerge:
+    """Тесты для слияния файла с таблицей."""
+
+    def test_merge_jsonl_by_id(self, users, tmp_path):
+        """Тест: строки с известным ID обновляют только заданные столбцы."""
+        filepath = tmp_path / "sync.jsonl"
+        filepath.write_text('{"ID": 1, "age": 31}\n\n'
+                            '{"ID": 7, "name": "Оля", "age": 19}\n'
+                            '{"name": "Без ID"}\n', encoding="utf-8")
+        merge(users, "users", str(filepath))
+        assert _rows() == {1: ("Иван", 31), 2: ("Мария", 25),
+                           7: ("Оля", 19), 8: ("Без ID", None)}
+
+    def test_merge_csv_by_indexed_key(self, users, tmp_path):
+        """Тест: слияние по столбцу с индексом; индекс обновляется."""
+        create_index(users, "users", "name")
+        filepath = tmp_path / "sync.csv"
+        filepath.write_text("ID,name,age\n99,Мария,\n5,Пётр,40\n",
+                            encoding="utf-8")
+        merge(users, "users", str(filepath), "name")
+        # ID из файла учитывается только при слиянии по ID
+        assert _rows() == {1: ("Иван", 30), 2: ("Мария", None), 3: ("Пётр", 40)}
+        assert lookup("users", "name", "Пётр") == [3]
+
+    def test_one_write_per_batch(self, users, tmp_path):
+        """Тест: каждый пакет строк записывается в таблицу один раз."""
+        filepath = tmp_path / "bulk.jsonl"
+        lines = [{"name": f"Пользователь {i}", "age": i}
+                 for i in range(MERGE_BATCH_ROWS * 2 + 1)]
+        lines.append({"name": "Иван", "age": 1})
+        filepath.write_text("\n".join(json.dumps(line, ensure_ascii=False)
+                                      for line in lines), encoding="utf-8")
+        apply_changes = merge_module.apply_changes
+        with patch.object(merge_module, "apply_changes",
+                          side_effect=apply_changes) as writes:
+            merge(users, "users", str(filepath), "name")
+        assert writes.call_count == 3
+        assert len(_rows()) == MERGE_BATCH_ROWS * 2 + 3
+        assert _rows()[1] == ("Иван", 1)
+
+    def test_invalid_row_reported(self, users, tmp_path, capsys):
+        """Тест: ошибка в строке файла не применяет ее пакет."""
+        filepath = tmp_path / "bad.jsonl"
+        filepath.write_text('{"ID": 1, "age": 5}\n{"ID": 2, "age": "много"}\n',
+                            encoding="utf-8")
+        merge(users, "users", str(filepath))
+        assert "прочитано строк: 2" in capsys.readouterr().out
+        assert _rows()[1] == ("Иван", 30)
@@ -2,9 +2,25 @@
 Тесты для парсера команд.
 """
 
+import shlex
+
 import pytest
 
-from src.primitive_db.parser import parse_set, parse_values, parse_where
+from src.primitive_db.parser import (
+    parse_alter,
+    parse_count,
+    parse_create_table,
+    parse_index,
+    parse_join,
+    parse_merge,
+    parse_order_by,
+    parse_partition,
+    parse_set,
+    parse_size,
+    parse_upsert,
+    parse_values,
+    parse_where,
+)
 
 
 class TestParser:
@@ -58,3 +74,139 @@ class TestParser:
         """Тест парсинга некорректного SET условия."""
         with pytest.raises(ValueError, match="Некорректный формат условия SET"):
             parse_set(["age", "26"])  # Не хватает оператора
+
+    def test_parse_partition_range(self):
+        """Тест парсинга партиционирования по диапазону."""
+        spec = parse_partition("range(ID, 100000)")
+        assert spec == {"kind": "range", "column": "ID", "size": 100000}
+
+    def test_parse_partition_invalid(self):
+        """Тест парсинга некорректного партиционирования."""
+        with pytest.raises(ValueError, match="PARTITION BY"):
+            parse_partition("list(ID)")
+
+    def test_parse_join(self):
+        """Тест парсинга соединения таблиц."""
+        spec = parse_join(["from", "orders", "join", "users", "on",
+                           "users.ID", "=", "orders.user_id",
+                           "where", "users.name", "=", '"Иван"'])
+        assert spec["left_column"] == "user_id"
+        assert spec["right_column"] == "ID"
+        assert spec["where"] == ("users", "name", "Иван")
+
+    def test_parse_join_invalid(self):
+        """Тест парсинга соединения с чужой таблицей в условии."""
+        with pytest.raises(ValueError, match="столбец соединения"):
+            parse_join(["from", "a", "join", "b", "on", "a.x", "=", "c.y"])
+
+    def test_parse_alter(self):
+        """Тест парсинга изменения схемы таблицы."""
+        assert parse_alter(["table", "users", "add", "column", "age:int",
+                            "default", "0"]) == \
+            ("users", {"op": "add", "column": "age", "type": "int", "default": "0"})
+        assert parse_alter(["table", "users", "rename", "column", "a", "to", "b"]) == \
+            ("users", {"op": "rename", "column": "a", "new_name": "b"})
+        assert parse_alter(["table", "users", "set", "compression", "zlib"]) == \
+            ("users", {"op": "compression", "codec": "zlib"})
+
+    def test_parse_alter_invalid(self):
+        """Тест парсинга некорректной команды ALTER TABLE."""
+        with pytest.raises(ValueError, match="ALTER TABLE"):
+            parse_alter(["table", "users", "drop", "age"])
+
+    def test_parse_where_operators(self):
+        """Тест парсинга сравнений и проверок на NULL в WHERE."""
+        assert parse_where(["age", ">=", "18"]) == ("age", "18", ">=")
+        assert parse_where(["name", "!=", '"Иван"']) == ("name", "Иван", "!=")
+        assert parse_where(["note", "is", "null"]) == ("note", None, "is")
+        assert parse_where(["note", "IS", "NOT", "NULL"]) == ("note", None, "is not")
+        assert parse_where(["name", "CONTAINS", "'ива'"]) == ("name", "ива", "contains")
+        assert parse_where(["name", "like", "%ан%"]) == ("name", "%ан%", "like")
+        with pytest.raises(ValueError):
+            parse_where(["age", "=>", "18"])
+
+    def test_parse_order_by(self):
+        """Тест отделения ORDER BY от команды select."""
+        parts = ["select", "from", "users", "where", "age", ">", "18"]
+        assert parse_order_by(parts + ["order", "by", "name", "DESC"]) == \
+            (parts, ("name", True))
+        assert parse_order_by(parts) == (parts, None)
+        with pytest.raises(ValueError, match="ORDER BY"):
+            parse_order_by(parts + ["order", "by", "name", "up"])
+
+    def test_parse_count(self):
+        """Тест парсинга select count(*) с условием и группировкой."""
+        assert parse_count(["count(*)", "from", "users"]) == \
+            ("users", None, None, None)
+        assert parse_count(["COUNT(*)", "from", "users", "where", "age", "=", "1",
+                            "group", "by", "name"]) == \
+            ("users", ("age", "1"), "name", None)
+        assert parse_count(["count(distinct", "name)", "from", "users"]) == \
+            ("users", None, None, "name")
+        with pytest.raises(ValueError):
+            parse_count(["count(*)", "users"])
+
+    def test_parse_index(self):
+        """Тест парсинга команд индекса с видом."""
+        assert parse_index(["users", "name"]) == ("users", "name", "hash", {})
+        assert parse_index(["users", "name", "USING", "bloom"]) == \
+            ("users", "name", "bloom", {})
+        assert parse_index(["users", "name", "using", "fulltext", "ngram"]) == \
+            ("users", "name", "fulltext", {"ngram": 3})
+        assert parse_index(["users", "name", "using", "fulltext", "ngram=2"]) == \
+            ("users", "name", "fulltext", {"ngram": 2})
+        with pytest.raises(ValueError):
+            parse_index(["users", "name", "using", "btree"])
+        with pytest.raises(ValueError):
+            parse_index(["users", "name", "using", "bloom", "ngram"])
+
+    def test_parse_upsert(self):
+        """Тест парсинга upsert с обновлением и без него."""
+        parts = ["into", "users", "values", "(Иван,", "30)", "on", "conflict",
+                 "(name)", "do", "update", "set", "age", "=", "excluded.age,",
+                 "note", "=", '"a b"']
+        assert parse_upsert(parts) == {
+            "table": "users", "values": "(Иван, 30)", "key": "name",
+            "set": [("age", "excluded.age"), ("note", "a b")]}
+        parts = shlex.split('into users values ("a, b", 1) on conflict (name) '
+                            'do update set note = "x, y", n = 2', posix=False)
+        assert parse_upsert(parts) == {
+            "table": "users", "values": '("a, b", 1)', "key": "name",
+            "set": [("note", "x, y"), ("n", "2")]}
+        parts = ["into", "users", "values", "(1)", "ON", "CONFLICT", "(", "ID", ")",
+                 "DO", "NOTHING"]
+        assert parse_upsert(parts)["set"] is None
+        assert parse_upsert(parts)["key"] == "ID"
+        with pytest.raises(ValueError):
+            parse_upsert(["into", "users", "values", "(1)", "on", "conflict",
+                          "(ID)", "do", "update"])
+
+    def test_parse_merge(self):
+        """Тест парсинга merge с ключом по умолчанию и заданным ключом."""
+        assert parse_merge(["users", "from", "a.csv"]) == ("users", "a.csv", "ID")
+        assert parse_merge(["users", "FROM", "a.jsonl", "on", "name"]) == \
+            ("users", "a.jsonl", "name")
+        with pytest.raises(ValueError):
+            parse_merge(["users", "a.csv"])
+
+    def test_parse_size(self):
+        """Тест парсинга размера с суффиксом."""
+        assert parse_size("4096") == 4096
+        assert parse_size("64k") == 64 * 1024
+        assert parse_size("2M") == 2 * 1024 * 1024
+        with pytest.raises(ValueError):
+            parse_size("много")
+
+    def test_parse_create_table_ttl(self):
+        """Тест парсинга времени жизни записей в create_table."""
+        name, columns, options = parse_create_table(
+            ["sessions", "token:str", "at:timestamp", "with", "compression=zlib",
+             "ttl=3600", "on", "at"])
+        assert (name, columns) == ("sessions", ["token:str", "at:timestamp"])
+        assert options == {"compression": "zlib",
+                           "ttl": {"seconds": 3600, "column": "at"}}
+        with pytest.raises(ValueError):
+            parse_create_table(["sessions", "at:timestamp", "with", "ttl=3600"])
+        with pytest.raises(ValueError):
+            parse_create_table(["sessions", "at:timestamp", "with", "ttl=час",
+                                "on", "at"])
@@ -0,0 +1,70 @@
+"""
+Тесты для партиционирования таблиц.
+"""
+
+import os
+from unittest.mock import patch
+
+from src.primitive_db.codec import get_codec
+from src.primitive_db.core import create_table, delete, insert, update
+from src.primitive_db.storage import load_partitions, load_rows
+
+
+class TestPartition:
+    """Тесты для партиционированных таблиц."""
+
+    def _create(self, partition):
+        metadata = {}
+        create_table(metadata, "events", ["kind:str", "value:int"],
+                     {"partition": partition})
+        return metadata
+
+    def test_insert_routes_to_one_partition(self):
+        """Тест маршрутизации вставки в партицию по диапазону ID."""
+        metadata = self._create({"kind": "range", "column": "ID", "size": 2})
+        for value in range(5):
+            insert(metadata, "events", f'("a", {value})')
+
+        assert os.path.exists("data/events.p0.json")
+        assert os.path.exists("data/events.p2.json")
+        assert [r["ID"] for r in load_rows("events")] == [1, 2, 3, 4, 5]
+
+    def test_where_prunes_partitions(self):
+        """Тест отсечения партиций по условию на ключ партиционирования."""
+        metadata = self._create({"kind": "hash", "column": "kind", "size": 4})
+        insert(metadata, "events", '("a", 1)')
+        insert(metadata, "events", '("b", 2)')
+
+        codec = get_codec(metadata["events"])
+        partitions = load_partitions("events", ("kind", "a"), codec)
+        assert len(partitions) == 1
+        assert [r["kind"] for rows in partitions.values() for r in rows] == ["a"]
+
+    def test_update_moves_record_between_partitions(self):
+        """Тест переноса записи при изменении ключа партиционирования."""
+        metadata = self._create({"kind": "hash", "column": "kind", "size": 4})
+        insert(metadata, "events", '("a", 1)')
+        update(metadata, "events", ("kind", "zzz"), ("ID", "1"))
+
+        rows = load_rows("events")
+        assert rows == [{"ID": 1, "kind": "zzz", "value": 1}]
+
+    @patch('builtins.input', return_value='y')
+    def test_delete_in_partition(self, mock_input):
+        """Тест удаления записей из партиционированной таблицы."""
+        metadata = self._create({"kind": "range", "column": "ID", "size": 2})
+        insert(metadata, "events", '("a", 1)')
+        insert(metadata, "events", '("b", 2)')
+        delete(metadata, "events", ("ID", "2"))
+
+        assert [r["ID"] for r in load_rows("events")] == [1]
+
+    def test_range_condition_prunes_partitions(self):
+        """Тест отсечения партиций по диапазону при сравнении."""
+        metadata = self._create({"kind": "range", "column": "ID", "size": 2})
+        for value in range(6):
+            insert(metadata, "events", f'("a", {value})')
+
+        codec = get_codec(metadata["events"])
+        assert sorted(load_partitions("events", ("ID", "4", ">="), codec)) == [2, 3]
+        assert sorted(load_partitions("events", ("ID", "2", "<"), codec)) == [0, 1]
@@ -0,0 +1,129 @@
+"""
+Тесты для планировщика запросов и статистики analyze.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.codec import get_codec
+from src.primitive_db.core import (
+    analyze,
+    create_index,
+    create_table,
+    explain,
+    insert,
+    select,
+)
+from src.primitive_db.events import Change, publish
+from src.primitive_db.planner import (
+    analyze_table,
+    choose_plan,
+    results,
+    selectivity,
+)
+from src.primitive_db.storage import apply_changes
+
+
+def _load(table_name, records):
+    """Загружает записи в таблицу одним пакетом."""
+    changes = [Change('insert', None, record) for record in records]
+    apply_changes(table_name, changes)
+    publish(table_name, changes)
+
+
+@pytest.fixture
+def orders():
+    """Создает сжатую таблицу orders на 10000 записей с индексами."""
+    metadata = get_catalog()
+    create_table(metadata, "orders", ["client:int", "amount:int", "note:str?"],
+                 {"compression": "zlib"})
+    _load("orders", [{"ID": i, "client": i % 5000, "amount": i,
+                      "note": None if i % 10 else "срочно"}
+                     for i in range(1, 10001)])
+    create_index(metadata, "orders", "client")
+    create_index(metadata, "orders", "amount")
+    return metadata
+
+
+def _plan(metadata, table_name, where_clause=None, cache_key=None):
+    return choose_plan(table_name, get_codec(metadata[table_name]), where_clause,
+                       cache_key)
+
+
+class TestStatistics:
+    """Тесты для сбора статистики и оценки селективности."""
+
+    def test_analyze(self, orders):
+        """Тест статистики по столбцам."""
+        stats = analyze_table("orders")
+        assert stats["amount"]["min"] == 1 and stats["amount"]["max"] == 10000
+        assert stats["note"]["nulls"] == 9000
+        assert 4500 <= stats["client"]["distinct"] <= 5500
+        assert len(stats["amount"]["histogram"]) == 17
+        assert get_catalog().stats("orders")["analyzed_rows"] == 10000
+
+    def test_selectivity(self, orders):
+        """Тест оценок доли подходящих записей."""
+        analyze_table("orders")
+        assert selectivity("orders", "client", "=", 5) == \
+            pytest.approx(0.0002, rel=0.2)
+        assert selectivity("orders", "amount", "<", 2500) == \
+            pytest.approx(0.25, abs=0.05)
+        assert selectivity("orders", "note", "is", None) == pytest.approx(0.9)
+        assert selectivity("orders", "client", "=", 50000) < 0.0002
+
+
+class TestPlans:
+    """Тесты для выбора плана запроса."""
+
+    def test_index_for_selective_condition(self, orders):
+        """Тест: для редкого значения выбирается индекс, для частых — просмотр."""
+        analyze_table("orders")
+        assert _plan(orders, "orders", ("client", "5")).access == "index"
+        assert _plan(orders, "orders", ("amount", "100", ">")).access == "scan"
+        assert _plan(orders, "orders", ("amount", "3", "<")).access == "index"
+
+    def test_replan_after_changes(self, orders):
+        """Тест: после изменения данных статистика пересобирается и план меняется."""
+        analyze_table("orders")
+        assert _plan(orders, "orders", ("client", "5")).access == "index"
+        _load("orders", [{"ID": i, "client": 5, "amount": i, "note": None}
+                         for i in range(10001, 20001)])
+        plan = _plan(orders, "orders", ("client", "5"))
+        assert plan.access == "scan"
+        assert get_catalog().stats("orders")["analyzed_rows"] == 20000
+
+    def test_partition_pruning(self):
+        """Тест плана с отсечением партиций."""
+        metadata = get_catalog()
+        create_table(metadata, "events", ["kind:str"],
+                     {"partition": {"kind": "hash", "column": "kind", "size": 4}})
+        for kind in ("a", "b", "c", "d", "e"):
+            insert(metadata, "events", f'("{kind}")')
+        plan = _plan(metadata, "events", ("kind", "a"))
+        assert plan.access == "scan" and plan.detail.startswith("партиций 1 из")
+
+    @patch('builtins.input', return_value='y')
+    def test_result_cache(self, mock_input, orders, capsys):
+        """Тест кэша результатов и его сброса при изменении таблицы."""
+        where_clause = ("client", "7")
+        select(orders, "orders", where_clause)
+        cache_key = ("orders", where_clause, None)
+        assert len(results.get(cache_key)) == 2
+        assert _plan(orders, "orders", where_clause, cache_key).access == "cache"
+
+        insert(orders, "orders", '(7, 1, "новый")')
+        assert results.get(cache_key) is None
+        capsys.readouterr()
+        select(orders, "orders", where_clause)
+        assert "новый" in capsys.readouterr().out
+
+    def test_commands(self, orders, capsys):
+        """Тест вывода analyze и explain."""
+        analyze(orders, "orders")
+        assert "записей 10000" in capsys.readouterr().out
+        explain(orders, "orders", ("client", "5"))
+        output = capsys.readouterr().out
+        assert "План запроса: index" in output and "scan" in output
@@ -0,0 +1,173 @@
+"""
+Тесты для журнала изменений и репликации.
+"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src.primitive_db import changelog
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.changelog import first_seq, last_seq, read_entries
+from src.primitive_db.core import (
+    add_column,
+    create_index,
+    create_table,
+    create_view,
+    delete,
+    drop_table,
+    insert,
+    update,
+)
+from src.primitive_db.engine import run
+from src.primitive_db.indexes import has_index
+from src.primitive_db.replication import is_replica, load_state, sync_once
+from src.primitive_db.storage import load_rows
+
+
+@pytest.fixture
+def leader(tmp_path):
+    """Создает ведущую базу с таблицей users в текущем каталоге."""
+    metadata = get_catalog()
+    create_table(metadata, "users", ["name:str", "age:int"])
+    insert(metadata, "users", '("Иван", 30)')
+    insert(metadata, "users", '("Петя", 12)')
+    return os.getcwd()
+
+
+@pytest.fixture
+def follower(tmp_path, monkeypatch):
+    """Возвращает функцию, выполняющую действие в каталоге реплики."""
+    replica_dir = tmp_path / "replica"
+    replica_dir.mkdir()
+    leader_dir = os.getcwd()
+
+    def in_replica(action):
+        monkeypatch.chdir(replica_dir)
+        try:
+            return action()
+        finally:
+            monkeypatch.chdir(leader_dir)
+            get_catalog()
+
+    return in_replica
+
+
+class TestChangeLog:
+    """Тесты для журнала изменений."""
+
+    def test_row_and_schema_changes_logged(self, leader):
+        """Тест записи изменений строк и схемы с последовательными seq."""
+        entries = list(read_entries())
+        assert [entry["seq"] for entry in entries] == [1, 2, 3]
+        assert [entry["op"] for entry in entries] == ["create", "insert", "insert"]
+        assert entries[1]["after"] == {"ID": 1, "name": "Иван", "age": 30}
+        assert last_seq() == 3
+
+    def test_read_from_seq(self, leader):
+        """Тест чтения журнала с заданного номера."""
+        assert [entry["seq"] for entry in read_entries(3)] == [3]
+
+    def test_views_not_logged(self, leader):
+        """Тест: изменения представлений не попадают в журнал."""
+        create_view(get_catalog(), "adults", "users", ("age", "18", ">="))
+        insert(get_catalog(), "users", '("Оля", 40)')
+        assert [entry["table"] for entry in read_entries(4)] == ["adults", "users"]
+
+    def test_segment_retention(self, leader):
+        """Тест ротации сегментов и удаления старых."""
+        with patch.object(changelog, "CHANGELOG_SEGMENT_ENTRIES", 2), \
+                patch.object(changelog, "CHANGELOG_RETAIN_SEGMENTS", 2):
+            for age in range(6):
+                insert(get_catalog(), "users", f'("Гость", {age})')
+        assert len(changelog.list_segments()) == 2
+        assert first_seq() > 1
+        assert last_seq() == 9
+
+
+class TestReplication:
+    """Тесты для реплики, применяющей журнал ведущей базы."""
+
+    def test_initial_catch_up(self, leader, follower):
+        """Тест первоначального копирования данных ведущей базы."""
+        state = follower(lambda: sync_once(leader))
+        assert state["seq"] == 3 and state["lag_entries"] == 0
+        rows = follower(lambda: load_rows("users"))
+        assert [record["name"] for record in rows] == ["Иван", "Петя"]
+        assert follower(lambda: get_catalog().stats("users"))["rows"] == 2
+
+    @patch('builtins.input', return_value='y')
+    def test_incremental_changes(self, mock_input, leader, follower):
+        """Тест применения вставки, изменения и удаления."""
+        follower(lambda: sync_once(leader))
+        insert(get_catalog(), "users", '("Оля", 40)')
+        update(get_catalog(), "users", ("age", "31"), ("name", "Иван"))
+        delete(get_catalog(), "users", ("name", "Петя"))
+
+        state = follower(lambda: sync_once(leader))
+        assert state["seq"] == last_seq()
+        rows = follower(lambda: load_rows("users"))
+        assert {record["name"]: record["age"] for record in rows} == \
+            {"Иван": 31, "Оля": 40}
+        assert rows == load_rows("users")
+        assert follower(lambda: get_catalog().stats("users"))["rows"] == 2
+
+    def test_replay_after_copy_is_idempotent(self, leader, follower):
+        """Тест повторного применения изменений, уже попавших в копию."""
+        follower(lambda: sync_once(leader))
+
+        def replay():
+            state = load_state()
+            state["seq"] = 0
+            return sync_once(leader, state)
+
+        follower(replay)
+        assert follower(lambda: load_rows("users")) == load_rows("users")
+
+    @patch('builtins.input', return_value='y')
+    def test_schema_changes(self, mock_input, leader, follower):
+        """Тест репликации изменений схемы, индексов и представлений."""
+        follower(lambda: sync_once(leader))
+        metadata = get_catalog()
+        add_column(metadata, "users", "city", "str", "Москва")
+        create_index(metadata, "users", "age")
+        create_view(metadata, "adults", "users", ("age", "18", ">="))
+        create_table(metadata, "tags", ["label:str"])
+        insert(metadata, "tags", '("новый")')
+        drop_table(metadata, "tags")
+
+        follower(lambda: sync_once(leader))
+        assert follower(lambda: dict(get_catalog()["users"]))["city"] == "str"
+        assert "tags" not in follower(lambda: list(get_catalog()))
+        assert follower(lambda: has_index("users", "age"))
+        assert follower(lambda: load_rows("users"))[0]["city"] == "Москва"
+        assert [record["name"] for record in follower(lambda: load_rows("adults"))] \
+            == ["Иван"]
+
+    def test_falls_back_to_copy_when_log_is_gone(self, leader, follower):
+        """Тест повторного копирования, если нужных записей журнала уже нет."""
+        follower(lambda: sync_once(leader))
+        with patch.object(changelog, "CHANGELOG_SEGMENT_ENTRIES", 1), \
+                patch.object(changelog, "CHANGELOG_RETAIN_SEGMENTS", 1):
+            for age in range(3):
+                insert(get_catalog(), "users", f'("Гость", {age})')
+
+        follower(lambda: sync_once(leader))
+        assert len(follower(lambda: load_rows("users"))) == 5
+
+    def test_refuses_non_empty_database(self, leader, follower):
+        """Тест отказа превращать непустую базу в реплику."""
+        follower(lambda: create_table(get_catalog(), "local", ["name:str"]))
+        with pytest.raises(ValueError):
+            follower(lambda: sync_once(leader))
+
+    def test_replica_is_read_only(self, leader, follower, capsys):
+        """Тест запрета изменяющих команд на реплике."""
+        follower(lambda: sync_once(leader))
+        assert follower(is_replica)
+        commands = ['insert into users values ("Оля", 40)', 'exit']
+        with patch('builtins.input', side_effect=commands):
+            follower(run)
+        assert "только для чтения" in capsys.readouterr().out
+        assert len(follower(lambda: load_rows("users"))) == 2
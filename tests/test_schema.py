@@ -0,0 +1,158 @@
+"""
+Тесты для изменения схемы таблиц.
+"""
+
+import json
+from unittest.mock import patch
+
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.core import (
+    add_column,
+    compact,
+    create_index,
+    create_table,
+    drop_column,
+    insert,
+    rename_column,
+    select,
+    update,
+)
+from src.primitive_db.indexes import lookup_range
+from src.primitive_db.schema import apply_change, upgrade_record
+from src.primitive_db.storage import load_rows
+
+
+def _read_file(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+class TestSchemaChanges:
+    """Тесты для функций изменения схемы."""
+
+    def test_apply_change(self):
+        """Тест построения новой схемы."""
+        schema = {"ID": "int", "name": "str"}
+        assert apply_change(schema, {"op": "add", "column": "age", "type": "int"}) \
+            == {"ID": "int", "name": "str", "age": "int"}
+        assert apply_change(schema, {"op": "rename", "column": "name",
+                                     "new_name": "title"}) == \
+            {"ID": "int", "title": "str"}
+
+    def test_apply_change_rejects_id(self):
+        """Тест запрета изменения столбца ID."""
+        try:
+            apply_change({"ID": "int"}, {"op": "drop", "column": "ID"})
+        except ValueError as e:
+            assert "ID" in str(e)
+        else:
+            raise AssertionError("ожидалась ошибка")
+
+    def test_upgrade_record(self):
+        """Тест применения истории изменений к записи."""
+        changes = [
+            {"op": "add", "column": "age", "type": "int", "default": 0},
+            {"op": "rename", "column": "name", "new_name": "title"},
+            {"op": "drop", "column": "age"},
+        ]
+        assert upgrade_record({"ID": 1, "name": "a"}, changes) == \
+            {"ID": 1, "title": "a"}
+
+
+class TestAlterTable:
+    """Тесты для команд ALTER TABLE."""
+
+    def test_add_column_without_rewrite(self):
+        """Тест добавления столбца: старые записи видят значение по умолчанию."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        insert(metadata, "users", '("Иван")')
+        add_column(metadata, "users", "age", "int", "18")
+
+        assert metadata["users"] == {"ID": "int", "name": "str", "age": "int"}
+        assert _read_file("data/users.json") == [{"ID": 1, "name": "Иван"}]
+        assert load_rows("users") == [{"ID": 1, "name": "Иван", "age": 18}]
+
+    def test_rewrite_on_next_write(self):
+        """Тест перезаписи файла в новой схеме при следующем изменении."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        insert(metadata, "users", '("Иван")')
+        rename_column(metadata, "users", "name", "title")
+        insert(metadata, "users", '("Мария")')
+
+        assert _read_file("data/users.json") == [
+            {"ID": 1, "title": "Иван"}, {"ID": 2, "title": "Мария"}]
+        assert get_catalog().pending_changes("users", "data/users.json") == []
+
+    @patch('builtins.input', return_value='y')
+    def test_drop_column_and_compact(self, mock_input):
+        """Тест удаления столбца и уплотнения таблицы."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str", "age:int"])
+        insert(metadata, "users", '("Иван", 30)')
+        create_index(metadata, "users", "age")
+        drop_column(metadata, "users", "age")
+
+        assert "age" not in get_catalog().options("users").get("indexes", [])
+        compact(metadata, "users")
+        assert _read_file("data/users.json") == [{"ID": 1, "name": "Иван"}]
+
+    def test_rename_partition_column(self):
+        """Тест переименования столбца партиционирования и индекса."""
+        metadata = {}
+        create_table(metadata, "logs", ["level:int", "msg:str"],
+                     {"partition": {"kind": "hash", "column": "level", "size": 2}})
+        insert(metadata, "logs", '(1, "a")')
+        create_index(metadata, "logs", "msg")
+        rename_column(metadata, "logs", "level", "severity")
+        rename_column(metadata, "logs", "msg", "text")
+
+        options = get_catalog().options("logs")
+        assert options["partition"]["column"] == "severity"
+        assert options["indexes"] == ["text"]
+        update(metadata, "logs", ("text", "b"), ("severity", "1"))
+        assert [row["text"] for row in load_rows("logs")] == ["b"]
+
+    def test_add_existing_column(self, capsys):
+        """Тест добавления уже существующего столбца."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        add_column(metadata, "users", "name", "str")
+        assert "уже существует" in capsys.readouterr().out
+
+    def test_add_column_default_null(self, capsys):
+        """Тест: без значения по умолчанию добавляется только столбец с NULL."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        insert(metadata, "users", '("Иван")')
+        add_column(metadata, "users", "age", "int")
+        add_column(metadata, "users", "city", "str", "null")
+        assert "не допускает NULL" in capsys.readouterr().out
+        assert metadata["users"] == {"ID": "int", "name": "str"}
+
+        add_column(metadata, "users", "age", "int?", "null")
+        add_column(metadata, "users", "city", "str?")
+        assert metadata["users"]["age"] == "int?"
+        assert load_rows("users") == [{"ID": 1, "name": "Иван"}]
+
+
+class TestTypedQueries:
+    """Тесты для запросов по новым типам столбцов."""
+
+    def test_range_lookup_by_index(self, capsys):
+        """Тест выборки по диапазону отметок времени через индекс."""
+        metadata = {}
+        create_table(metadata, "events", ["at:timestamp", "note:str?"])
+        insert(metadata, "events", '(2024-01-05T10:00:00, "a")')
+        insert(metadata, "events", '(2023-12-31T23:00:00, null)')
+        insert(metadata, "events", '(2024-02-01, "c")')
+        create_index(metadata, "events", "at")
+
+        assert sorted(lookup_range("events", "at", ">=", "2024-01-01T00:00:00",
+                                   str)) == [1, 3]
+        capsys.readouterr()
+        select(metadata, "events", ("at", "2024-02-01", "<"))
+        output = capsys.readouterr().out
+        assert "2023-12-31T23:00:00" in output and "NULL" in output
+        assert "2024-02-01T00:00:00" not in output
@@ -0,0 +1,154 @@
+"""
+Тесты для фильтров Блума и оценок HyperLogLog.
+"""
+
+import os
+from unittest.mock import patch
+
+from src.primitive_db import sketches
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.core import (
+    create_index,
+    create_table,
+    delete,
+    insert,
+    rename_column,
+    select,
+    select_count,
+)
+from src.primitive_db.sketches import (
+    BloomFilter,
+    HyperLogLog,
+    distinct_estimate,
+    flush_sketches,
+    has_bloom,
+    load_sketches,
+    might_contain,
+    sketch_path,
+)
+
+
+def _create():
+    metadata = get_catalog()
+    create_table(metadata, "users", ["name:str", "city:str"])
+    for name, city in (("Иван", "Москва"), ("Петя", "Казань"), ("Оля", "Москва")):
+        insert(metadata, "users", f'("{name}", "{city}")')
+    return metadata
+
+
+class TestStructures:
+    """Тесты для самих структур данных."""
+
+    def test_bloom_no_false_negatives(self):
+        """Тест: добавленные значения всегда находятся, лишние — редко."""
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"key{i}")
+        assert all(f"key{i}" in bloom for i in range(1000))
+        false_positives = sum(f"miss{i}" in bloom for i in range(2000))
+        assert false_positives < 60
+
+    def test_bloom_round_trip(self):
+        """Тест сохранения и загрузки фильтра."""
+        bloom = BloomFilter(10)
+        bloom.add("a")
+        restored = BloomFilter.from_dict(bloom.to_dict())
+        assert "a" in restored and restored.count == 1
+
+    def test_hll_estimate(self):
+        """Тест точности оценки количества различных значений."""
+        hll = HyperLogLog()
+        for i in range(20000):
+            hll.add(str(i % 5000))
+        assert abs(hll.count() - 5000) < 500
+        assert HyperLogLog().count() == 0
+
+
+class TestTableSketches:
+    """Тесты для структур, поддерживаемых по изменениям таблицы."""
+
+    @patch('builtins.input', return_value='y')
+    def test_bloom_skips_reads_on_miss(self, mock_input, capsys):
+        """Тест: промах по фильтру не читает данные таблицы."""
+        metadata = _create()
+        create_index(metadata, "users", "name", "bloom")
+        assert has_bloom("users", "name")
+        with patch("src.primitive_db.core.load_rows") as load_rows, \
+                patch("src.primitive_db.core.load_partitions") as load_partitions:
+            select(metadata, "users", ("name", "Никто"))
+            delete(metadata, "users", ("name", "Никто"))
+        load_rows.assert_not_called()
+        load_partitions.assert_not_called()
+        assert "Записи для удаления не найдены" in capsys.readouterr().out
+
+    def test_bloom_maintained_on_insert(self):
+        """Тест добавления новых значений в фильтр при вставке."""
+        metadata = _create()
+        create_index(metadata, "users", "name", "bloom")
+        assert not might_contain("users", "name", "Катя")
+        insert(metadata, "users", '("Катя", "Омск")')
+        assert might_contain("users", "name", "Катя")
+
+    def test_bloom_follows_rename(self):
+        """Тест переноса фильтра вслед за переименованием столбца."""
+        metadata = _create()
+        create_index(metadata, "users", "name", "bloom")
+        rename_column(metadata, "users", "name", "full_name")
+        assert has_bloom("users", "full_name") and not has_bloom("users", "name")
+        select(metadata, "users", ("full_name", "Иван"))
+        assert might_contain("users", "full_name", "Иван")
+
+    def test_count_distinct(self, capsys):
+        """Тест оценки и точного подсчета различных значений."""
+        metadata = _create()
+        assert distinct_estimate("users", "city") == 2
+        capsys.readouterr()
+        select_count(metadata, "users", distinct="city")
+        assert "≈2" in capsys.readouterr().out
+        select_count(metadata, "users", ("city", "Москва"), distinct="name")
+        assert "Различных значений name: 2" in capsys.readouterr().out
+
+    @patch('builtins.input', return_value='y')
+    def test_estimate_drops_after_deletes(self, mock_input):
+        """Тест: после удаления значений оценка перестраивается и уменьшается."""
+        metadata = get_catalog()
+        create_table(metadata, "codes", ["code:int"])
+        for code in range(50):
+            insert(metadata, "codes", f"({code})")
+        assert 45 <= distinct_estimate("codes", "code") <= 55
+        for code in range(40):
+            delete(metadata, "codes", ("code", str(code)))
+        # Перестройка откладывается, пока удаленных записей меньше доли таблицы
+        assert distinct_estimate("codes", "code") < 20
+        for code in range(40, 50):
+            delete(metadata, "codes", ("code", str(code)))
+        assert distinct_estimate("codes", "code") == 0
+
+    @patch('builtins.input', return_value='y')
+    def test_saved_in_batches(self, mock_input):
+        """Тест: изменения копятся в памяти, а файл пишется при flush."""
+        metadata = _create()
+        create_index(metadata, "users", "name", "bloom")
+        stamp = os.stat(sketch_path("users")).st_mtime_ns
+        with patch.object(sketches, "rebuild_sketches") as rebuild:
+            insert(metadata, "users", '("Мария", "Омск")')
+            delete(metadata, "users", ("name", "Мария"))
+        assert not rebuild.called
+        assert os.stat(sketch_path("users")).st_mtime_ns == stamp
+        assert load_sketches("users")["rows"] == 3
+
+        assert flush_sketches() == 1
+        assert not os.path.exists("data/users.sketch.dirty")
+        assert load_sketches("users")["stale"] == 1
+
+    def test_unsaved_changes_lost(self):
+        """Тест: после потери памяти устаревший файл перестраивается."""
+        metadata = _create()
+        create_index(metadata, "users", "name", "bloom")
+        insert(metadata, "users", '("Мария", "Омск")')
+        # Имитируем аварийное завершение: изменения в памяти теряются
+        sketches._cache.clear()
+        sketches._unsaved.clear()
+        assert load_sketches("users") is None
+        assert distinct_estimate("users", "name") == 4
+        assert load_sketches("users")["bloom"]["name"].count == 4
@@ -0,0 +1,141 @@
+"""
+Тесты для операций с ограничением памяти (сортировка, группировка, соединение).
+"""
+
+import random
+from collections import Counter
+from unittest.mock import patch
+
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.core import create_table, insert, select, select_count
+from src.primitive_db.join import hash_join
+from src.primitive_db.spill import external_sort, hash_count, sort_key
+
+
+def _rows(count, seed=1):
+    rng = random.Random(seed)
+    return [{"ID": i, "score": rng.randint(0, 50) if i % 7 else None}
+            for i in range(1, count + 1)]
+
+
+class TestExternalSort:
+    """Тесты для внешней сортировки."""
+
+    def test_in_memory(self):
+        """Тест сортировки без сброса на диск."""
+        stats = {}
+        rows = _rows(100)
+        result = list(external_sort(iter(rows), sort_key("score"), stats=stats))
+        assert result == sorted(rows, key=sort_key("score"))
+        assert stats == {"spilled": 0}
+
+    def test_spilled_runs(self):
+        """Тест сортировки с сериями во временных файлах и многопроходным слиянием."""
+        stats = {}
+        rows = _rows(2000)
+        result = list(external_sort(iter(rows), sort_key("score"), reverse=True,
+                                    memory_limit=2000, stats=stats))
+        key = sort_key("score")
+        assert [key(record) for record in result] == \
+            sorted((key(record) for record in rows), reverse=True)
+        assert sorted(record["ID"] for record in result) == list(range(1, 2001))
+        assert stats["spilled"] > 64
+
+    def test_nulls_last(self):
+        """Тест: NULL при сортировке по возрастанию идут последними."""
+        result = list(external_sort(_rows(20), sort_key("score"), memory_limit=300))
+        assert result[-1]["score"] is None and result[0]["score"] is not None
+
+
+class TestHashAggregation:
+    """Тесты для группировки со сбросом разделов."""
+
+    def test_counts_match(self):
+        """Тест совпадения результатов с подсчетом в памяти."""
+        stats = {}
+        rng = random.Random(2)
+        values = [rng.randint(0, 500) for _ in range(3000)]
+        result = dict(hash_count(((value, 1) for value in values),
+                                 memory_limit=5000, stats=stats))
+        assert result == Counter(values)
+        assert stats["spilled"] > 0
+
+
+class TestGraceHashJoin:
+    """Тесты для хэш-соединения по разделам."""
+
+    def test_spilled_join(self):
+        """Тест соединения, хэш-таблица которого не помещается в лимит."""
+        users = [{"ID": i, "name": f"u{i}"} for i in range(1, 300)]
+        orders = [{"ID": i, "user_id": i % 350} for i in range(1, 1000)]
+        stats = {}
+        pairs = hash_join(users, "ID", orders, "user_id", memory_limit=2000,
+                          stats=stats)
+        result = sorted((order["ID"], user["ID"]) for user, order in pairs)
+        expected = sorted((order["ID"], order["user_id"]) for order in orders
+                          if 1 <= order["user_id"] < 300)
+        assert result == expected
+        assert stats["spilled"] > 0
+
+
+class TestQueries:
+    """Тесты для команд select ... order by и select count(*)."""
+
+    def _create(self):
+        metadata = get_catalog()
+        create_table(metadata, "users", ["name:str", "age:int?"])
+        for name, age in (("Иван", 30), ("Петя", 12), ("Оля", "null"), ("Катя", 30)):
+            insert(metadata, "users", f'("{name}", {age})')
+        return metadata
+
+    def test_order_by(self, capsys):
+        """Тест сортировки результата select."""
+        metadata = self._create()
+        capsys.readouterr()
+        select(metadata, "users", ("age", "18", ">"), ("name", True))
+        output = capsys.readouterr().out
+        assert "Петя" not in output
+        assert output.index("Катя") < output.index("Иван")
+
+    def test_order_by_spilled(self, capsys):
+        """Тест сортировки с маленьким лимитом памяти."""
+        from src.primitive_db import spill
+
+        metadata = self._create()
+        previous = spill.get_memory_limit()
+        spill.set_memory_limit(100)
+        try:
+            select(metadata, "users", order_by=("age", False))
+        finally:
+            spill.set_memory_limit(previous)
+        output = capsys.readouterr().out
+        assert output.index("Петя") < output.index("Иван") < output.index("Оля")
+        assert "временных файлов" in output
+
+    def test_output_streamed(self, capsys):
+        """Тест: результат печатается частями, заголовок — один раз."""
+        metadata = self._create()
+        capsys.readouterr()
+        with patch("src.primitive_db.core.PRINT_CHUNK_ROWS", 3):
+            select(metadata, "users", order_by=("name", False))
+        lines = capsys.readouterr().out.splitlines()
+        rows = [line.split("|")[2].strip() for line in lines
+                if line.startswith("|")]
+        assert rows == ["name", "Иван", "Катя", "Оля", "Петя"]
+        # Части разделены одной границей, как строки одной таблицы
+        assert sum(line.startswith("+") for line in lines) == 4
+
+    def test_group_by(self, capsys):
+        """Тест подсчета записей с группировкой."""
+        metadata = self._create()
+        capsys.readouterr()
+        select_count(metadata, "users", group_by="age")
+        lines = [line for line in capsys.readouterr().out.splitlines() if "|" in line]
+        assert [[cell.strip() for cell in line.split("|")[1:3]]
+                for line in lines[1:]] == [["12", "1"], ["30", "2"], ["NULL", "1"]]
+
+    def test_count_with_where(self, capsys):
+        """Тест подсчета записей по условию."""
+        metadata = self._create()
+        select_count(metadata, "users", ("age", "30"))
+        assert "Количество записей: 2" in capsys.readouterr().out
@@ -0,0 +1,145 @@
+"""
+Тесты для времени жизни записей (TTL) и фоновой очистки.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.core import (
+    create_table,
+    delete,
+    drop_column,
+    expire,
+    insert,
+    rename_column,
+    select,
+    select_count,
+    update,
+)
+from src.primitive_db.storage import count_rows, load_rows
+from src.primitive_db.sweeper import ExpirySweeper, sweep
+from src.primitive_db.ttl import expired_entries, expiry_path, ttl_spec
+from src.primitive_db.utils import load_json_file
+
+
+def _ago(seconds):
+    """Возвращает отметку времени UTC seconds секунд назад."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    moment = now - timedelta(seconds=seconds)
+    return moment.isoformat(timespec='seconds')
+
+
+@pytest.fixture
+def sessions():
+    """Создает таблицу sessions с TTL 1 час: две истекшие записи и одна живая."""
+    metadata = get_catalog()
+    create_table(metadata, "sessions", ["token:str", "at:timestamp?"],
+                 {"ttl": {"seconds": 3600, "column": "at"}})
+    for token, age in (("старый", 7200), ("живой", 60), ("древний", 9000)):
+        insert(metadata, "sessions", f'("{token}", {_ago(age)})')
+    return metadata
+
+
+class TestVisibility:
+    """Тесты для невидимости истекших записей."""
+
+    def test_create_validates_column(self, capsys):
+        """Тест: TTL задается только по столбцу timestamp."""
+        metadata = get_catalog()
+        create_table(metadata, "jobs", ["name:str"],
+                     {"ttl": {"seconds": 60, "column": "name"}})
+        assert "jobs" not in metadata
+        assert "timestamp" in capsys.readouterr().out
+
+    def test_expired_rows_invisible(self, sessions, capsys):
+        """Тест: истекшие записи не видны при чтении, но еще хранятся."""
+        assert [record["token"] for record in load_rows("sessions")] == ["живой"]
+        assert count_rows("sessions") == 3
+        capsys.readouterr()
+        select(sessions, "sessions", ("token", "старый"))
+        select_count(sessions, "sessions")
+        output = capsys.readouterr().out
+        assert "старый" not in output and "Количество записей: 1" in output
+
+    def test_null_timestamp_never_expires(self, sessions):
+        """Тест: запись без отметки времени не истекает."""
+        insert(sessions, "sessions", '("вечный", null)')
+        assert len(load_rows("sessions")) == 2
+
+    @patch('builtins.input', return_value='y')
+    def test_update_and_delete_skip_expired(self, mock_input, sessions, capsys):
+        """Тест: изменение и удаление не затрагивают истекшие записи."""
+        update(sessions, "sessions", ("at", _ago(0)), ("token", "старый"))
+        delete(sessions, "sessions", ("token", "древний"))
+        output = capsys.readouterr().out
+        assert output.count("не найдены") == 2
+        assert count_rows("sessions") == 3
+
+
+class TestSweep:
+    """Тесты для очистки по индексу истечения."""
+
+    def test_expiry_index_ordered(self, sessions):
+        """Тест: индекс истечения упорядочен по времени."""
+        entries = load_json_file(expiry_path("sessions"), [])
+        assert [record_id for _, record_id in entries] == [3, 1, 2]
+        assert [record_id for _, record_id in expired_entries("sessions", 10)] == [3, 1]
+
+    def test_sweep_in_batches(self, sessions):
+        """Тест: очистка удаляет истекшие записи пакетами, начиная со старых."""
+        assert sweep("sessions", limit=1) == 1
+        assert count_rows("sessions") == 2
+        assert sweep("sessions", limit=1) == 1
+        assert sweep("sessions", limit=1) == 0
+        assert count_rows("sessions") == 1
+        assert len(load_json_file(expiry_path("sessions"), [])) == 1
+        assert get_catalog().stats("sessions")["rows"] == 1
+
+    def test_sweep_skips_refreshed_rows(self, sessions):
+        """Тест: запись с обновленной отметкой времени не удаляется."""
+        entries = expired_entries("sessions", 10)
+        with patch("src.primitive_db.sweeper.expired_entries",
+                   return_value=entries + [[_ago(7000), 2]]):
+            assert sweep("sessions") == 2
+        assert [record["token"] for record in load_rows("sessions")] == ["живой"]
+        assert [record_id for _, record_id in
+                load_json_file(expiry_path("sessions"), [])] == [2]
+
+    def test_expire_command(self, sessions, capsys):
+        """Тест команды expire."""
+        expire(sessions, "sessions")
+        assert "истекших записей из таблицы \"sessions\": 2" in capsys.readouterr().out
+        assert count_rows("sessions") == 1
+
+    def test_background_sweeper(self, sessions):
+        """Тест фоновой очистки, работающей только пока консоль ждет ввода."""
+        sweeper = ExpirySweeper(interval=0.01, batch=1)
+        sweeper.start()
+        try:
+            time.sleep(0.05)
+            assert count_rows("sessions") == 3
+            with sweeper.idle():
+                deadline = time.monotonic() + 5
+                while sweeper.swept < 2 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+        finally:
+            sweeper.stop()
+        assert count_rows("sessions") == 1
+
+
+class TestSchema:
+    """Тесты для изменения схемы таблицы с TTL."""
+
+    @patch('builtins.input', return_value='y')
+    def test_ttl_column_protected_and_renamed(self, mock_input, sessions, capsys):
+        """Тест: столбец TTL нельзя удалить, а переименование переносит TTL."""
+        drop_column(sessions, "sessions", "at")
+        assert "время жизни" in capsys.readouterr().out
+        rename_column(sessions, "sessions", "at", "seen_at")
+        assert ttl_spec("sessions")["column"] == "seen_at"
+        assert [record["token"] for record in load_rows("sessions")] == ["живой"]
+        assert sweep("sessions") == 2
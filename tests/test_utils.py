@@ -2,9 +2,11 @@
 Тесты для вспомогательных функций.
 """
 
+import json
 import os
 
 from src.primitive_db.utils import (
+    iter_json_array,
     load_metadata,
     load_table_data,
     save_metadata,
@@ -57,3 +59,19 @@ class TestUtils:
         """Тест загрузки данных несуществующей таблицы."""
         result = load_table_data("nonexistent_table")
         assert result == []
+
+    def test_iter_json_array_streams_items(self, tmp_path):
+        """Тест потокового чтения JSON массива маленькими кусками."""
+        items = [{"ID": i, "name": f"имя {i}", "tags": [i, {"x": "]"}]}
+                 for i in range(20)]
+        filepath = tmp_path / "rows.json"
+        filepath.write_text(json.dumps(items, indent=2, ensure_ascii=False),
+                            encoding="utf-8")
+        assert list(iter_json_array(str(filepath), chunk_size=7)) == items
+
+    def test_iter_json_array_empty_and_missing(self, tmp_path):
+        """Тест чтения пустого массива и отсутствующего файла."""
+        filepath = tmp_path / "empty.json"
+        filepath.write_text("[]", encoding="utf-8")
+        assert list(iter_json_array(str(filepath))) == []
+        assert list(iter_json_array(str(tmp_path / "missing.json"))) == []
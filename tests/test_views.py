@@ -0,0 +1,131 @@
+"""
+Тесты для материализованных представлений.
+"""
+
+from unittest.mock import patch
+
+from src.primitive_db.catalog import get_catalog
+from src.primitive_db.core import (
+    create_index,
+    create_table,
+    create_view,
+    delete,
+    drop_column,
+    drop_table,
+    insert,
+    refresh,
+    rename_column,
+    update,
+)
+from src.primitive_db.fulltext import search
+from src.primitive_db.indexes import lookup
+from src.primitive_db.parser import parse_create_view
+from src.primitive_db.sketches import might_contain
+from src.primitive_db.storage import load_rows, save_partitions
+
+
+def _names(table_name):
+    return [record["name"] for record in load_rows(table_name)]
+
+
+class TestMaterializedViews:
+    """Тесты для инкрементального обновления представлений."""
+
+    def _create(self):
+        metadata = {}
+        create_table(metadata, "users", ["name:str", "age:int"])
+        insert(metadata, "users", '("Иван", 30)')
+        insert(metadata, "users", '("Петя", 12)')
+        create_view(metadata, "adults", "users", ("age", "18", ">="))
+        return metadata
+
+    def test_create_view(self):
+        """Тест создания представления с текущими данными таблицы."""
+        metadata = self._create()
+        assert metadata["adults"] == metadata["users"]
+        assert load_rows("adults") == [{"ID": 1, "name": "Иван", "age": 30}]
+        assert get_catalog().stats("adults")["rows"] == 1
+
+    @patch('builtins.input', return_value='y')
+    def test_incremental_maintenance(self, mock_input):
+        """Тест применения вставки, изменения и удаления к представлению."""
+        metadata = self._create()
+        insert(metadata, "users", '("Мария", 25)')
+        update(metadata, "users", ("age", "20"), ("name", "Петя"))
+        update(metadata, "users", ("age", "10"), ("name", "Иван"))
+        assert _names("adults") == ["Петя", "Мария"]
+
+        delete(metadata, "users", ("name", "Мария"))
+        assert _names("adults") == ["Петя"]
+        assert get_catalog().stats("adults")["rows"] == 1
+
+    @patch('builtins.input', return_value='y')
+    def test_views_of_source(self, mock_input):
+        """Тест: каталог помнит представления таблицы, в том числе после загрузки."""
+        metadata = self._create()
+        create_view(metadata, "kids", "users", ("age", "18", "<"))
+        assert get_catalog().views_of("users") == ["adults", "kids"]
+        assert get_catalog().views_of("adults") == []
+
+        drop_table(metadata, "adults")
+        assert get_catalog().views_of("users") == ["kids"]
+        get_catalog().load()
+        assert get_catalog().views_of("users") == ["kids"]
+
+    def test_view_is_read_only(self, capsys):
+        """Тест запрета прямого изменения представления."""
+        metadata = self._create()
+        insert(metadata, "adults", '("Олег", 40)')
+        assert "только для чтения" in capsys.readouterr().out
+        assert _names("adults") == ["Иван"]
+
+    def test_view_index_and_refresh(self):
+        """Тест индекса по представлению и полной перестройки."""
+        metadata = self._create()
+        create_index(metadata, "adults", "name")
+        insert(metadata, "users", '("Мария", 25)')
+        assert lookup("adults", "name", "Мария") == [3]
+
+        refresh(metadata, "adults")
+        assert _names("adults") == ["Иван", "Мария"]
+        assert lookup("adults", "name", "Иван") == [1]
+
+    def test_refresh_rebuilds_structures(self):
+        """Тест: перестройка обновляет фильтр Блума, поиск и зависимые представления."""
+        metadata = self._create()
+        create_index(metadata, "adults", "name", "bloom")
+        create_index(metadata, "adults", "name", "fulltext")
+        create_view(metadata, "named", "adults", ("name", "ива", "contains"))
+        # Имитируем рассинхронизацию: данные исходной таблицы меняются
+        # в обход событий
+        save_partitions("users", {None: load_rows("users") +
+                                  [{"ID": 3, "name": "Ивар", "age": 40}]})
+
+        refresh(metadata, "adults")
+        assert _names("adults") == ["Иван", "Ивар"]
+        assert might_contain("adults", "name", "Ивар")
+        assert set(search("adults", "name", "contains", "ивар")) == {3}
+        assert _names("named") == ["Иван", "Ивар"]
+
+    @patch('builtins.input', return_value='y')
+    def test_schema_changes_follow_source(self, mock_input, capsys):
+        """Тест переноса изменений схемы и защиты зависимостей."""
+        metadata = self._create()
+        rename_column(metadata, "users", "age", "years")
+        assert get_catalog().options("adults")["view"]["where"][0] == "years"
+        assert "years" in metadata["adults"]
+        insert(metadata, "users", '("Мария", 25)')
+        assert _names("adults") == ["Иван", "Мария"]
+
+        drop_column(metadata, "users", "years")
+        drop_table(metadata, "users")
+        output = capsys.readouterr().out
+        assert "используется в условии" in output
+        assert "зависят представления" in output
+        assert "users" in metadata
+
+    def test_parse_create_view(self):
+        """Тест парсинга команды создания представления."""
+        assert parse_create_view(["materialized", "view", "adults", "as", "select",
+                                  "from", "users", "where", "age", ">", "18"]) == \
+            ("adults", "users", ("age", "18", ">"))
@@ -0,0 +1,99 @@
+"""
+Тесты для отложенной записи таблиц.
+"""
+
+import os
+
+import pytest
+
+from src.primitive_db import writeback
+from src.primitive_db.core import create_table, insert
+from src.primitive_db.storage import (
+    flush_tables,
+    load_rows,
+    recover_tables,
+    start_write_behind,
+    stop_write_behind,
+)
+from src.primitive_db.utils import load_table_data
+
+
+@pytest.fixture
+def write_behind():
+    """Включает отложенную запись с редким сбросом по таймеру."""
+    start_write_behind(interval=3600)
+    yield
+    stop_write_behind()
+
+
+class TestWriteBehind:
+    """Тесты для буфера отложенной записи."""
+
+    def test_diff_and_apply(self):
+        """Тест вычисления и применения разницы версий файла."""
+        old = [{"ID": 1, "a": 1}, {"ID": 2, "a": 2}]
+        new = [{"ID": 1, "a": 10}, {"ID": 3, "a": 3}]
+        upsert, deleted = writeback.diff_rows(old, new)
+        assert upsert == new
+        assert deleted == [2]
+        assert writeback.apply_diff(old, upsert, deleted) == new
+
+    def test_mutation_is_buffered_until_flush(self, write_behind):
+        """Тест: изменение видно сразу, а на диск попадает после flush."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        insert(metadata, "users", '("Иван")')
+
+        assert load_rows("users") == [{"ID": 1, "name": "Иван"}]
+        assert load_table_data("users") == []
+
+        assert flush_tables() == 1
+        assert load_table_data("users") == [{"ID": 1, "name": "Иван"}]
+
+    def test_recover_after_crash(self):
+        """Тест восстановления несброшенных изменений из журнала."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        start_write_behind(interval=3600)
+        insert(metadata, "users", '("Иван")')
+        insert(metadata, "users", '("Мария")')
+        # Имитируем аварийное завершение: буфер теряется без сброса
+        writeback._buffer = None
+
+        assert load_table_data("users") == []
+        assert recover_tables() == 1
+        assert [r["name"] for r in load_table_data("users")] == ["Иван", "Мария"]
+        assert not os.listdir("data/_wal")
+
+    def test_failed_write_keeps_journal(self, write_behind):
+        """Тест: файл, который не удалось записать, остается в журнале."""
+        metadata = {}
+        create_table(metadata, "users", ["name:str"])
+        create_table(metadata, "tags", ["name:str"])
+        insert(metadata, "users", '("Иван")')
+        insert(metadata, "tags", '("новое")')
+
+        buffer = writeback.current()
+        writer = buffer._writer
+
+        def failing(path, rows, codec):
+            if "users" in path:
+                raise OSError("нет места на диске")
+            writer(path, rows, codec)
+
+        buffer._writer = failing
+        with pytest.raises(OSError):
+            buffer.flush()
+        buffer._writer = writer
+        assert buffer.dirty_tables() == ["data/users.json"]
+        insert(metadata, "tags", '("еще")')
+        assert flush_tables() == 2
+
+        # Журнал, сохраненный после ошибки, восстанавливает те же данные
+        insert(metadata, "users", '("Мария")')
+        buffer._writer = failing
+        with pytest.raises(OSError):
+            buffer.flush()
+        writeback._buffer = None
+        assert recover_tables() == 1
+        assert [r["name"] for r in load_table_data("users")] == ["Иван", "Мария"]